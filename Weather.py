@@ -1,10 +1,41 @@
 import tkinter as tk
 from tkinter import font, ttk
-from datetime import datetime, timedelta
-import random
+from datetime import datetime, timedelta, timezone as dt_timezone
+import os
+import sys
+import time
+
+# Startup marks are measured from here
+STARTED = time.perf_counter()
+
+import cache
+from lazy import lazy_import
+import metrics
+import workers
+
+# NumPy, sqlite3 and asyncio come in with these; they load on first use so
+# the shell window paints without waiting for them
+citylist = lazy_import("citylist")
+climatology = lazy_import("climatology")
+dashboard = lazy_import("dashboard")
+ensemble = lazy_import("ensemble")
+gazetteer = lazy_import("gazetteer")
+history = lazy_import("history")
+providers = lazy_import("providers")
+scheduler = lazy_import("scheduler")
+simulator = lazy_import("simulator")
+streams = lazy_import("streams")
+typeahead = lazy_import("typeahead")
 
 class WeatherApp:
-    def __init__(self, root):
+    # Detail grid captions, in display order
+    DETAIL_LABELS = ("💧 Humidity", "💨 Wind", "📊 Pressure", "🌡️ Feels")
+    
+    # Slots in the upcoming-hours strip
+    HOURLY_SLOTS = 8
+    
+    def __init__(self, root, seed=0, gazetteer_path=None, provider=None, climatology_path=None,
+                 pinned=None, history_path=None, metrics_path=None, ensemble_members=50):
         self.root = root
         self.root.title("SkyCast - Weather Forecast")
         
@@ -13,20 +44,6 @@ class WeatherApp:
         self.root.minsize(600, 450)    # Minimum size
         self.root.configure(bg="#1a1a2e")
         
-        # City database with realistic parameters
-        self.city_database = {
-            "Istanbul": {"country": "Turkey", "lat": 41.0082, "lon": 28.9784, "timezone": 3},
-            "Ankara": {"country": "Turkey", "lat": 39.9334, "lon": 32.8597, "timezone": 3},
-            "Izmir": {"country": "Turkey", "lat": 38.4192, "lon": 27.1287, "timezone": 3},
-            "Antalya": {"country": "Turkey", "lat": 36.8969, "lon": 30.7133, "timezone": 3},
-            "London": {"country": "UK", "lat": 51.5074, "lon": -0.1278, "timezone": 0},
-            "Paris": {"country": "France", "lat": 48.8566, "lon": 2.3522, "timezone": 1},
-            "Berlin": {"country": "Germany", "lat": 52.5200, "lon": 13.4050, "timezone": 1},
-            "Rome": {"country": "Italy", "lat": 41.9028, "lon": 12.4964, "timezone": 1},
-            "New York": {"country": "USA", "lat": 40.7128, "lon": -74.0060, "timezone": -5},
-            "Tokyo": {"country": "Japan", "lat": 35.6762, "lon": 139.6503, "timezone": 9},
-        }
-        
         # Weather condition colors
         self.weather_colors = {
             "Clear": "#FFD700",
@@ -50,29 +67,148 @@ class WeatherApp:
             "Mist": "🌫️"
         }
         
-        # Weather descriptions
-        self.weather_descriptions = {
-            "Clear": ["Sunny", "Clear", "Bright"],
-            "Clouds": ["Partly Cloudy", "Cloudy", "Overcast"],
-            "Rain": ["Light Rain", "Rainy", "Heavy Rain"],
-            "Snow": ["Light Snow", "Snowy", "Blizzard"],
-            "Thunderstorm": ["Thunderstorm", "Stormy"],
-            "Drizzle": ["Drizzle", "Light Rain"],
-            "Mist": ["Misty", "Foggy", "Hazy"]
-        }
-        
-        # Seasonal temperature ranges
-        self.seasonal_temps = {
-            "winter": (-5, 10),
-            "spring": (10, 20),
-            "summer": (20, 35),
-            "autumn": (5, 18)
-        }
-        
+        # Startup is staged: the shell below is painted first, then the
+        # gazetteer, climatology and simulator (and with them NumPy) load on a
+        # worker while the window stays responsive; load_core lists them.
+        # Searches made before then wait in pending_search; if loading
+        # fails, core_error holds why and the next search retries it
+        self.seed = seed
+        self.gazetteer_path = gazetteer_path
+        self.climatology_path = climatology_path
+        self.history_path = history_path
+        self.ready = False
+        self.core_error = None
+        self.pending_search = "Istanbul"
+        self.startup = {'first_paint_ms': None, 'interactive_ms': None, 'first_weather_ms': None}
+        self.city_database = None
+        self.climate = None
+        self.stream = None
+        self.simulation = None
+        
+        # Simulated forecasts carry P10-P90 bands from this many perturbed
+        # runs (0 for the single deterministic path)
+        self.ensemble_members = ensemble_members
+        
+        # Optional remote backend (e.g. providers.HTTPProvider) used instead of
+        # the simulator; async providers run on their own event loop thread
+        self.provider = provider
+        self.provider_thread = None
+        
+        # Observations are reused for a minute per city; at most 256 are kept
+        self.cache = cache.ObservationCache(maxsize=256, bucket_seconds=60)
+        
+        # Every generated observation is appended to an on-disk history when
+        # a path is given; writes are batched on the store's own thread
+        self.history = None
+        
+        # Weather panel widgets are built on first display and then reused
+        self.panel = None
+        self.panel_state = {}
+        self.render_stats = {'renders': 0, 'widgets_created': 0, 'config_calls': 0, 'last_ms': 0.0}
+        
+        # Weather generation runs on a worker pool, never on the Tk thread
+        self.fetcher = workers.BackgroundFetcher(self.root)
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+        
+        # Pinned cities (key -> refresh interval in seconds, None for the
+        # default) and the displayed city are kept current by one scheduler;
+        # refreshes due together are generated as one batch. A place is a
+        # gazetteer.City, or a bare name for a remote provider, keyed by
+        # gazetteer.place_key: its row, so two cities called Paris stay
+        # apart, or its folded name. places maps each key the scheduler
+        # knows to its place
+        self.scheduler = None
+        self.pinned = {}
+        self.places = {}
+        self.pending_pins = pinned if isinstance(pinned, dict) else dict.fromkeys(pinned or ())
+        self.current_city = None
+        self.current_key = None
+        
+        # City list, dashboard and suggestions need the gazetteer and are
+        # added by setup_city_ui once it has loaded
+        self.city_list = None
+        self.dashboard = None
+        self.suggestions = None
         self.setup_ui()
         
-        # Show Istanbul by default
-        self.root.after(100, lambda: self.search_city("Istanbul"))
+        # Instrumentation: latency histograms come from the decorated methods,
+        # everything else is read from the components when a snapshot is taken.
+        # F12 shows the overlay; metrics_path gets a snapshot every 15 s
+        self.search_started = None
+        self.metrics_overlay = None
+        self.metrics_were_enabled = metrics.REGISTRY.enabled
+        self.metrics_path = metrics_path
+        self.root.bind("<F12>", lambda e: self.toggle_metrics_overlay())
+        if metrics_path:
+            self.root.after(15000, self.write_metrics)
+        
+        # Idle callbacks run after the pending redraws, so this one marks the
+        # first paint of the shell
+        self.root.after_idle(self.on_first_paint)
+    
+    def on_first_paint(self):
+        """Note the first paint and start loading everything the shell left out"""
+        self.startup['first_paint_ms'] = round((time.perf_counter() - STARTED) * 1000, 1)
+        self.start_core_load()
+    
+    def start_core_load(self):
+        """Load the simulation stack off the Tk thread"""
+        self.core_error = None
+        self.fetcher.submit(self.load_core, self.on_core_loaded, self.on_core_error, channel="startup")
+    
+    def load_core(self):
+        """Import and open the simulation stack (runs on a worker thread)"""
+        # City database: a binary gazetteer (mapped, not read) or GeoNames
+        # dump if given, else the built-in cities
+        if self.gazetteer_path:
+            city_database = gazetteer.load(self.gazetteer_path)
+        else:
+            city_database = gazetteer.builtin()
+        
+        # Monthly climatology grid (memory-mapped .npy) driving temperatures and
+        # rain chances; the built-in zonal grid when no file is given
+        if self.climatology_path:
+            climate = climatology.load(self.climatology_path)
+        else:
+            climate = climatology.default()
+        
+        # Seeded random stream: the same city and second give the same weather
+        stream = streams.KeyedStream(self.seed)
+        simulation = providers.SimulatorProvider(city_database, stream, climate)
+        provider_thread = providers.ProviderThread() if self.provider is not None else None
+        store = history.HistoryStore(self.history_path) if self.history_path else None
+        return city_database, climate, stream, simulation, provider_thread, store
+    
+    def on_core_loaded(self, core):
+        """Finish the UI and run searches made while loading (runs on the Tk thread)"""
+        (self.city_database, self.climate, self.stream, self.simulation,
+         self.provider_thread, self.history) = core
+        self.scheduler = scheduler.RefreshScheduler(self.root, self.refresh_cities, interval=60)
+        self.setup_city_ui()
+        unknown = []
+        for city, interval in self.pending_pins.items():
+            place = self.resolve_place(city)
+            if place is None:
+                unknown.append(city)
+            else:
+                self.pin_city(place, interval)
+        if unknown:
+            self.show_message(f"Not pinning unknown cities: {', '.join(unknown)}", "warning")
+        self.scheduler.start()
+        self.register_metrics()
+        self.ready = True
+        self.cities_loading.destroy()
+        self.startup['interactive_ms'] = round((time.perf_counter() - STARTED) * 1000, 1)
+        if self.pending_search:
+            self.search_city(self.pending_search)
+            self.pending_search = None
+    
+    def on_core_error(self, error):
+        """Report city data that failed to load and drop the waiting search (runs on the Tk thread)"""
+        self.core_error = error
+        self.pending_search = None
+        self.cities_loading.config(text="Cities unavailable")
+        self.show_message(f"Could not load city data: {error}", "warning")
     
     def setup_ui(self):
         """Setup the user interface with responsive design"""
@@ -125,6 +261,32 @@ class WeatherApp:
                               cursor="hand2")
         search_btn.pack(side="left")
         
+        self.pin_btn = tk.Button(search_frame_inner, text="📌 Pin",
+                                 font=("Arial", 11),
+                                 bg="#0f3460",
+                                 fg="white",
+                                 activebackground="#4361ee",
+                                 activeforeground="white",
+                                 command=self.toggle_pin,
+                                 padx=10,
+                                 pady=6,
+                                 relief="flat",
+                                 cursor="hand2")
+        self.pin_btn.pack(side="left", padx=(8, 0))
+        
+        self.view_btn = tk.Button(search_frame_inner, text="▦ Dashboard",
+                                  font=("Arial", 11),
+                                  bg="#0f3460",
+                                  fg="white",
+                                  activebackground="#4361ee",
+                                  activeforeground="white",
+                                  command=self.toggle_dashboard,
+                                  padx=10,
+                                  pady=6,
+                                  relief="flat",
+                                  cursor="hand2")
+        self.view_btn.pack(side="left", padx=(8, 0))
+        
         # Content area - uses grid for better responsiveness
         content_frame = tk.Frame(main_container, bg="#1a1a2e")
         content_frame.pack(fill="both", expand=True)
@@ -138,59 +300,27 @@ class WeatherApp:
         self.weather_frame = tk.Frame(content_frame, bg="#0f3460", relief="flat", bd=0)
         self.weather_frame.grid(row=0, column=0, sticky="nsew", padx=(0, 5))
         
-        # Right panel - Cities and info (scrollable if needed)
+        # setup_city_ui grids the pinned-city dashboard over the weather panel
+        self.content_frame = content_frame
+        
+        # Right panel - Cities and info
         right_panel = tk.Frame(content_frame, bg="#16213e", relief="flat", bd=0)
         right_panel.grid(row=0, column=1, sticky="nsew", padx=(5, 0))
         
-        # Create a canvas for scrollable content in right panel
-        right_canvas = tk.Canvas(right_panel, bg="#16213e", highlightthickness=0)
-        scrollbar = ttk.Scrollbar(right_panel, orient="vertical", command=right_canvas.yview)
-        scrollable_frame = tk.Frame(right_canvas, bg="#16213e")
-        
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e: right_canvas.configure(scrollregion=right_canvas.bbox("all"))
-        )
-        
-        right_canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        right_canvas.configure(yscrollcommand=scrollbar.set)
-        
-        right_canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
-        
-        # Bind mouse wheel for scrolling
-        def _on_mousewheel(event):
-            right_canvas.yview_scroll(int(-1*(event.delta/120)), "units")
-        
-        right_canvas.bind_all("<MouseWheel>", _on_mousewheel)
-        
-        # Popular cities section
-        cities_label = tk.Label(scrollable_frame, text="🏙️ Cities", 
+        cities_label = tk.Label(right_panel, text="🏙️ Cities", 
                                font=("Arial", 12, "bold"),  # Smaller font
                                bg="#16213e", fg="white")
         cities_label.pack(pady=(15, 8), padx=10)
         
-        cities_frame = tk.Frame(scrollable_frame, bg="#16213e")
-        cities_frame.pack(pady=(0, 15), padx=10)
-        
-        popular_cities = list(self.city_database.keys())
-        
-        for city in popular_cities:
-            city_btn = tk.Button(cities_frame, text=city,
-                               font=("Arial", 9),  # Smaller font
-                               bg="#0f3460",
-                               fg="white",
-                               activebackground="#4cc9f0",
-                               activeforeground="white",
-                               command=lambda c=city: self.search_city(c),
-                               padx=12,  # Less padding
-                               pady=6,   # Less padding
-                               relief="flat",
-                               cursor="hand2")
-            city_btn.pack(fill="x", pady=2)
+        # Holds the place of the city list until the gazetteer has loaded
+        self.cities_frame = tk.Frame(right_panel, bg="#16213e")
+        self.cities_frame.pack(fill="both", expand=True, padx=10)
+        self.cities_loading = tk.Label(self.cities_frame, text="Loading cities…",
+                                       font=("Arial", 9), bg="#16213e", fg="#89CFF0")
+        self.cities_loading.pack(pady=10)
         
         # Information section
-        info_frame = tk.Frame(scrollable_frame, bg="#16213e")
+        info_frame = tk.Frame(right_panel, bg="#16213e")
         info_frame.pack(fill="x", padx=10, pady=10)
         
         info_label = tk.Label(info_frame, text="ℹ️ Info", 
@@ -210,9 +340,6 @@ class WeatherApp:
                 bg="#16213e", fg="#89CFF0",
                 justify="left").pack(anchor="w")
         
-        # Add some spacing at the bottom
-        tk.Frame(scrollable_frame, bg="#16213e", height=20).pack()
-        
         # Footer - simplified
         footer_frame = tk.Frame(main_container, bg="#1a1a2e")
         footer_frame.pack(fill="x", pady=(10, 0))
@@ -221,285 +348,550 @@ class WeatherApp:
                 font=("Arial", 8),
                 bg="#1a1a2e", fg="#89CFF0").pack()
     
+    def setup_city_ui(self):
+        """Add the parts of the UI that need the city database"""
+        # Ranked, typo-tolerant suggestions once typing pauses
+        self.suggestions = typeahead.TypeAhead(
+            self.root, self.city_entry,
+            lambda text: [(f"{c.name}, {c.country}", c) for c in self.city_database.suggest(text)],
+            self.search_city)
+        
+        # Dashboard of pinned cities, shown in place of the weather panel
+        self.dashboard = dashboard.Dashboard(self.content_frame, self.weather_colors, self.weather_icons,
+                                             lambda key: self.show_city(self.places[key]))
+        self.dashboard.frame.grid(row=0, column=0, sticky="nsew", padx=(0, 5))
+        self.dashboard.frame.grid_remove()
+        
+        # Every city in name order; only the visible rows are drawn, so the
+        # list costs the same for ten cities or millions
+        rows = self.city_database.prefix_rows
+        
+        def row_text(i):
+            city = self.city_database.city(rows[i])
+            return f"{city.name}, {city.country}"
+        
+        self.city_list = citylist.VirtualList(self.cities_frame, len(rows), row_text,
+                                              lambda i: self.search_city(self.city_database.city(rows[i])))
+        self.city_list.pack(fill="both", expand=True)
+    
     def search_city(self, city):
-        """Search for a specific city"""
+        """Search for a city: a name as typed, or a gazetteer.City picked from a list"""
         self.city_entry.delete(0, tk.END)
-        self.city_entry.insert(0, city)
-        self.get_weather()
+        if isinstance(city, str):
+            self.city_entry.insert(0, city)
+            self.get_weather()
+        else:
+            self.city_entry.insert(0, f"{city.name}, {city.country}")
+            self.get_weather(city)
     
-    def get_weather(self):
-        """Get weather data for the entered city"""
+    def resolve_place(self, text):
+        """The place a typed name stands for, or None if the simulator has no such city
+        
+        "Name, Country" as shown in the lists picks that country's city;
+        remote providers take the text as it is.
+        """
+        if self.provider is not None:
+            return text
+        city = self.city_database.lookup(text)
+        if city is None and "," in text:
+            name, _, country = text.rpartition(",")
+            city = self.city_database.lookup(name.strip(), country)
+        return city
+    
+    @metrics.timed("get_weather", "Search handling on the Tk thread")
+    def get_weather(self, place=None):
+        """Get weather data for the entered city, or for place if one was picked"""
         city = self.city_entry.get().strip()
-        if not city:
+        if place is None and not city:
             self.show_message("Please enter a city name!", "warning")
             return
-        
-        # Generate realistic weather data
-        weather_data = self.generate_realistic_weather(city)
-        self.display_weather(weather_data)
+        if not self.ready:
+            # Run once the city database is up; only the latest search counts
+            self.pending_search = city
+            if self.core_error is not None:
+                self.show_message(f"City data unavailable ({self.core_error}), retrying", "warning")
+                self.cities_loading.config(text="Loading cities…")
+                self.start_core_load()
+            return
+        self.suggestions.hide()
+        if place is None:
+            place = self.resolve_place(city)
+        
+        # The simulator only knows gazetteer cities: take the closest match
+        # for a misspelt name rather than inventing a place at 0°/UTC
+        if place is None:
+            matches = self.city_database.suggest(city, limit=1)
+            if not matches:
+                self.show_message(f"No city called '{city}'", "warning")
+                return
+            place = matches[0]
+            self.show_message(f"Showing {place.name}, {place.country} for '{city}'")
+            self.city_entry.delete(0, tk.END)
+            self.city_entry.insert(0, f"{place.name}, {place.country}")
+        
+        # Generated off the Tk thread and served from the observation cache
+        # while the time bucket lasts; a newer search supersedes this one
+        key = gazetteer.place_key(place)
+        self.search_started = time.perf_counter()
+        self.root.config(cursor="watch")
+        self.fetcher.submit(lambda: self.cache.get(key, lambda ts: self.fetch_weather(place, ts)),
+                            lambda data: self.on_weather_ready(data, key), self.on_weather_error,
+                            channel="search")
+        self.follow_city(place)
     
-    def generate_realistic_weather(self, city):
-        """Generate realistic weather data based on city parameters"""
-        now = datetime.now()
-        month = now.month
-        hour = now.hour
-        
-        # Determine season
-        if month in [12, 1, 2]:
-            season = "winter"
-        elif month in [3, 4, 5]:
-            season = "spring"
-        elif month in [6, 7, 8]:
-            season = "summer"
-        else:
-            season = "autumn"
+    def follow_city(self, city):
+        """Keep the displayed city refreshing in place of the previous one"""
+        previous, key = self.current_key, gazetteer.place_key(city)
+        self.current_city, self.current_key = city, key
+        if previous is not None and previous != key and previous not in self.pinned:
+            self.scheduler.unpin(previous)
+            self.places.pop(previous, None)
+        self.places[key] = city
+        if not self.scheduler.is_pinned(key):
+            self.scheduler.pin(key)
+        self.pin_btn.config(text="📌 Unpin" if key in self.pinned else "📌 Pin")
+    
+    def pin_city(self, city, interval=None):
+        """Refresh city every interval seconds (the scheduler default if None) and give it a tile"""
+        key = gazetteer.place_key(city)
+        self.pinned[key] = interval
+        self.places.setdefault(key, city)
+        self.scheduler.pin(key, interval)
+        self.update_tiles()
+        self.fill_dashboard()
+    
+    def unpin_city(self, city):
+        key = gazetteer.place_key(city)
+        self.pinned.pop(key, None)
+        if key != self.current_key:
+            self.scheduler.unpin(key)
+            self.places.pop(key, None)
+        self.update_tiles()
+    
+    def update_tiles(self):
+        """Give the dashboard one tile per pinned city"""
+        self.dashboard.set_cities([(key, gazetteer.place_name(self.places[key])) for key in self.pinned])
+    
+    def fill_dashboard(self):
+        """Load tiles that have no data yet in one batch instead of waiting for their refresh"""
+        missing = self.dashboard.missing()
+        if not missing:
+            return
         
-        # Get city info
-        city_info = self.city_database.get(city, {"country": "??", "lat": 0, "lon": 0, "timezone": 0})
+        places = {key: self.places[key] for key in missing}
         
-        # Calculate temperature based on latitude
-        lat = abs(city_info["lat"])
-        if lat > 50:
-            temp_mod = -5
-        elif lat > 35:
-            temp_mod = 0
-        else:
-            temp_mod = 10
-        
-        # Southern hemisphere adjustment
-        if city_info["lat"] < 0:
-            if season == "winter":
-                season = "summer"
-            elif season == "summer":
-                season = "winter"
-            elif season == "spring":
-                season = "autumn"
-            else:
-                season = "spring"
-        
-        # Base temperature
-        min_temp, max_temp = self.seasonal_temps[season]
-        base_temp = random.uniform(min_temp, max_temp) + temp_mod
-        
-        # Time of day effect
-        if 0 <= hour < 6:
-            base_temp -= random.uniform(3, 8)
-        elif 6 <= hour < 12:
-            base_temp -= random.uniform(0, 3)
-        elif 12 <= hour < 18:
-            base_temp += random.uniform(0, 5)
-        else:
-            base_temp -= random.uniform(1, 4)
-        
-        # Determine weather conditions
-        if season == "winter":
-            conditions = ["Clear", "Clouds", "Snow", "Mist"]
-            weights = [0.2, 0.4, 0.3, 0.1]
-        elif season == "spring":
-            conditions = ["Clear", "Clouds", "Rain", "Drizzle"]
-            weights = [0.3, 0.4, 0.2, 0.1]
-        elif season == "summer":
-            conditions = ["Clear", "Clouds", "Thunderstorm"]
-            weights = [0.6, 0.3, 0.1]
-        else:
-            conditions = ["Clear", "Clouds", "Rain", "Mist"]
-            weights = [0.3, 0.4, 0.2, 0.1]
-        
-        main_weather = random.choices(conditions, weights=weights)[0]
+        def show(results):
+            for key, data in zip(places, results):
+                if not isinstance(data, Exception):
+                    self.dashboard.update(key, data)
+            self.report_failures(places, results)
         
-        # Temperature adjustment based on weather
-        if main_weather in ["Rain", "Snow", "Thunderstorm"]:
-            temp = base_temp - random.uniform(3, 8)
-        elif main_weather == "Clouds":
-            temp = base_temp - random.uniform(1, 3)
+        self.fetcher.submit(lambda: self.fetch_cached_many(places), show,
+                            lambda error: self.report_failures(places, [error] * len(places)),
+                            channel="dashboard")
+    
+    def toggle_dashboard(self):
+        """Switch the main area between the selected city and the pinned-city tiles"""
+        if self.dashboard is None:
+            return
+        if self.dashboard.frame.winfo_ismapped():
+            self.show_city()
+        else:
+            self.weather_frame.grid_remove()
+            self.dashboard.frame.grid()
+            self.view_btn.config(text="🌤️ City")
+            self.fill_dashboard()
+    
+    def show_city(self, city=None):
+        """Show the weather panel, switching to city if given"""
+        if self.dashboard is not None:
+            self.dashboard.frame.grid_remove()
+        self.weather_frame.grid()
+        self.view_btn.config(text="▦ Dashboard")
+        if city is not None:
+            self.search_city(city)
+    
+    def toggle_pin(self):
+        """Pin or unpin the displayed city"""
+        city = self.current_city
+        if city is None:
+            return
+        if self.current_key in self.pinned:
+            self.unpin_city(city)
         else:
-            temp = base_temp + random.uniform(0, 5)
+            self.pin_city(city)
+        self.pin_btn.config(text="📌 Unpin" if self.current_key in self.pinned else "📌 Pin")
+    
+    def refresh_cities(self, keys, done):
+        """Regenerate a batch of due cities off-thread (called by the scheduler)"""
+        places = {key: self.places[key] for key in keys}
         
-        # Weather description
-        description = random.choice(self.weather_descriptions.get(main_weather, ["Fair"]))
+        def finished(results):
+            done()
+            self.on_cities_refreshed(places, results)
         
-        # Additional parameters
-        feels_like = temp - random.uniform(1, 3) if temp > 0 else temp - random.uniform(0.5, 1.5)
-        humidity = random.randint(60, 95) if main_weather in ["Rain", "Snow", "Thunderstorm"] else random.randint(40, 75)
-        pressure = random.randint(1000, 1020)
+        def failed(error):
+            done()
+            self.report_failures(places, [error] * len(places))
         
-        # Wind speed
-        if main_weather == "Thunderstorm":
-            wind_speed = random.uniform(15, 35)
-        elif main_weather in ["Rain", "Snow"]:
-            wind_speed = random.uniform(10, 25)
+        self.fetcher.submit(lambda: self.fetch_cached_many(places), finished, failed, channel="refresh")
+    
+    def on_cities_refreshed(self, places, results):
+        """Show refreshed data in the panel and dashboard tiles (runs on the Tk thread)"""
+        for key, data in zip(places, results):
+            if isinstance(data, Exception):
+                continue
+            self.dashboard.update(key, data)
+            if key == self.current_key:
+                self.display_weather(data)
+        self.report_failures(places, results)
+    
+    def report_failures(self, places, results):
+        """Warn about the cities (key -> place) whose result is an error; their last good data stays up"""
+        failed = [(place, error) for place, error in zip(places.values(), results)
+                  if isinstance(error, Exception)]
+        if failed:
+            names = ", ".join(gazetteer.place_name(place) for place, _ in failed)
+            self.show_message(f"Could not refresh {names}: {failed[0][1]}", "warning")
+    
+    def on_weather_ready(self, weather_data, key=None):
+        """Show a finished fetch, and on key's tile if given (runs on the Tk thread)"""
+        self.root.config(cursor="")
+        self.display_weather(weather_data)
+        if key is not None:
+            self.dashboard.update(key, weather_data)
+        if self.startup['first_weather_ms'] is None:
+            self.startup['first_weather_ms'] = round((time.perf_counter() - STARTED) * 1000, 1)
+        if metrics.REGISTRY.enabled and self.search_started is not None:
+            metrics.REGISTRY.histogram("search_to_display").observe(time.perf_counter() - self.search_started)
+        self.search_started = None
+    
+    def on_weather_error(self, error):
+        """Report a failed fetch (runs on the Tk thread)"""
+        self.root.config(cursor="")
+        self.show_message(f"Could not load weather: {error}", "warning")
+    
+    def fetch_cached_many(self, places):
+        """Observations for places (key -> place) from the cache, generating the missing ones in one batch"""
+        # The cache is keyed on place keys; the places themselves go to the
+        # provider, and from there to the display and the history
+        return self.cache.get_many(list(places),
+                                   lambda missing, ts: self.fetch_weather_many([places[k] for k in missing], ts))
+    
+    @metrics.timed("fetch_weather", "Observation plus forecast for one city")
+    def fetch_weather(self, city, timestamp=None):
+        """Current observation plus the upcoming hours for a city (a name or gazetteer.City)"""
+        if self.provider is not None:
+            # Remote backends report the current observation only
+            weather_data = self.provider_thread.run(self.provider.current(gazetteer.place_name(city)))
         else:
-            wind_speed = random.uniform(0, 15)
-        
-        # Sunrise and sunset
-        sunrise_hour = 6 + random.randint(-1, 1)
-        sunset_hour = 18 + random.randint(-1, 1)
-        
-        if season == "summer":
-            sunrise_hour -= 1
-            sunset_hour += 1
-        elif season == "winter":
-            sunrise_hour += 1
-            sunset_hour -= 1
-        
-        sunrise_time = now.replace(hour=sunrise_hour, minute=random.randint(0, 59))
-        sunset_time = now.replace(hour=sunset_hour, minute=random.randint(0, 59))
-        
-        tz_offset = city_info.get("timezone", 0)
-        sunrise_time += timedelta(hours=tz_offset)
-        sunset_time += timedelta(hours=tz_offset)
-        
-        return {
-            'name': city,
-            'sys': {'country': city_info["country"]},
-            'main': {
-                'temp': round(temp, 1),
-                'feels_like': round(feels_like, 1),
-                'humidity': humidity,
-                'pressure': pressure
-            },
-            'wind': {'speed': round(wind_speed, 1)},
-            'weather': [{
-                'description': description,
-                'main': main_weather
-            }],
-            'sys_data': {
-                'sunrise': sunrise_time,
-                'sunset': sunset_time
-            },
-            'timezone': tz_offset,
-            'season': season
-        }
+            weather_data = self.generate_realistic_weather(city, timestamp)
+            weather_data['hourly'] = self.generate_forecast(city, now=timestamp)
+        if self.history is not None:
+            self.history.record([weather_data], timestamp)
+        return weather_data
     
-    def display_weather(self, data):
-        """Display weather information in the main frame"""
-        # Clear previous content
-        for widget in self.weather_frame.winfo_children():
-            widget.destroy()
-        
-        # Extract data
-        city = data['name']
-        country = data['sys']['country']
-        temp = data['main']['temp']
-        feels_like = data['main']['feels_like']
-        humidity = data['main']['humidity']
-        pressure = data['main']['pressure']
-        wind_speed = data['wind']['speed']
-        description = data['weather'][0]['description']
-        main_weather = data['weather'][0]['main']
+    @metrics.timed("fetch_weather_many", "Observations plus forecasts for a refresh batch")
+    def fetch_weather_many(self, cities, timestamp=None):
+        """fetch_weather for many cities with one simulation and one forecast call
+
+        A city a remote provider failed on gets its ProviderError in place of
+        the observation; only the observations are recorded.
+        """
+        if self.provider is not None:
+            observations = self.provider_thread.run(
+                self.provider.current_many([gazetteer.place_name(c) for c in cities]))
+        else:
+            observations = self.simulation.observe_many(cities, timestamp)
+            for data, hourly in zip(observations, self.generate_forecasts(cities, now=timestamp)):
+                data['hourly'] = hourly
+        if self.history is not None:
+            self.history.record([data for data in observations if not isinstance(data, Exception)],
+                                timestamp)
+        return observations
+    
+    @metrics.timed("generate_realistic_weather", "Simulated observation for one city")
+    def generate_realistic_weather(self, city, timestamp=None):
+        """Generate realistic weather data based on city parameters"""
+        return self.simulation.observe(city, timestamp)
+    
+    def generate_forecast(self, city, hours=24, step=3, now=None):
+        """Upcoming hourly forecast points for a city, every `step` hours"""
+        return self.generate_forecasts([city], hours, step, now)[0]
+    
+    @metrics.timed("generate_forecasts", "Hourly forecast points")
+    def generate_forecasts(self, cities, hours=24, step=3, now=None):
+        """generate_forecast for several cities from one vectorized forecast"""
+        resolved = [self.simulation.resolve(city) for city in cities]
+        infos = [info for info, _ in resolved]
+        now = int(time.time()) if now is None else int(now)
+        # Paths depend on the absolute hour only, so starting at the current
+        # hour continues the one the observation above was taken from
+        start = now - now % 3600
+        keys = [key for _, key in resolved]
+        columns = ([c.lat for c in infos], [c.lon for c in infos], [c.timezone for c in infos])
+        fc = self.stream.forecast(keys, *columns, start, hours=hours + 1, climate=self.climate)
+        # The ensemble's member 0 is the path above; the others give its spread
+        bands = None
+        if self.ensemble_members:
+            bands = ensemble.ensemble_batch(self.stream, keys, *columns, start, hours=hours + 1,
+                                            members=self.ensemble_members, climate=self.climate, workers=1)
+        hour_range = range(step, hours + 1, step)
+        times = fc['time'].tolist()
+        out = []
+        for i, city_info in enumerate(infos):
+            tz = dt_timezone(timedelta(hours=city_info.timezone))
+            points = []
+            for h in hour_range:
+                point = {
+                    'time': datetime.fromtimestamp(int(times[h]), tz),
+                    'temp': round(float(fc['temp'][i, h]), 1),
+                    'main': simulator.CONDITIONS[fc['condition'][i, h]]
+                }
+                if bands is not None:
+                    point['temp_p10'] = round(float(bands['temp_p10'][i, h]), 1)
+                    point['temp_p90'] = round(float(bands['temp_p90'][i, h]), 1)
+                    point['precip_prob'] = round(float(bands['precip_prob'][i, h]), 2)
+                points.append(point)
+            out.append(points)
+        return out
+    
+    def build_weather_panel(self):
+        """Create the weather panel widgets once; display_weather only updates them"""
+        panel = {}
         
-        # Get colors
-        bg_color = self.weather_colors.get(main_weather, self.weather_colors["default"])
-        self.weather_frame.config(bg=bg_color)
+        def add(name, widget):
+            panel[name] = widget
+            self.render_stats['widgets_created'] += 1
+            return widget
         
-        # Create main container with scroll if needed
-        container = tk.Frame(self.weather_frame, bg=bg_color)
+        # Main container
+        container = add('container', tk.Frame(self.weather_frame))
         container.pack(fill="both", expand=True, padx=10, pady=10)
         
         # City and country - smaller
-        icon_emoji = self.weather_icons.get(main_weather, "🌤️")
-        
-        city_label = tk.Label(container, 
-                             text=f"{icon_emoji} {city}, {country}",
-                             font=("Helvetica", 18, "bold"),  # Smaller
-                             bg=bg_color, fg="#333333")
-        city_label.pack(pady=(5, 5))
+        add('city', tk.Label(container, font=("Helvetica", 18, "bold"),  # Smaller
+                             fg="#333333")).pack(pady=(5, 5))
         
         # Temperature - smaller
-        temp_label = tk.Label(container,
-                             text=f"{temp:.1f}°C",
-                             font=("Helvetica", 48, "bold"),  # Smaller
-                             bg=bg_color, fg="#FF4500")
-        temp_label.pack(pady=5)
+        add('temp', tk.Label(container, font=("Helvetica", 48, "bold"),  # Smaller
+                             fg="#FF4500")).pack(pady=5)
         
         # Description
-        desc_label = tk.Label(container,
-                             text=description,
-                             font=("Helvetica", 14),  # Smaller
-                             bg=bg_color, fg="#555555")
-        desc_label.pack(pady=5)
+        add('description', tk.Label(container, font=("Helvetica", 14),  # Smaller
+                                    fg="#555555")).pack(pady=5)
         
         # Feels like
-        feels_label = tk.Label(container,
-                              text=f"Feels like: {feels_like:.1f}°C",
-                              font=("Helvetica", 12),  # Smaller
-                              bg=bg_color, fg="#666666")
-        feels_label.pack(pady=5)
+        add('feels', tk.Label(container, font=("Helvetica", 12),  # Smaller
+                              fg="#666666")).pack(pady=5)
         
         # Separator
         separator = tk.Frame(container, bg="#E0E0E0", height=1)
         separator.pack(fill="x", pady=10)
+        self.render_stats['widgets_created'] += 1
         
-        # Weather details - compact grid
-        details_frame = tk.Frame(container, bg=bg_color)
+        # Weather details - compact 2x2 grid
+        details_frame = add('details', tk.Frame(container))
         details_frame.pack(pady=5)
         
-        # Create 2x2 grid for details
-        details = [
-            ("💧 Humidity", f"{humidity}%"),
-            ("💨 Wind", f"{wind_speed} km/h"),
-            ("📊 Pressure", f"{pressure} hPa"),
-            ("🌡️ Feels", f"{feels_like:.1f}°C"),
-        ]
-        
-        for i, (icon_text, value_text) in enumerate(details):
-            row = i // 2
-            col = i % 2
-            
-            detail_frame = tk.Frame(details_frame, bg=bg_color)
-            detail_frame.grid(row=row, column=col, padx=10, pady=5, sticky="w")
+        for i, icon_text in enumerate(self.DETAIL_LABELS):
+            detail_frame = add(f'detail{i}', tk.Frame(details_frame))
+            detail_frame.grid(row=i // 2, column=i % 2, padx=10, pady=5, sticky="w")
             
             # Icon and label
-            icon_label = tk.Label(detail_frame, text=icon_text,
-                                 font=("Arial", 10),  # Smaller
-                                 bg=bg_color, fg="#2c3e50")
-            icon_label.pack(anchor="w")
+            add(f'detail{i}_icon', tk.Label(detail_frame, text=icon_text,
+                                            font=("Arial", 10),  # Smaller
+                                            fg="#2c3e50")).pack(anchor="w")
             
             # Value
-            value_label = tk.Label(detail_frame, text=value_text,
-                                  font=("Arial", 11, "bold"),  # Smaller
-                                  bg=bg_color, fg="#2c3e50")
-            value_label.pack(anchor="w")
+            add(f'detail{i}_value', tk.Label(detail_frame,
+                                             font=("Arial", 11, "bold"),  # Smaller
+                                             fg="#2c3e50")).pack(anchor="w")
         
         # Sunrise and sunset - compact
-        time_frame = tk.Frame(container, bg=bg_color)
+        time_frame = add('time', tk.Frame(container))
         time_frame.pack(pady=10)
-        
-        sunrise_time = data['sys_data']['sunrise'].strftime("%H:%M")
-        sunset_time = data['sys_data']['sunset'].strftime("%H:%M")
-        
-        sun_frame = tk.Frame(time_frame, bg=bg_color)
+        sun_frame = add('sun', tk.Frame(time_frame))
         sun_frame.pack()
-        
-        sunrise_label = tk.Label(sun_frame, text=f"🌅 {sunrise_time}",
-                                font=("Arial", 10),  # Smaller
-                                bg=bg_color, fg="#2c3e50")
-        sunrise_label.pack(side="left", padx=(0, 15))
-        
-        sunset_label = tk.Label(sun_frame, text=f"🌇 {sunset_time}",
-                               font=("Arial", 10),  # Smaller
-                               bg=bg_color, fg="#2c3e50")
-        sunset_label.pack(side="left")
+        add('sunrise', tk.Label(sun_frame, font=("Arial", 10),  # Smaller
+                                fg="#2c3e50")).pack(side="left", padx=(0, 15))
+        add('sunset', tk.Label(sun_frame, font=("Arial", 10),  # Smaller
+                               fg="#2c3e50")).pack(side="left")
+        
+        # Upcoming hours - compact strip with a fixed number of slots
+        hourly_frame = add('hourly', tk.Frame(container))
+        hourly_frame.pack(pady=(0, 5))
+        for i in range(self.HOURLY_SLOTS):
+            add(f'hour{i}', tk.Label(hourly_frame, font=("Arial", 8),
+                                     fg="#2c3e50")).pack(side="left", padx=4)
         
         # Additional info - smaller
-        info_frame = tk.Frame(container, bg=bg_color)
+        info_frame = add('info_frame', tk.Frame(container))
         info_frame.pack(pady=5)
+        add('info', tk.Label(info_frame, font=("Arial", 8, "italic"),  # Smaller
+                             fg="#7f8c8d")).pack()
+        
+        # Update time - smaller
+        add('updated', tk.Label(container, font=("Arial", 8),  # Smaller
+                                fg="#95a5a6")).pack(pady=(5, 0))
+        
+        self.panel = panel
+        self.panel_state = {}
+    
+    def panel_view(self, data):
+        """Desired text and colours of every panel widget for an observation"""
+        # Extract data
+        city = data['name']
+        country = data['sys']['country']
+        temp = data['main']['temp']
+        feels_like = data['main']['feels_like']
+        humidity = data['main']['humidity']
+        pressure = data['main']['pressure']
+        wind_speed = data['wind']['speed']
+        description = data['weather'][0]['description']
+        main_weather = data['weather'][0]['main']
+        
+        # Get colors
+        bg_color = self.weather_colors.get(main_weather, self.weather_colors["default"])
+        icon_emoji = self.weather_icons.get(main_weather, "🌤️")
         
         season = data.get('season', 'Unknown')
         timezone = data.get('timezone', 0)
         tz_text = f"UTC{'+' if timezone >= 0 else ''}{timezone}"
         
-        info_label = tk.Label(info_frame, text=f"Season: {season.title()} • TZ: {tz_text}",
-                             font=("Arial", 8, "italic"),  # Smaller
-                             bg=bg_color, fg="#7f8c8d")
-        info_label.pack()
+        texts = {
+            'city': f"{icon_emoji} {city}, {country}",
+            'temp': f"{temp:.1f}°C",
+            'description': description,
+            'feels': f"Feels like: {feels_like:.1f}°C",
+            'detail0_value': f"{humidity}%",
+            'detail1_value': f"{wind_speed} km/h",
+            'detail2_value': f"{pressure} hPa",
+            'detail3_value': f"{feels_like:.1f}°C",
+            'sunrise': f"🌅 {data['sys_data']['sunrise'].strftime('%H:%M')}",
+            'sunset': f"🌇 {data['sys_data']['sunset'].strftime('%H:%M')}",
+            'info': f"Season: {season.title()} • TZ: {tz_text}",
+            'updated': f"Updated: {datetime.now().strftime('%H:%M:%S')}",
+        }
         
-        # Update time - smaller
-        update_time = datetime.now().strftime("%H:%M:%S")
-        update_label = tk.Label(container, text=f"Updated: {update_time}",
-                               font=("Arial", 8),  # Smaller
-                               bg=bg_color, fg="#95a5a6")
-        update_label.pack(pady=(5, 0))
+        hourly = data.get('hourly', [])
+        for i in range(self.HOURLY_SLOTS):
+            if i < len(hourly):
+                point = hourly[i]
+                text = (f"{point['time'].strftime('%H:%M')}\n"
+                        f"{self.weather_icons.get(point['main'], '🌤️')}\n"
+                        f"{point['temp']:.0f}°")
+                if 'temp_p10' in point:
+                    # Ensemble spread: P10-P90 range and chance of precipitation
+                    text += f"\n{point['temp_p10']:.0f}…{point['temp_p90']:.0f}°\n💧{point['precip_prob']:.0%}"
+                texts[f'hour{i}'] = text
+            else:
+                texts[f'hour{i}'] = ""
+        
+        # Every panel widget takes the condition colour as its background
+        view = {name: {'bg': bg_color} for name in self.panel}
+        for name, text in texts.items():
+            view[name]['text'] = text
+        return bg_color, view
+    
+    @metrics.timed("display_weather", "Weather panel update")
+    def display_weather(self, data):
+        """Display weather information, reconfiguring only what changed"""
+        started = time.perf_counter()
+        if self.panel is None:
+            self.build_weather_panel()
+        
+        bg_color, view = self.panel_view(data)
+        if self.panel_state.get('weather_frame') != bg_color:
+            self.weather_frame.config(bg=bg_color)
+            self.panel_state['weather_frame'] = bg_color
+            self.render_stats['config_calls'] += 1
+        
+        # Diff against what was last applied and send one config per widget
+        for name, options in view.items():
+            applied = self.panel_state.setdefault(name, {})
+            changed = {k: v for k, v in options.items() if applied.get(k) != v}
+            if changed:
+                self.panel[name].config(**changed)
+                applied.update(changed)
+                self.render_stats['config_calls'] += 1
+        
+        self.render_stats['renders'] += 1
+        self.render_stats['last_ms'] = (time.perf_counter() - started) * 1000
+    
+    def register_metrics(self):
+        """Report component counters in metrics snapshots"""
+        register = metrics.REGISTRY.register
+        register("cache", self.cache.stats)
+        register("render", lambda: dict(self.render_stats, widgets=count_widgets(self.root)))
+        register("city_list", lambda: self.city_list.stats)
+        register("dashboard", lambda: self.dashboard.stats)
+        register("typeahead", lambda: self.suggestions.stats)
+        register("fetcher", lambda: {'pending': self.fetcher.pending, 'dropped': self.fetcher.dropped})
+        register("scheduler", self.scheduler.stats)
+        register("sun_table", self.simulation.sun.stats)
+        register("startup", lambda: {k: v for k, v in self.startup.items() if v is not None})
+        if self.history is not None:
+            register("history", self.history.stats)
+    
+    def toggle_metrics_overlay(self):
+        """Show or hide the metrics overlay; collection runs while it is shown"""
+        if self.metrics_overlay is None:
+            self.metrics_overlay = tk.Label(self.root, font=("Courier", 8), justify="left",
+                                            anchor="nw", bg="#000000", fg="#7CFC00", padx=6, pady=4)
+            self.metrics_were_enabled = metrics.REGISTRY.enabled
+            metrics.enable()
+            self.metrics_overlay.place(relx=1.0, rely=0.0, anchor="ne")
+            self.update_metrics_overlay()
+        else:
+            metrics.enable(self.metrics_were_enabled)
+            self.metrics_overlay.destroy()
+            self.metrics_overlay = None
+    
+    def update_metrics_overlay(self):
+        """Redraw the overlay twice a second while it is shown"""
+        if self.metrics_overlay is None:
+            return
+        snapshot = metrics.REGISTRY.snapshot()
+        lines = [f"{'latency':<27}{'n':>6}{'p50 ms':>9}{'p95 ms':>9}"]
+        for name, summary in snapshot['latency'].items():
+            if summary['count']:
+                lines.append(f"{name:<27}{summary['count']:>6}{summary['p50_ms']:>9.2f}{summary['p95_ms']:>9.2f}")
+        cache_stats = snapshot['sources'].get('cache', {})
+        render = snapshot['sources'].get('render', {})
+        lines.append(f"cache hit rate {cache_stats.get('hit_rate', 0):.0%}  size {cache_stats.get('size', 0)}")
+        lines.append(f"widgets {render.get('widgets', 0)}  created {render.get('widgets_created', 0)}  "
+                     f"list items {self.city_list.stats['items_created'] if self.city_list else 0}")
+        lines.append("startup " + "  ".join(f"{k[:-3].replace('_', ' ')} {v:.0f} ms"
+                                            for k, v in self.startup.items() if v is not None))
+        self.metrics_overlay.config(text="\n".join(lines))
+        self.metrics_overlay.lift()
+        self.root.after(500, self.update_metrics_overlay)
+    
+    def write_metrics(self):
+        """Write a metrics snapshot to metrics_path and schedule the next one"""
+        try:
+            metrics.REGISTRY.write(self.metrics_path)
+        except OSError:
+            pass
+        self.root.after(15000, self.write_metrics)
+    
+    def close(self):
+        """Stop background work and close the window"""
+        if self.metrics_path:
+            try:
+                metrics.REGISTRY.write(self.metrics_path)
+            except OSError:
+                pass
+        if self.scheduler is not None:
+            self.scheduler.stop()
+        self.fetcher.shutdown()
+        if self.provider_thread is not None:
+            self.provider_thread.run(self.provider.close(), timeout=1)
+            self.provider_thread.stop()
+        if self.history is not None:
+            self.history.close()
+        self.root.destroy()
     
     def show_message(self, message, msg_type="info"):
         """Show message to user"""
@@ -516,10 +908,54 @@ class WeatherApp:
         
         self.root.after(3000, msg_frame.destroy)
 
+def count_widgets(widget):
+    """Widgets in a Tk tree, including the root"""
+    return 1 + sum(count_widgets(w) for w in widget.winfo_children())
+
 # Run the application
 if __name__ == "__main__":
+    # Headless export: python Weather.py export [options], see export.py
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        import export
+        sys.exit(export.main(sys.argv[2:]))
+
     root = tk.Tk()
-    app = WeatherApp(root)
+    # Optional gazetteer (cities.gaz or a GeoNames dump) as the first argument,
+    # and an optional OpenWeatherMap-compatible backend and climatology grid from the environment
+    provider = None
+    if os.environ.get("SKYCAST_API_URL"):
+        provider = providers.HTTPProvider(os.environ["SKYCAST_API_URL"],
+                                          api_key=os.environ.get("SKYCAST_API_KEY"))
+    # Cities to keep refreshed, e.g. SKYCAST_PINNED="Istanbul,Paris:30,Tokyo:120"
+    # (optional per-city interval in seconds after a colon; a malformed one
+    # falls back to the default interval)
+    pinned = {}
+    for entry in filter(None, os.environ.get("SKYCAST_PINNED", "").split(",")):
+        name, _, seconds = entry.partition(":")
+        try:
+            interval = float(seconds) if seconds.strip() else None
+        except ValueError:
+            interval = None
+        if interval is not None and not 0 < interval < float("inf"):
+            interval = None
+        if name.strip():
+            pinned[name.strip()] = interval
+    # Observation history, on by default; SKYCAST_HISTORY="" turns it off
+    history_path = os.environ.get("SKYCAST_HISTORY",
+                                  os.path.join(os.path.expanduser("~"), ".skycast", "history.db"))
+    # Ensemble members behind the forecast bands; SKYCAST_ENSEMBLE=0 turns them
+    # off, and a malformed value falls back to the default
+    try:
+        ensemble_members = max(0, int(os.environ.get("SKYCAST_ENSEMBLE", "50") or 0))
+    except ValueError:
+        print(f"SKYCAST_ENSEMBLE={os.environ['SKYCAST_ENSEMBLE']!r} is not a member count; using 50",
+              file=sys.stderr)
+        ensemble_members = 50
+    app = WeatherApp(root, gazetteer_path=sys.argv[1] if len(sys.argv) > 1 else None,
+                     provider=provider, climatology_path=os.environ.get("SKYCAST_CLIMATOLOGY"),
+                     pinned=pinned, history_path=history_path or None,
+                     metrics_path=os.environ.get("SKYCAST_METRICS_FILE"),
+                     ensemble_members=ensemble_members)
     
     # Make window resizable
     root.resizable(True, True)
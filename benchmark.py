@@ -0,0 +1,393 @@
+"""Reproducible benchmarks for SkyCast's hot paths
+
+Runs headless and prints one JSON document (or writes it with --output):
+
+    python benchmark.py                 # full run
+    python benchmark.py --quick         # smaller sizes, for a smoke check
+    python benchmark.py --gazetteer cities.gaz --output bench.json
+
+UI benchmarks need a display (a real one or e.g. ``xvfb-run``); without
+one they are reported as skipped rather than failing the run. All random
+inputs come from fixed seeds so runs are comparable.
+"""
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone as dt_timezone
+import http.client
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+import tracemalloc
+from urllib.parse import quote
+
+import numpy as np
+
+import climatology
+import ensemble
+import forecast
+import gazetteer
+import providers
+import simulator
+import streams
+
+SEED = 1234
+TIMESTAMP = 1768487400  # 2026-01-15 14:30 UTC
+
+
+def timings(fn, repeat, number=1):
+    """Run fn number times per sample; return per-call seconds for each sample"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+def summarize(samples):
+    """Median/p95/min of per-call seconds, reported in microseconds"""
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        'median_us': round(statistics.median(ordered) * 1e6, 3),
+        'p95_us': round(p95 * 1e6, 3),
+        'min_us': round(ordered[0] * 1e6, 3),
+        'samples': len(ordered),
+    }
+
+
+def peak_traced(fn):
+    """Peak Python-allocated bytes (NumPy included) while fn runs"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def random_cities(n, seed=SEED):
+    """Reproducible lat/lon/timezone columns for n synthetic cities"""
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-60, 70, n)
+    lon = rng.uniform(-180, 180, n)
+    return lat, lon, np.round(lon / 15)
+
+
+def bench_single(quick):
+    """Latency of one observation, as the app produces it"""
+    sim = providers.SimulatorProvider(gazetteer.builtin(), streams.KeyedStream(SEED))
+    repeat = 200 if quick else 2000
+    return {
+        'observe': summarize(timings(lambda: sim.observe("Istanbul", TIMESTAMP), repeat)),
+        'observe_unknown_city': summarize(timings(lambda: sim.observe("Atlantis", TIMESTAMP), repeat)),
+    }
+
+
+def bench_batch(quick):
+    """Rows per second for batch simulation and forecasts across sizes"""
+    sizes = [1_000, 10_000, 100_000] if quick else [1_000, 10_000, 100_000, 1_000_000]
+    stream = streams.KeyedStream(SEED)
+    climate = climatology.default()
+    results = {'simulate': [], 'simulate_keyed': [], 'simulate_climate': [], 'forecast': []}
+    for n in sizes:
+        lat, lon, tz = random_cities(n)
+        keys = np.arange(n, dtype=np.uint64)
+        rng = np.random.default_rng(SEED)
+        t = min(timings(lambda: simulator.simulate_batch(lat, lon, tz, TIMESTAMP, rng=rng), 3))
+        results['simulate'].append({'rows': n, 'seconds': round(t, 6), 'rows_per_s': round(n / t)})
+        t = min(timings(lambda: stream.simulate(keys, lat, lon, tz, TIMESTAMP), 3))
+        results['simulate_keyed'].append({'rows': n, 'seconds': round(t, 6), 'rows_per_s': round(n / t)})
+        t = min(timings(lambda: stream.simulate(keys, lat, lon, tz, TIMESTAMP, climate=climate), 3))
+        results['simulate_climate'].append({'rows': n, 'seconds': round(t, 6), 'rows_per_s': round(n / t)})
+
+    days = 2 if quick else 16
+    for n in ([100, 1_000] if quick else [100, 1_000, 10_000]):
+        lat, lon, tz = random_cities(n)
+        rng = np.random.default_rng(SEED)
+        t = min(timings(lambda: forecast.forecast_batch(lat, lon, tz, TIMESTAMP, days, rng=rng), 2))
+        results['forecast'].append({'cities': n, 'hours': days * 24, 'seconds': round(t, 6),
+                                    'city_hours_per_s': round(n * days * 24 / t)})
+
+    n = sizes[-1]
+    lat, lon, tz = random_cities(n)
+    results['peak_bytes'] = {
+        'simulate_rows': n,
+        'simulate': peak_traced(lambda: stream.simulate(np.arange(n, dtype=np.uint64), lat, lon, tz, TIMESTAMP)),
+    }
+    return results
+
+
+def bench_ensemble(quick):
+    """Member-hours per second and peak memory of chunked ensemble forecasts"""
+    cities, members, hours = (20, 100, 240) if quick else (100, 1000, 240)
+    lat, lon, tz = random_cities(cities)
+    keys = np.arange(cities, dtype=np.uint64)
+    stream = streams.KeyedStream(SEED)
+    climate = climatology.default()
+    results = {'cities': cities, 'members': members, 'hours': hours}
+    for workers in sorted({1, os.cpu_count() or 1}):
+        t = min(timings(lambda: ensemble.ensemble_batch(stream, keys, lat, lon, tz, TIMESTAMP, hours, members,
+                                                        climate=climate, workers=workers), 1))
+        results[f'workers_{workers}'] = {'seconds': round(t, 3),
+                                         'member_hours_per_s': round(cities * members * hours / t)}
+    results['peak_bytes'] = peak_traced(lambda: ensemble.ensemble_batch(
+        stream, keys, lat, lon, tz, TIMESTAMP, hours, members, climate=climate, workers=1))
+    return results
+
+
+def service_client(port, names, seconds, seed):
+    """Load generator process: keep-alive GET /current until the deadline; returns answered requests"""
+    rng = np.random.default_rng(seed)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    answered = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        conn.request("GET", "/current?city=" + quote(names[rng.integers(len(names))]))
+        response = conn.getresponse()
+        response.read()
+        answered += response.status == 200
+    conn.close()
+    return answered
+
+
+def bench_service(quick):
+    """Requests per second through service.py as the worker count grows"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    cpus = os.cpu_count() or 1
+    seconds = 2 if quick else 10
+    # Enough clients to keep every worker busy, over enough names that
+    # most requests simulate rather than hit a cache
+    clients = max(4, 2 * cpus)
+    names = [f"Town {i}" for i in range(2000 if quick else 20000)]
+    results = {'clients': clients, 'seconds': seconds}
+    counts = sorted({1, 2, cpus})
+    for workers in counts:
+        server = subprocess.Popen([sys.executable, "service.py", "--port", "0", "--workers", str(workers)],
+                                  cwd=here, stderr=subprocess.PIPE, text=True)
+        try:
+            port = int(server.stderr.readline().split(":")[-1].split()[0])
+            service_client(port, names[:1], 0, SEED)
+            with ProcessPoolExecutor(clients) as pool:
+                answered = sum(pool.map(service_client, [port] * clients, [names] * clients,
+                                        [seconds] * clients, range(clients)))
+        finally:
+            server.terminate()
+            server.wait()
+        results[f'workers_{workers}'] = {'requests_per_s': round(answered / seconds)}
+    base = results['workers_1']['requests_per_s']
+    for workers in counts[1:]:
+        results[f'workers_{workers}']['speedup'] = round(results[f'workers_{workers}']['requests_per_s'] / base, 2)
+    return results
+
+
+def bench_lookup(quick, path=None):
+    """City lookup latency on the built-in or a supplied gazetteer"""
+    start = time.perf_counter()
+    gaz = gazetteer.load(path) if path else gazetteer.builtin()
+    opened = time.perf_counter() - start
+    rng = np.random.default_rng(SEED)
+    rows = rng.integers(0, len(gaz), 200 if quick else 1000)
+    names = [gaz.name(r) for r in rows]
+    prefixes = [n[:3] for n in names]
+    # Partly typed names with one character replaced
+    typos = [n[:5] if len(n) < 6 else n[:2] + "x" + n[3:] for n in names]
+    points = rng.uniform([-60, -180], [70, 180], (len(rows), 2))
+    it = iter(range(10 ** 9))
+
+    def cycle(seq):
+        return lambda: seq[next(it) % len(seq)]
+
+    name, prefix, typo, point = cycle(names), cycle(prefixes), cycle(typos), cycle(points)
+    repeat = len(rows)
+    return {
+        'source': path or 'builtin',
+        'cities': len(gaz),
+        'open_ms': round(opened * 1000, 3),
+        'table_bytes': gaz.nbytes,
+        'lookup': summarize(timings(lambda: gaz.lookup(name()), repeat)),
+        'prefix': summarize(timings(lambda: gaz.prefix(prefix()), repeat)),
+        'suggest': summarize(timings(lambda: gaz.suggest(typo()), repeat)),
+        'nearest': summarize(timings(lambda: gaz.nearest(*point()), repeat)),
+    }
+
+
+def bench_ui(quick):
+    """Render/refresh time and widget counts on a hidden Tk root"""
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+    except Exception as exc:
+        return {'skipped': f"no display: {exc}"}
+    app = None
+    try:
+        root.withdraw()
+        import Weather
+
+        app = Weather.WeatherApp(root, seed=SEED)
+        wait_until(root, lambda: app.ready)
+        cities = [c.name for c in app.city_database.most_populous(10)]
+        data = [app.fetch_weather(c, TIMESTAMP) for c in cities]
+
+        start = time.perf_counter()
+        app.display_weather(data[0])
+        root.update_idletasks()
+        first = time.perf_counter() - start
+
+        repeat = 50 if quick else 500
+        calls_before = app.render_stats['config_calls']
+        i = iter(range(10 ** 9))
+
+        def refresh():
+            app.display_weather(data[next(i) % len(data)])
+            root.update_idletasks()
+
+        switch = timings(refresh, repeat)
+        same = timings(lambda: (app.display_weather(data[0]), root.update_idletasks()), repeat)
+        
+        # City list scrolling one row at a time through the recycled rows
+        app.city_list.on_resize(SimpleNamespace(width=170, height=400))
+        scroll = timings(lambda: (app.city_list.scroll(1), root.update_idletasks()), repeat)
+        return {
+            'first_render_ms': round(first * 1000, 3),
+            'switch_city': summarize(switch),
+            'same_city': summarize(same),
+            'widgets_created': app.render_stats['widgets_created'],
+            'config_calls_per_render': round(
+                (app.render_stats['config_calls'] - calls_before) / (2 * repeat), 2),
+            'widgets_total': Weather.count_widgets(root),
+            'list_scroll': summarize(scroll),
+            'list_items': app.city_list.stats['items_created'],
+        }
+    finally:
+        if app is not None:
+            app.close()
+        else:
+            root.destroy()
+
+
+def wait_until(root, done, timeout=60):
+    """Run the Tk event loop until done() is true"""
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            raise RuntimeError("timed out waiting for the app")
+        root.update()
+        time.sleep(0.001)
+
+
+STARTUP_SNIPPET = """
+import sys
+import time
+t0 = time.perf_counter()
+import tkinter as tk
+import Weather
+t1 = time.perf_counter()
+root = tk.Tk()
+app = Weather.WeatherApp(root, gazetteer_path=sys.argv[1] if len(sys.argv) > 1 else None)
+# Inline rather than imported from benchmark, which would load NumPy here
+while app.startup['first_weather_ms'] is None:
+    if time.perf_counter() - t0 > 60:
+        sys.exit("timed out waiting for the first weather")
+    root.update()
+    time.sleep(0.001)
+app.close()
+# The app's marks count from its own import; shift them to process start
+offset = (Weather.STARTED - t0) * 1000
+marks = app.startup
+print(t1 - t0, (offset + marks['first_paint_ms']) / 1000, (offset + marks['interactive_ms']) / 1000,
+      (offset + marks['first_weather_ms']) / 1000)
+"""
+
+
+def bench_startup(quick, path=None):
+    """Fresh-process import time, first paint and time to interactive, optionally with a gazetteer"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for _ in range(2 if quick else 5):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", STARTUP_SNIPPET] + ([path] if path else []), cwd=here,
+                              capture_output=True, text=True)
+        wall = time.perf_counter() - start
+        if proc.returncode != 0:
+            return {'skipped': proc.stderr.strip().splitlines()[-1] if proc.stderr else 'failed'}
+        samples.append([float(x) for x in proc.stdout.split()] + [wall])
+    return {
+        'import_ms': round(statistics.median(s[0] for s in samples) * 1000, 3),
+        'first_paint_ms': round(statistics.median(s[1] for s in samples) * 1000, 3),
+        'interactive_ms': round(statistics.median(s[2] for s in samples) * 1000, 3),
+        'first_weather_ms': round(statistics.median(s[3] for s in samples) * 1000, 3),
+        'process_wall_ms': round(statistics.median(s[4] for s in samples) * 1000, 3),
+        'source': path or 'builtin',
+    }
+
+
+def environment():
+    """What the numbers were measured on"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        'timestamp': datetime.now(dt_timezone.utc).isoformat(timespec="seconds"),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def peak_rss_bytes():
+    """Peak resident set size of this process, where the platform reports it"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="SkyCast benchmarks")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes and fewer repeats")
+    parser.add_argument("--gazetteer", help="binary gazetteer or GeoNames dump for the lookup and startup benchmarks")
+    parser.add_argument("--only", nargs="+",
+                        choices=["single", "batch", "ensemble", "service", "lookup", "ui", "startup"],
+                        help="run only these sections")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    sections = {
+        'single': lambda: bench_single(args.quick),
+        'batch': lambda: bench_batch(args.quick),
+        'ensemble': lambda: bench_ensemble(args.quick),
+        'service': lambda: bench_service(args.quick),
+        'lookup': lambda: bench_lookup(args.quick, args.gazetteer),
+        'ui': lambda: bench_ui(args.quick),
+        'startup': lambda: bench_startup(args.quick, args.gazetteer),
+    }
+    report = {'environment': environment(), 'quick': args.quick}
+    for name, run in sections.items():
+        if args.only and name not in args.only:
+            continue
+        report[name] = run()
+    report['peak_rss_bytes'] = peak_rss_bytes()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
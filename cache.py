@@ -0,0 +1,128 @@
+"""Bounded TTL/LRU cache for simulated observations
+
+Entries are keyed on (city, time bucket): every lookup for the same city
+inside one bucket returns the stored observation, and the bucket start is
+handed to the compute function so the observation itself is a function of
+the key. Old buckets fall out through LRU eviction or their TTL, which is
+at most one bucket: a later bucket is a different key, so a longer TTL
+would never be consulted.
+
+Callers own what they get back. Values are copied on the way out
+(``copy.deepcopy`` unless another copy function is given), so a caller
+that edits its observation dict cannot change what the next one sees.
+Immutable values such as encoded bytes can pass ``copy=None``.
+"""
+from collections import OrderedDict
+import copy as _copy
+import threading
+import time
+
+
+class ObservationCache:
+    """Thread-safe LRU cache with per-entry TTL and hit/miss/eviction counters"""
+
+    def __init__(self, maxsize=256, ttl=None, bucket_seconds=60, clock=time.time, copy=_copy.deepcopy):
+        self.maxsize = maxsize
+        self.ttl = bucket_seconds if ttl is None else min(ttl, bucket_seconds)
+        self.bucket_seconds = bucket_seconds
+        self.clock = clock
+        self.copy = copy or (lambda value: value)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def bucket(self, now=None):
+        """Start of the time bucket containing now (unix seconds)"""
+        now = self.clock() if now is None else now
+        return int(now) - int(now) % self.bucket_seconds
+
+    def get(self, city, compute, now=None):
+        """Cached value for city in the current bucket, else compute(bucket_start)"""
+        now = self.clock() if now is None else now
+        start = self.bucket(now)
+        key = (city, start)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires = entry
+                if now < expires:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self.copy(value)
+                del self._entries[key]
+                self.expirations += 1
+            self.misses += 1
+
+        # Compute outside the lock so slow generations don't serialize lookups
+        value = compute(start)
+        self.put(city, value, now)
+        return self.copy(value)
+
+    def get_many(self, cities, compute_many, now=None):
+        """Cached values for many cities; the misses go to compute_many(missing, bucket_start) at once
+
+        compute_many may return an exception in place of a city's value; it
+        is handed back as is and not cached, so the next call retries it.
+        """
+        now = self.clock() if now is None else now
+        start = self.bucket(now)
+        values = [None] * len(cities)
+        missing = {}
+        with self._lock:
+            for i, city in enumerate(cities):
+                key = (city, start)
+                entry = self._entries.get(key)
+                if entry is not None:
+                    value, expires = entry
+                    if now < expires:
+                        self._entries.move_to_end(key)
+                        self.hits += 1
+                        values[i] = value
+                        continue
+                    del self._entries[key]
+                    self.expirations += 1
+                self.misses += 1
+                missing.setdefault(city, []).append(i)
+
+        if missing:
+            for city, value in zip(missing, compute_many(list(missing), start)):
+                if not isinstance(value, Exception):
+                    self.put(city, value, now)
+                for i in missing[city]:
+                    values[i] = value
+        return [value if isinstance(value, Exception) else self.copy(value) for value in values]
+
+    def put(self, city, value, now=None):
+        """Store value for city in the bucket containing now"""
+        now = self.clock() if now is None else now
+        with self._lock:
+            key = (city, self.bucket(now))
+            self._entries[key] = (value, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Drop every entry; counters are kept"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Counters and current size as a dict"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
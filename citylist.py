@@ -0,0 +1,171 @@
+"""Virtualized city list for the Tk app
+
+A list of any length is drawn by a small pool of canvas items, one
+rectangle and one text per visible row. Scrolling moves the pool and
+re-labels the slots that now show different rows; nothing is created or
+destroyed after the first layout, so startup and memory do not depend on
+how many rows the list has. Rows are fetched through a callback only when
+they come into view, so the backing data can stay memory-mapped.
+"""
+import math
+import tkinter as tk
+from tkinter import ttk
+
+
+class VirtualList:
+    """Scrollable list of count rows; row_text(i) labels row i and on_select(i) handles clicks"""
+
+    def __init__(self, parent, count, row_text, on_select, row_height=26, font=("Arial", 9),
+                 bg="#16213e", row_bg="#0f3460", hover_bg="#4cc9f0", fg="white"):
+        self.count = count
+        self.row_text = row_text
+        self.on_select = on_select
+        self.row_height = row_height
+        self.font = font
+        self.row_bg = row_bg
+        self.hover_bg = hover_bg
+        self.fg = fg
+
+        self.frame = tk.Frame(parent, bg=bg)
+        self.canvas = tk.Canvas(self.frame, bg=bg, highlightthickness=0, width=170)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.yview)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        # Pixels scrolled from the top, and the viewport size
+        self.offset = 0
+        self.width = 0
+        self.height = 0
+        self.hover = None
+        # (rectangle, text) item ids per slot and the options last applied to them
+        self.slots = []
+        self.slot_state = []
+        self.stats = {'items_created': 0, 'renders': 0, 'config_calls': 0}
+
+        self.canvas.bind("<Configure>", self.on_resize)
+        self.canvas.bind("<MouseWheel>", lambda e: self.scroll(-3 if e.delta > 0 else 3))
+        # X11 reports the wheel as buttons 4 and 5
+        self.canvas.bind("<Button-4>", lambda e: self.scroll(-3))
+        self.canvas.bind("<Button-5>", lambda e: self.scroll(3))
+        self.canvas.bind("<Motion>", self.on_motion)
+        self.canvas.bind("<Leave>", lambda e: self.set_hover(None))
+        self.canvas.bind("<Button-1>", self.on_click)
+
+    def pack(self, **kw):
+        self.frame.pack(**kw)
+
+    @property
+    def max_offset(self):
+        return max(0, self.count * self.row_height - self.height)
+
+    def set_count(self, count):
+        """Show a different number of rows (e.g. after filtering) from the top"""
+        self.count = count
+        self.offset = 0
+        self.hover = None
+        # The same index may now be a different row, so relabel every slot
+        for state in self.slot_state:
+            state.pop('row', None)
+        self.render()
+
+    def row_at(self, y):
+        """Row index under a canvas y coordinate, or None"""
+        index = int((self.offset + y) // self.row_height)
+        return index if 0 <= index < self.count else None
+
+    # Scrolling
+
+    def yview(self, *args):
+        """Scrollbar protocol: ('moveto', fraction) or ('scroll', n, 'units'|'pages')"""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * self.count * self.row_height)
+        elif args[0] == "scroll":
+            if args[2] == "pages":
+                self.scroll_to(self.offset + int(args[1]) * max(self.height - self.row_height, self.row_height))
+            else:
+                self.scroll(int(args[1]))
+
+    def scroll(self, rows):
+        self.scroll_to(self.offset + rows * self.row_height)
+
+    def scroll_to(self, offset):
+        offset = min(max(int(offset), 0), self.max_offset)
+        if offset != self.offset:
+            self.offset = offset
+            self.render()
+
+    def see(self, index):
+        """Scroll so row index is visible"""
+        top = index * self.row_height
+        if top < self.offset:
+            self.scroll_to(top)
+        elif top + self.row_height > self.offset + self.height:
+            self.scroll_to(top + self.row_height - self.height)
+
+    # Events
+
+    def on_resize(self, event):
+        self.width, self.height = event.width, event.height
+        # Enough slots to cover the viewport with a partial row at each end
+        needed = math.ceil(self.height / self.row_height) + 1
+        while len(self.slots) < needed:
+            rect = self.canvas.create_rectangle(0, 0, 0, 0, width=0, fill=self.row_bg)
+            text = self.canvas.create_text(0, 0, anchor="w", font=self.font, fill=self.fg)
+            self.slots.append((rect, text))
+            self.slot_state.append({})
+            self.stats['items_created'] += 2
+        self.offset = min(self.offset, self.max_offset)
+        # Geometry changed, so every slot is repositioned
+        for state in self.slot_state:
+            state.pop('y', None)
+        self.render()
+
+    def on_motion(self, event):
+        self.set_hover(self.row_at(event.y))
+
+    def set_hover(self, index):
+        if index != self.hover:
+            self.hover = index
+            self.render()
+
+    def on_click(self, event):
+        index = self.row_at(event.y)
+        if index is not None:
+            self.on_select(index)
+
+    # Drawing
+
+    def render(self):
+        """Place and label every slot for the current offset, touching only what changed"""
+        top = self.offset // self.row_height
+        shift = self.offset - top * self.row_height
+        for k, ((rect, text), state) in enumerate(zip(self.slots, self.slot_state)):
+            index = top + k
+            y = k * self.row_height - shift
+            if state.get('y') != y:
+                self.canvas.coords(rect, 2, y + 1, self.width - 2, y + self.row_height - 1)
+                self.canvas.coords(text, 12, y + self.row_height / 2)
+                state['y'] = y
+                self.stats['config_calls'] += 2
+            if index < self.count:
+                view = {'row': index, 'state': "normal",
+                        'fill': self.hover_bg if index == self.hover else self.row_bg}
+            else:
+                view = {'row': None, 'state': "hidden", 'fill': self.row_bg}
+            if state.get('row') != view['row']:
+                self.canvas.itemconfigure(text, text=self.row_text(index) if view['row'] is not None else "")
+                state['row'] = view['row']
+                self.stats['config_calls'] += 1
+            if state.get('fill') != view['fill'] or state.get('state') != view['state']:
+                self.canvas.itemconfigure(rect, fill=view['fill'], state=view['state'])
+                self.canvas.itemconfigure(text, state=view['state'])
+                state['fill'], state['state'] = view['fill'], view['state']
+                self.stats['config_calls'] += 2
+        total = self.count * self.row_height
+        if total > 0:
+            self.scrollbar.set(self.offset / total, min(1.0, (self.offset + self.height) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self.stats['renders'] += 1
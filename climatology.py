@@ -0,0 +1,234 @@
+"""Gridded monthly climatology for the simulator
+
+A climatology is a float32 array of shape (12, nlat, nlon, 3) holding,
+for every month and grid point, the mean temperature (°C), its day-to-day
+spread (standard deviation, °C) and the probability of precipitation.
+Latitude rows run from -90 to 90 inclusive and longitude columns start at
+-180 and wrap, so the resolution follows from the shape alone.
+
+Grids are stored as plain .npy files and opened memory-mapped, so worker
+processes that load the same file share one copy through the page cache.
+Lookups interpolate bilinearly between grid points and with a periodic
+Catmull-Rom spline between mid-month values, over whole NumPy columns.
+
+Without a file, ``default()`` builds a smooth zonal grid calibrated to the
+simulator's original seasonal ranges and latitude bands; a grid derived
+from real monthly normals (ERA5, WorldClim, station data) can be written
+with ``save`` and dropped in instead.
+
+    python climatology.py climate.npy    # write the default grid
+"""
+import sys
+import threading
+
+import numpy as np
+
+# Field indices along the last axis
+MEAN, SPREAD, PRECIP = range(3)
+FIELDS = ("mean", "spread", "precip")
+
+# Default resolution: 2.5 degrees
+DEFAULT_NLAT = 73
+DEFAULT_NLON = 144
+
+# Grid cells worth pre-blending per lookup (about 24 MB of float32 fields)
+_BLEND_CELLS = 1 << 21
+
+_default = None
+_default_lock = threading.Lock()
+
+
+class Climatology:
+    """Read-only monthly grid with vectorized space/time interpolation"""
+
+    def __init__(self, grid, source=None):
+        if grid.ndim != 4 or grid.shape[0] != 12 or grid.shape[3] != len(FIELDS):
+            raise ValueError(f"expected a (12, nlat, nlon, 3) grid, got {grid.shape}")
+        self.grid = grid
+        self.source = source
+        self.nlat, self.nlon = grid.shape[1:3]
+        self.lat_step = 180.0 / (self.nlat - 1)
+        self.lon_step = 360.0 / self.nlon
+        # Flat view for np.take: one row of fields per (month, lat, lon)
+        self._flat = grid.reshape(-1, len(FIELDS))
+
+    @property
+    def nbytes(self):
+        return self.grid.nbytes
+
+    def lookup(self, lat, lon, timestamps):
+        """Dict of interpolated 'mean', 'spread' and 'precip' columns
+
+        lat, lon and timestamps (UTC unix seconds) broadcast against each
+        other; the result has their broadcast shape.
+        """
+        lat, lon, timestamps = np.broadcast_arrays(
+            np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64),
+            np.asarray(timestamps, dtype=np.float64))
+        shape = lat.shape
+        lat, lon, timestamps = lat.ravel(), lon.ravel(), timestamps.ravel()
+        corners = self._corners(lat, lon)
+
+        plane = self.nlat * self.nlon
+        if timestamps.size and timestamps.min() == timestamps.max():
+            times, time_index = timestamps[:1], np.zeros(len(lat), dtype=np.int64)
+        else:
+            times, time_index = np.unique(timestamps, return_inverse=True)
+
+        if len(times) * plane <= _BLEND_CELLS:
+            # Few distinct times (a snapshot or a forecast axis): blend whole
+            # month planes first, leaving four gathers per row
+            planes = self._blend(times).reshape(-1, len(FIELDS))
+            base = time_index * plane
+            out = sum(np.take(planes, base + cell, axis=0) * wc for cell, wc in corners)
+        else:
+            month, f = _month_weights(timestamps)
+            out = np.zeros((len(lat), len(FIELDS)), dtype=np.float64)
+            for dm in range(4):
+                base = ((month + dm - 1) % 12) * plane
+                for cell, wc in corners:
+                    out += np.take(self._flat, base + cell, axis=0) * (f[:, dm:dm + 1] * wc)
+
+        return _fields(out, shape)
+
+    def series(self, lat, lon, times):
+        """Like lookup() over a (len(times), n) grid of hours by cities
+
+        The spatial part is done once per city and the time part once per
+        hour, so a long forecast costs a small matrix product.
+        """
+        lat = np.ravel(np.asarray(lat, dtype=np.float64))
+        lon = np.ravel(np.asarray(lon, dtype=np.float64))
+        lat, lon = np.broadcast_arrays(lat, lon)
+        times = np.ravel(np.asarray(times, dtype=np.float64))
+        planes = self.grid.reshape(12, -1, len(FIELDS))
+        # (12, n, 3) monthly profile for every city
+        profile = sum(planes[:, cell] * wc for cell, wc in self._corners(lat, lon))
+
+        start, f = _month_weights(times)
+        mix = np.zeros((len(times), 12))
+        for dm in range(4):
+            np.add.at(mix, (np.arange(len(times)), (start + dm - 1) % 12), f[:, dm])
+        out = mix @ profile.reshape(12, -1)
+        return _fields(out.reshape(-1, len(FIELDS)), (len(times), len(lat)))
+
+    def _corners(self, lat, lon):
+        """Flat cell index and bilinear weight of each row's four surrounding grid points"""
+        y = np.clip((lat + 90.0) / self.lat_step, 0, self.nlat - 1)
+        i0 = np.minimum(y.astype(np.int64), self.nlat - 2)
+        wy = (y - i0)[:, None]
+        x = ((lon + 180.0) % 360.0) / self.lon_step
+        j0 = x.astype(np.int64) % self.nlon
+        wx = (x - np.floor(x))[:, None]
+        j1 = (j0 + 1) % self.nlon
+        return ((i0 * self.nlon + j0, (1 - wy) * (1 - wx)),
+                (i0 * self.nlon + j1, (1 - wy) * wx),
+                ((i0 + 1) * self.nlon + j0, wy * (1 - wx)),
+                ((i0 + 1) * self.nlon + j1, wy * wx))
+
+    def _blend(self, times):
+        """(len(times), nlat * nlon, 3) month planes interpolated to each time"""
+        month, f = _month_weights(times)
+        planes = self.grid.reshape(12, -1, len(FIELDS))
+        out = np.zeros((len(times),) + planes.shape[1:], dtype=np.float32)
+        for dm in range(4):
+            out += planes[(month + dm - 1) % 12] * f[:, dm, None, None].astype(np.float32)
+        return out
+
+
+def _fields(out, shape):
+    """Split an (n, 3) interpolation result into clamped, reshaped field columns"""
+    out[:, SPREAD] = np.maximum(out[:, SPREAD], 0.0)
+    out[:, PRECIP] = np.clip(out[:, PRECIP], 0.0, 1.0)
+    return {name: out[:, k].reshape(shape) for k, name in enumerate(FIELDS)}
+
+
+def _month_weights(timestamps):
+    """Month before each time's mid-month interval and its four Catmull-Rom weights"""
+    month, frac = month_position(timestamps)
+    # Month m's value sits at m + 0.5
+    t = month + frac - 0.5
+    start = np.floor(t).astype(np.int64)
+    f = (t - start)[:, None]
+    weights = np.hstack([(-f ** 3 + 2 * f ** 2 - f) / 2, (3 * f ** 3 - 5 * f ** 2 + 2) / 2,
+                         (-3 * f ** 3 + 4 * f ** 2 + f) / 2, (f ** 3 - f ** 2) / 2])
+    return start, weights
+
+
+def month_position(timestamps):
+    """(month index 0-11, fraction of the month elapsed) for UTC unix seconds"""
+    seconds = np.floor(np.asarray(timestamps, dtype=np.float64)).astype(np.int64)
+    month = seconds.astype("datetime64[s]").astype("datetime64[M]")
+    start = month.astype("datetime64[s]").astype(np.int64)
+    end = (month + 1).astype("datetime64[s]").astype(np.int64)
+    return month.astype(np.int64) % 12, (seconds - start) / (end - start)
+
+
+def default_grid(nlat=DEFAULT_NLAT, nlon=DEFAULT_NLON):
+    """Zonal (12, nlat, nlon, 3) grid calibrated to the original seasonal rules
+
+    Annual mean and seasonal amplitude follow latitude smoothly so that the
+    mid-latitude band reproduces the old winter/spring/summer/autumn
+    ranges, the tropics run warm with little seasonality and the poles
+    cold; the seasonal cycle is reversed in the southern hemisphere and
+    lags the sun by a month. Precipitation follows the ITCZ, the dry
+    subtropics and the mid-latitude storm tracks.
+    """
+    lat = np.linspace(-90.0, 90.0, nlat)[None, :]
+    month = np.arange(12)[:, None] + 0.5
+    sin_lat = np.sin(np.radians(np.abs(lat)))
+
+    annual = 27.0 - 40.0 * sin_lat ** 2
+    amplitude = 1.0 + 14.0 * sin_lat ** 1.5
+    # Coldest in mid-January in the north, mid-July in the south
+    phase = np.cos(2 * np.pi * (month - 0.5) / 12)
+    mean = annual - np.sign(lat) * amplitude * phase
+    spread = 2.5 + 3.0 * sin_lat
+
+    # ITCZ following the sun a few degrees either side of the equator
+    itcz = 6.0 * -phase
+    precip = (0.12 + 0.38 * np.exp(-((lat - itcz) / 12.0) ** 2)
+              + 0.18 * np.exp(-((np.abs(lat) - 55.0) / 15.0) ** 2)
+              - 0.06 * np.exp(-((np.abs(lat) - 25.0) / 8.0) ** 2))
+
+    fields = np.stack(np.broadcast_arrays(mean, spread, np.clip(precip, 0.02, 0.95)), axis=-1)
+    return np.ascontiguousarray(
+        np.broadcast_to(fields[:, :, None, :], (12, nlat, nlon, len(FIELDS))), dtype=np.float32)
+
+
+def save(grid, path):
+    """Write a grid as a .npy file"""
+    np.save(path, np.asarray(grid, dtype=np.float32))
+
+
+def load(path):
+    """Open a .npy grid memory-mapped (read-only, shared between processes)"""
+    return Climatology(np.load(path, mmap_mode="r"), source=path)
+
+
+def default():
+    """Process-wide Climatology built from default_grid()"""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = Climatology(default_grid())
+        return _default
+
+
+def main(argv=None):
+    """Write the default grid to a .npy file"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Write the default SkyCast climatology grid")
+    parser.add_argument("output", help=".npy file to write, e.g. climate.npy")
+    parser.add_argument("--nlat", type=int, default=DEFAULT_NLAT)
+    parser.add_argument("--nlon", type=int, default=DEFAULT_NLON)
+    args = parser.parse_args(argv)
+
+    grid = default_grid(args.nlat, args.nlon)
+    save(grid, args.output)
+    print(f"{grid.shape} grid, {grid.nbytes / 1e6:.1f} MB -> {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Multi-city dashboard for the Tk app
+
+Each city gets a compact tile (condition colour, temperature, description
+and local time) drawn as a handful of canvas items rather than widgets,
+laid out in a grid that reflows with the window width. Updates only
+reconfigure the items whose text or colour changed, so refreshing a wall
+of tiles every minute costs a few canvas calls per city.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+import itertools
+import tkinter as tk
+from tkinter import ttk
+
+# Conditions dark enough to need light text
+_DARK = ("Rain", "Thunderstorm")
+
+
+class Dashboard:
+    """Grid of live city tiles; on_select(key) runs when a tile is clicked
+
+    Tiles are identified by a key chosen by the caller, so two cities that
+    share a name can both have one.
+    """
+
+    TILE_WIDTH = 150
+    TILE_HEIGHT = 84
+    GAP = 8
+
+    def __init__(self, parent, colors, icons, on_select, bg="#0f3460"):
+        self.colors = colors
+        self.icons = icons
+        self.on_select = on_select
+
+        self.frame = tk.Frame(parent, bg=bg)
+        self.canvas = tk.Canvas(self.frame, bg=bg, highlightthickness=0)
+        self.scrollbar = ttk.Scrollbar(self.frame, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self.scrollbar.set)
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.hint = self.canvas.create_text(self.GAP * 2, self.GAP * 2, anchor="nw", fill="#89CFF0",
+                                            font=("Arial", 10),
+                                            text="Pin cities with 📌 to keep them on the dashboard")
+        # Key -> tile, in display order
+        self.tiles = {}
+        self.width = 0
+        self._ids = itertools.count()
+        self.stats = {'tiles_created': 0, 'updates': 0, 'config_calls': 0}
+
+        self.canvas.bind("<Configure>", self.on_resize)
+        self.canvas.bind("<MouseWheel>", lambda e: self.canvas.yview_scroll(-1 if e.delta > 0 else 1, "units"))
+        self.canvas.bind("<Button-4>", lambda e: self.canvas.yview_scroll(-1, "units"))
+        self.canvas.bind("<Button-5>", lambda e: self.canvas.yview_scroll(1, "units"))
+
+    def __contains__(self, key):
+        return key in self.tiles
+
+    def set_cities(self, cities):
+        """Show tiles for exactly these (key, name) pairs, in order, keeping existing tiles"""
+        tiles = {}
+        for key, name in cities:
+            if key not in tiles:
+                tiles[key] = self.tiles.pop(key, None) or self._create_tile(key, name)
+        for tile in self.tiles.values():
+            self.canvas.delete(tile['tag'])
+        self.tiles = tiles
+        self.layout()
+
+    def missing(self):
+        """Keys of the tiles that have not had data yet"""
+        return [key for key, tile in self.tiles.items() if not tile['state']]
+
+    def _create_tile(self, key, name):
+        tag = f"tile{next(self._ids)}"
+        canvas = self.canvas
+        items = {
+            'rect': canvas.create_rectangle(0, 0, self.TILE_WIDTH, self.TILE_HEIGHT, width=0,
+                                            fill=self.colors["default"], tags=(tag,)),
+            'name': canvas.create_text(8, 6, anchor="nw", font=("Arial", 10, "bold"),
+                                       width=self.TILE_WIDTH - 50, text=name, tags=(tag,)),
+            'clock': canvas.create_text(self.TILE_WIDTH - 6, 7, anchor="ne", font=("Arial", 8),
+                                        tags=(tag,)),
+            'temp': canvas.create_text(8, 28, anchor="nw", font=("Helvetica", 18, "bold"),
+                                       text="…", tags=(tag,)),
+            'description': canvas.create_text(8, 62, anchor="nw", font=("Arial", 8),
+                                              width=self.TILE_WIDTH - 12, tags=(tag,)),
+        }
+        canvas.tag_bind(tag, "<Button-1>", lambda e: self.on_select(key))
+        self.stats['tiles_created'] += 1
+        return {'tag': tag, 'items': items, 'origin': (0, 0), 'state': {}}
+
+    def on_resize(self, event):
+        if event.width != self.width:
+            self.width = event.width
+            self.layout()
+
+    def layout(self):
+        """Flow tiles into as many columns as fit, moving only tiles whose slot changed"""
+        step_x = self.TILE_WIDTH + self.GAP
+        step_y = self.TILE_HEIGHT + self.GAP
+        columns = max(1, (self.width - self.GAP) // step_x)
+        for i, tile in enumerate(self.tiles.values()):
+            origin = (self.GAP + (i % columns) * step_x, self.GAP + (i // columns) * step_y)
+            if origin != tile['origin']:
+                self.canvas.move(tile['tag'], origin[0] - tile['origin'][0], origin[1] - tile['origin'][1])
+                tile['origin'] = origin
+        rows = -(-len(self.tiles) // columns)
+        self.canvas.configure(scrollregion=(0, 0, self.width, rows * step_y + self.GAP))
+        self.canvas.itemconfigure(self.hint, state="hidden" if self.tiles else "normal")
+
+    def update(self, key, data):
+        """Refresh the tile for key with an observation, if there is one"""
+        tile = self.tiles.get(key)
+        if tile is None:
+            return
+        main_weather = data['weather'][0]['main']
+        fg = "white" if main_weather in _DARK else "#1a1a2e"
+        local = datetime.now(dt_timezone(timedelta(hours=float(data.get('timezone', 0)))))
+        view = {
+            'rect': {'fill': self.colors.get(main_weather, self.colors["default"])},
+            'name': {'text': f"{self.icons.get(main_weather, '🌤️')} {data['name']}", 'fill': fg},
+            'clock': {'text': local.strftime('%H:%M'), 'fill': fg},
+            'temp': {'text': f"{data['main']['temp']:.0f}°C", 'fill': fg},
+            'description': {'text': data['weather'][0]['description'], 'fill': fg},
+        }
+        for name, options in view.items():
+            applied = tile['state'].setdefault(name, {})
+            changed = {k: v for k, v in options.items() if applied.get(k) != v}
+            if changed:
+                self.canvas.itemconfigure(tile['items'][name], **changed)
+                applied.update(changed)
+                self.stats['config_calls'] += 1
+        self.stats['updates'] += 1
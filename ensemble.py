@@ -0,0 +1,157 @@
+"""Ensemble forecasts with percentile bands
+
+Each city runs ``members`` forecast paths through forecast.forecast_batch,
+every one keyed by (city, member, hour) so the result does not depend on
+how the work is split. Member 0 uses the city's own key and is the
+ordinary deterministic forecast. The others share its spin-up and first
+hour, which make the initial state, and then diverge through their own
+innovations, so the spread starts at zero and grows with lead time.
+
+The paths are reduced as they are produced:
+
+* P10/P50/P90 of temperature and wind speed,
+* the share of members in each condition, and
+* their total over the wet conditions as the precipitation probability.
+
+Cities are processed in chunks that hold every member of a few cities, so
+peak memory is about ``workers * chunk_bytes`` plus the bands themselves,
+however many cities are asked for. Chunks run on a thread pool; NumPy
+drops the GIL inside the per-hour array kernels, so they spread across
+cores.
+
+    python ensemble.py --cities 1000 --members 1000 --hours 240
+"""
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import time
+
+import numpy as np
+
+import forecast
+import simulator
+import streams
+
+QUANTILES = (0.1, 0.5, 0.9)
+
+# Conditions counted as precipitation
+PRECIPITATING = ("Drizzle", "Rain", "Thunderstorm", "Snow")
+_WET = np.isin(np.array(simulator.CONDITIONS), PRECIPITATING)
+
+# Peak bytes per member-hour while a chunk is simulated: the uniform block,
+# forecast_batch's state and outputs and the quantile copies (measured)
+BYTES_PER_CELL = 192
+
+
+def member_uniforms(stream, keys, members, times):
+    """(N_DRAWS, hours, cities, members) keyed draws over forecast.draw_axis() times
+
+    Every member shares member 0's spin-up and first forecast hour.
+    """
+    member = streams.member_keys(keys, members)
+    u = stream.forecast_uniforms(member.ravel(), times).reshape((forecast.N_DRAWS, len(times)) + member.shape)
+    u[:, :forecast.SPIN_UP + 1] = u[:, :forecast.SPIN_UP + 1, :, :1]
+    return u
+
+
+def band_names():
+    """Output column names of the temperature and wind bands, in QUANTILES order"""
+    return [f"{field}_p{round(q * 100)}" for field in ("temp", "wind") for q in QUANTILES]
+
+
+def summarize(fc):
+    """Bands and condition probabilities of an (n, members, hours) forecast"""
+    out = {}
+    for field, column in (("temp", 'temp'), ("wind", 'wind_speed')):
+        bands = np.quantile(fc[column], QUANTILES, axis=1)
+        for q, band in zip(QUANTILES, bands):
+            out[f"{field}_p{round(q * 100)}"] = band
+    condition = fc['condition']
+    prob = np.stack([(condition == c).mean(axis=1) for c in range(len(simulator.CONDITIONS))], axis=-1)
+    out['condition_prob'] = prob
+    out['precip_prob'] = prob[..., _WET].sum(axis=-1)
+    return out
+
+
+def ensemble_batch(stream, keys, lat, lon, tz_hours, start, hours=240, members=100, climate=None,
+                   workers=None, chunk_bytes=64 << 20):
+    """Percentile bands for every city; returns (n, hours) float32 columns plus 'time'
+
+    keys are city keys (streams.city_keys) and stream a streams.KeyedStream.
+    'condition_prob' is (n, hours, len(simulator.CONDITIONS)). workers
+    defaults to one thread per CPU; a chunk always holds at least one city.
+    """
+    keys = np.asarray(keys, dtype=np.uint64).ravel()
+    lat, lon, tz_hours = (np.ravel(a) for a in np.broadcast_arrays(
+        np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64),
+        np.asarray(tz_hours, dtype=np.float64)))
+    n = len(keys)
+    times = forecast.hour_axis(start, hours)
+
+    out = {name: np.empty((n, hours), dtype=np.float32) for name in band_names() + ['precip_prob']}
+    out['condition_prob'] = np.empty((n, hours, len(simulator.CONDITIONS)), dtype=np.float32)
+    per_chunk = max(1, chunk_bytes // (members * (forecast.SPIN_UP + hours) * BYTES_PER_CELL))
+
+    def run(lo):
+        hi = min(lo + per_chunk, n)
+        u = member_uniforms(stream, keys[lo:hi], members, forecast.draw_axis(start, hours))
+        fc = forecast.forecast_batch(lat[lo:hi], lon[lo:hi], tz_hours[lo:hi], start, hours=hours,
+                                     uniforms=u, climate=climate)
+        del u
+        for name, value in summarize(fc).items():
+            out[name][lo:hi] = value
+
+    chunks = range(0, n, per_chunk)
+    workers = min(workers or os.cpu_count() or 1, len(chunks))
+    if workers <= 1:
+        for lo in chunks:
+            run(lo)
+    else:
+        with ThreadPoolExecutor(workers, thread_name_prefix="skycast-ensemble") as pool:
+            # Results are written in place; map only surfaces errors
+            list(pool.map(run, chunks))
+    out['time'] = times
+    return out
+
+
+def main(argv=None):
+    """Time an ensemble over the most populous built-in cities and print the figures as JSON"""
+    import climatology
+    import gazetteer
+
+    parser = argparse.ArgumentParser(description="Run an ensemble forecast and report its cost")
+    parser.add_argument("--cities", type=int, default=100)
+    parser.add_argument("--members", type=int, default=100)
+    parser.add_argument("--hours", type=int, default=240)
+    parser.add_argument("--workers", type=int, help="threads (default: one per CPU)")
+    parser.add_argument("--chunk-mb", type=int, default=64, help="memory per worker chunk")
+    parser.add_argument("--gazetteer", help="binary gazetteer or GeoNames dump (default: built-in cities)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    gaz = gazetteer.load(args.gazetteer) if args.gazetteer else gazetteer.builtin()
+    cities = gaz.most_populous(args.cities)
+    # Small gazetteers are cycled to reach the requested count
+    cities = [cities[i % len(cities)] for i in range(args.cities)]
+    keys = streams.city_keys([gazetteer.fold(c.name) + f"#{i}" for i, c in enumerate(cities)])
+    started = time.perf_counter()
+    bands = ensemble_batch(streams.KeyedStream(args.seed), keys, [c.lat for c in cities],
+                           [c.lon for c in cities], [c.timezone for c in cities], time.time(),
+                           hours=args.hours, members=args.members, climate=climatology.default(),
+                           workers=args.workers, chunk_bytes=args.chunk_mb << 20)
+    elapsed = time.perf_counter() - started
+    cells = args.cities * args.members * args.hours
+    print(json.dumps({
+        'cities': args.cities,
+        'members': args.members,
+        'hours': args.hours,
+        'seconds': round(elapsed, 3),
+        'member_hours_per_second': round(cells / elapsed),
+        'output_bytes': sum(v.nbytes for v in bands.values()),
+    }, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,290 @@
+"""Headless export of simulated observations
+
+Streams observations for a set of cities over a time range as NDJSON, CSV,
+Parquet or an Arrow IPC stream, without opening a window:
+
+    python export.py Istanbul Paris --start 2026-01-01 --end 2026-02-01 --step 1h
+    python export.py --gazetteer cities.gaz --top 1000 --format parquet -o out.parquet
+
+Rows are produced time-major (every city at the first time, then the next)
+in fixed-size chunks, so memory stays flat however long the range is. The
+output uses the flat schema in SCHEMA: times are UTC unix seconds and
+conditions are names, so every format round-trips without datetimes.
+Parquet and Arrow output need pyarrow.
+"""
+import argparse
+import csv
+from datetime import datetime, timezone as dt_timezone
+import json
+import sys
+import time
+
+import numpy as np
+
+import climatology
+import gazetteer
+import simulator
+import streams
+
+# Output columns and their types, in order
+SCHEMA = (
+    ("city", "string"),
+    ("country", "string"),
+    ("lat", "float64"),
+    ("lon", "float64"),
+    ("time", "int64"),
+    ("tz_offset", "int32"),
+    ("temp", "float64"),
+    ("feels_like", "float64"),
+    ("humidity", "int16"),
+    ("pressure", "int16"),
+    ("wind_speed", "float64"),
+    ("condition", "string"),
+    ("description", "string"),
+    ("season", "string"),
+    ("sunrise", "int64"),
+    ("sunset", "int64"),
+)
+FIELDS = tuple(name for name, _ in SCHEMA)
+
+FORMATS = ("ndjson", "csv", "parquet", "arrow")
+
+CHUNK_ROWS = 65536
+
+_CONDITION_NAMES = np.array(simulator.CONDITIONS, dtype=object)
+_DESCRIPTION_NAMES = np.array(simulator.DESCRIPTIONS, dtype=object)
+_SEASON_NAMES = np.array(simulator.SEASONS, dtype=object)
+
+_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_time(text):
+    """UTC unix seconds from an integer or an ISO 8601 string (naive means UTC)"""
+    if text.lstrip("-").isdigit():
+        return int(text)
+    moment = datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=dt_timezone.utc)
+    return int(moment.timestamp())
+
+
+def parse_step(text):
+    """Seconds from '3600', '90s', '15m', '1h' or '1d'"""
+    unit = _UNITS.get(text[-1:].lower())
+    seconds = int(text[:-1]) * unit if unit else int(text)
+    if seconds <= 0:
+        raise ValueError(f"step must be positive: {text!r}")
+    return seconds
+
+
+def serializable(data):
+    """Copy of an app observation dict with datetimes as UTC unix seconds"""
+    out = dict(data)
+    out['sys_data'] = {k: int(v.timestamp()) for k, v in data['sys_data'].items()}
+    if 'hourly' in data:
+        out['hourly'] = [dict(h, time=int(h['time'].timestamp())) for h in data['hourly']]
+    return out
+
+
+def chunks(gaz, rows, times, stream, chunk_rows=CHUNK_ROWS, climate=None):
+    """Yield dicts of SCHEMA columns covering every (time, row) pair, time-major"""
+    rows = np.asarray(rows, dtype=np.int64)
+    times = np.asarray(times, dtype=np.int64)
+    total = len(rows) * len(times)
+    for start in range(0, total, chunk_rows):
+        index = np.arange(start, min(start + chunk_rows, total), dtype=np.int64)
+        row_ids = rows[index % len(rows)]
+        row_times = times[index // len(rows)]
+        batch = gaz.observe(row_ids, row_times, stream, climate)
+
+        # Decode each distinct city once per chunk
+        unique, inverse = np.unique(row_ids, return_inverse=True)
+        rec = gaz.records[unique]
+        names = np.array([gaz.name(r) for r in unique], dtype=object)
+        countries = np.array(gaz.countries, dtype=object)[rec["country"]]
+
+        yield {
+            'city': names[inverse],
+            'country': countries[inverse],
+            'lat': np.round(rec["lat"].astype(np.float64), 4)[inverse],
+            'lon': np.round(rec["lon"].astype(np.float64), 4)[inverse],
+            'time': row_times,
+            'tz_offset': (rec["tz_minutes"].astype(np.int32) * 60)[inverse],
+            'temp': batch['temp'],
+            'feels_like': batch['feels_like'],
+            'humidity': batch['humidity'],
+            'pressure': batch['pressure'],
+            'wind_speed': batch['wind_speed'],
+            'condition': _CONDITION_NAMES[batch['condition']],
+            'description': _DESCRIPTION_NAMES[batch['description']],
+            'season': _SEASON_NAMES[batch['season']],
+            'sunrise': batch['sunrise'],
+            'sunset': batch['sunset'],
+        }
+
+
+def _records(chunk):
+    """Row tuples of plain Python values, in SCHEMA order"""
+    return zip(*(chunk[name].tolist() for name in FIELDS))
+
+
+def write_ndjson(chunk_iter, out):
+    """One JSON object per line"""
+    rows = 0
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    for chunk in chunk_iter:
+        out.writelines(dumps(dict(zip(FIELDS, record))) + "\n" for record in _records(chunk))
+        rows += len(chunk['time'])
+    return rows
+
+
+def write_csv(chunk_iter, out):
+    """CSV with a header row"""
+    rows = 0
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(FIELDS)
+    for chunk in chunk_iter:
+        writer.writerows(_records(chunk))
+        rows += len(chunk['time'])
+    return rows
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise RuntimeError("parquet and arrow output need pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+
+def arrow_schema():
+    """SCHEMA as a pyarrow.Schema"""
+    pa = _pyarrow()
+    return pa.schema([(name, pa.string() if kind == "string" else pa.from_numpy_dtype(np.dtype(kind)))
+                      for name, kind in SCHEMA])
+
+
+def _record_batch(pa, schema, chunk):
+    return pa.record_batch([pa.array(chunk[name], type=schema.field(name).type) for name in FIELDS],
+                           schema=schema)
+
+
+def write_parquet(chunk_iter, out):
+    """Parquet file, one row group per chunk"""
+    pa = _pyarrow()
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema()
+    rows = 0
+    with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        for chunk in chunk_iter:
+            writer.write_batch(_record_batch(pa, schema, chunk))
+            rows += len(chunk['time'])
+    return rows
+
+
+def write_arrow(chunk_iter, out):
+    """Arrow IPC stream, one record batch per chunk"""
+    pa = _pyarrow()
+    schema = arrow_schema()
+    rows = 0
+    with pa.ipc.new_stream(out, schema) as writer:
+        for chunk in chunk_iter:
+            writer.write_batch(_record_batch(pa, schema, chunk))
+            rows += len(chunk['time'])
+    return rows
+
+
+WRITERS = {
+    'ndjson': write_ndjson,
+    'csv': write_csv,
+    'parquet': write_parquet,
+    'arrow': write_arrow,
+}
+
+
+def export(gaz, rows, times, stream, fmt, out, chunk_rows=CHUNK_ROWS, climate=None):
+    """Write every (time, row) observation to out; returns the row count
+
+    out is a text stream for ndjson/csv and a binary stream or path for
+    parquet/arrow.
+    """
+    return WRITERS[fmt](chunks(gaz, rows, times, stream, chunk_rows, climate), out)
+
+
+def select_rows(gaz, cities=None, top=None):
+    """Gazetteer rows for named cities, the top most populous, or every row"""
+    if cities:
+        rows = []
+        for name in cities:
+            city = gaz.lookup(name)
+            if city is None:
+                raise KeyError(name)
+            rows.append(city.row)
+        return np.array(rows, dtype=np.int64)
+    if top is not None:
+        if top <= len(gaz.popular_rows):
+            return gaz.popular_rows[:top].astype(np.int64)
+        # Beyond the precomputed ranking, sort by population
+        return np.argsort(-gaz.records["population"].astype(np.int64), kind="stable")[:top]
+    return np.arange(len(gaz), dtype=np.int64)
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="Export simulated SkyCast observations")
+    parser.add_argument("cities", nargs="*", help="city names (default: every gazetteer city)")
+    parser.add_argument("--gazetteer", help="binary gazetteer or GeoNames dump (default: built-in cities)")
+    parser.add_argument("--top", type=int, help="only the N most populous cities")
+    parser.add_argument("--start", type=parse_time, help="first time, unix seconds or ISO 8601 (default: now)")
+    parser.add_argument("--end", type=parse_time, help="end time, exclusive (default: one step after start)")
+    parser.add_argument("--step", type=parse_step, default=3600, help="interval such as 3600, 15m, 1h, 1d")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("-o", "--output", default="-", help="file to write, - for stdout")
+    parser.add_argument("--climatology", metavar="GRID", default="default",
+                        help="climatology .npy grid (default: the built-in one, as in the app)")
+    parser.add_argument("--no-climatology", action="store_true",
+                        help="use the original seasonal rules instead of a climatology grid")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    args = parser.parse_args(argv)
+
+    gaz = gazetteer.load(args.gazetteer) if args.gazetteer else gazetteer.builtin()
+    try:
+        rows = select_rows(gaz, args.cities, args.top)
+    except KeyError as exc:
+        parser.error(f"unknown city: {exc.args[0]}")
+    start = args.start if args.start is not None else int(time.time()) // args.step * args.step
+    end = args.end if args.end is not None else start + args.step
+    times = np.arange(start, end, args.step, dtype=np.int64)
+    stream = streams.KeyedStream(args.seed)
+    climate = None
+    if not args.no_climatology:
+        climate = climatology.default() if args.climatology == "default" else climatology.load(args.climatology)
+
+    began = time.perf_counter()
+    binary = args.format in ("parquet", "arrow")
+    try:
+        if binary:
+            _pyarrow()
+        if args.output == "-":
+            out = sys.stdout.buffer if binary else sys.stdout
+            count = export(gaz, rows, times, stream, args.format, out, args.chunk_rows, climate)
+        else:
+            with open(args.output, "wb" if binary else "w", newline="" if not binary else None,
+                      encoding=None if binary else "utf-8") as out:
+                count = export(gaz, rows, times, stream, args.format, out, args.chunk_rows, climate)
+    except RuntimeError as exc:
+        parser.error(str(exc))
+    except BrokenPipeError:
+        # Downstream closed early (e.g. piped into head)
+        sys.stderr.close()
+        return 1
+    elapsed = time.perf_counter() - began
+    print(f"{count} rows, {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} rows/s) -> {args.output}",
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,212 @@
+"""Coherent hourly forecast series for SkyCast
+
+Instead of re-rolling every hour independently, each city follows smooth,
+autocorrelated paths built from the simulator's rules:
+
+* temperature = seasonal midpoint + latitude band + an AR(1) anomaly with
+  the snapshot's uniform seasonal spread, plus a diurnal cosine fitted to
+  the time-of-day table and a smoothed condition effect,
+* conditions follow a per-season Markov chain whose stationary
+  distribution is the seasonal condition weights,
+* humidity, wind and pressure relax towards their per-condition levels.
+
+A path is a function of the absolute hour, not of where a forecast
+starts. Each run begins SPIN_UP hours early: the condition chain takes its
+first redraw and the smoothed levels forget their starting values within
+that time, and the AR(1) anomalies are sums over a sliding window of
+SPIN_UP hours of innovations, so two forecasts agree wherever they overlap
+and nothing jumps when the start moves to the next hour or day.
+
+All cities advance together one hour at a time, so the cost is one set of
+NumPy operations per forecast hour rather than per city.
+"""
+import numpy as np
+
+import simulator
+
+# Number of uniform draws consumed per city-hour
+N_DRAWS = 7
+
+# Condition persistence: probability of keeping the previous hour's condition
+PERSISTENCE = 0.85
+
+# Hours simulated before a forecast starts; also the AR(1) window length
+SPIN_UP = 72
+
+# Hourly AR(1) coefficients (decorrelation of roughly a day and a half)
+TEMP_AR = 0.97
+PRESSURE_AR = 0.98
+
+# Exponential smoothing of the per-condition effects
+SMOOTHING = 0.3
+
+# Diurnal cosine fitted to the 6-hour time-of-day buckets, peaking mid-afternoon
+_TOD_MEANS = simulator._TOD_LO + simulator._TOD_SPAN / 2
+DIURNAL_OFFSET = float(_TOD_MEANS.mean())
+DIURNAL_AMPLITUDE = float((_TOD_MEANS.max() - _TOD_MEANS.min()) / 2)
+PEAK_HOUR = 15
+
+_TEMP_MID = simulator._TEMP_LO + simulator._TEMP_SPAN / 2
+_ADJ_MID = simulator._ADJ_LO + simulator._ADJ_SPAN / 2
+_WIND_MID = simulator._WIND_LO + simulator._WIND_SPAN / 2
+_HUMIDITY_MID = simulator._HUMIDITY_LO + 17.5
+
+
+def hour_axis(start, hours):
+    """UTC unix seconds for each forecast hour, starting at the hour of start"""
+    first = int(start) - int(start) % 3600
+    return first + 3600 * np.arange(hours, dtype=np.int64)
+
+
+def draw_axis(start, hours):
+    """Hours a forecast of hours from start draws for: the spin-up, then the forecast itself
+
+    An array of per-city starts gives a (SPIN_UP + hours, n) grid.
+    """
+    start = np.asarray(start, dtype=np.int64)
+    first = start - start % 3600
+    steps = 3600 * np.arange(-SPIN_UP, hours, dtype=np.int64)
+    return first + steps if first.ndim == 0 else first[None, :] + steps[:, None]
+
+
+def draw_uniforms(rng, n, hours):
+    """Draw the (N_DRAWS, SPIN_UP + hours, n) uniform block consumed by forecast_batch"""
+    if rng is None:
+        rng = np.random.default_rng()
+    return rng.random((N_DRAWS, SPIN_UP + hours, n))
+
+
+def forecast_batch(lat, lon, tz_hours, start, days=7, rng=None, uniforms=None, hours=None,
+                   climate=None):
+    """Hourly forecast for every city; returns (n, hours) columns plus 'time'
+
+    lat, lon and tz_hours are per-city columns and start is a UTC unix
+    time, or a column of them to run each city from its own start ('time'
+    is then (n, hours) as well). Randomness comes from ``uniforms`` (an (N_DRAWS, SPIN_UP + hours, n)
+    block over draw_axis(start, hours), e.g. from
+    streams.KeyedStream.forecast_uniforms) or else from ``rng``. With
+    ``climate`` (a climatology.Climatology) the paths follow the
+    interpolated normals instead of the seasonal ranges and latitude bands.
+
+    A uniforms block with trailing axes, (N_DRAWS, SPIN_UP + hours, n, members),
+    runs that many paths per city (see ensemble.py): the per-city work is
+    done once and broadcast, and the columns come back as (n, members, hours).
+    """
+    lat, lon, tz_hours = (np.ravel(a) for a in np.broadcast_arrays(
+        np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64),
+        np.asarray(tz_hours, dtype=np.float64)))
+    n = lat.shape[0]
+    hours = days * 24 if hours is None else hours
+    # Everything below runs over the spin-up as well; it is cut off at the end
+    times = draw_axis(start, hours)
+    steps = len(times)
+    u = draw_uniforms(rng, n, hours) if uniforms is None else uniforms
+    # Per-city (hours, n) values gain a unit axis per extra path axis
+    paths = (slice(None), slice(None)) + (None,) * (u.ndim - 3)
+
+    grid = times if times.ndim == 2 else times[:, None]
+
+    # Work hour-major so each step reads and writes contiguous city rows
+    month, hour, _ = simulator.local_time_fields(grid, tz_hours[None, :])
+    season = simulator.season_codes(month, lat[None, :])
+
+    diurnal = DIURNAL_AMPLITUDE * np.cos(2 * np.pi * (hour - PEAK_HOUR) / 24)
+    if climate is None:
+        abs_lat = np.abs(lat)
+        temp_mod = np.where(abs_lat > 50, -5.0, np.where(abs_lat > 35, 0.0, 10.0))
+        normal = _TEMP_MID[season] + temp_mod
+        span = simulator._TEMP_SPAN[season]
+        diurnal = diurnal + DIURNAL_OFFSET
+    else:
+        # Normals vary smoothly hour to hour; the diurnal cycle sits around the daily mean
+        normals = (climate.series(lat, lon, times) if times.ndim == 1
+                   else climate.lookup(lat[None, :], lon[None, :], times))
+        normal = normals['mean']
+        span = normals['spread'] * simulator._UNIFORM_WIDTH
+        precip = normals['precip'][paths]
+    season, diurnal, normal, span = season[paths], diurnal[paths], normal[paths], span[paths]
+
+    shape = u.shape[1:]
+    temp = np.empty(shape, dtype=np.float32)
+    humidity = np.empty(shape, dtype=np.int16)
+    pressure = np.empty(shape, dtype=np.int16)
+    wind_speed = np.empty(shape, dtype=np.float32)
+    condition = np.empty(shape, dtype=np.int8)
+
+    n_cond = len(simulator.CONDITIONS)
+    # AR(1) anomalies as sums of the last SPIN_UP innovations: each hour adds
+    # its own and drops the one leaving the window, so the value depends on
+    # the absolute hour only. The spread matches the snapshot's uniform one.
+    temp_scale = span * np.sqrt(1 - TEMP_AR ** 2)
+    press_scale = 20 * np.sqrt(1 - PRESSURE_AR ** 2)
+    temp_drop = TEMP_AR ** SPIN_UP
+    press_drop = PRESSURE_AR ** SPIN_UP
+    anomaly = np.zeros(shape[1:])
+    press_anomaly = np.zeros(shape[1:])
+    cond = None
+    for h in range(steps):
+        anomaly = TEMP_AR * anomaly + (u[2, h] - 0.5) * temp_scale[h]
+        press_anomaly = PRESSURE_AR * press_anomaly + (u[5, h] - 0.5) * press_scale
+        if h >= SPIN_UP:
+            anomaly -= temp_drop * (u[2, h - SPIN_UP] - 0.5) * temp_scale[h - SPIN_UP]
+            press_anomaly -= press_drop * (u[5, h - SPIN_UP] - 0.5) * press_scale
+        press = 1010 + press_anomaly
+        s = season[h]
+        if climate is None:
+            redraw = np.searchsorted(simulator._FLAT_CDF, s + u[1, h], side="right") - s * n_cond
+            redraw = np.minimum(redraw, n_cond - 1)
+        else:
+            redraw = simulator.climate_conditions(u[1, h], normal[h], precip[h])
+        if cond is None:
+            cond = redraw
+            effect = _ADJ_MID[cond]
+            hum = _HUMIDITY_MID[cond].astype(np.float64)
+            wind = _WIND_MID[cond].astype(np.float64)
+        else:
+            cond = np.where(u[0, h] < PERSISTENCE, cond, redraw)
+            effect += SMOOTHING * (_ADJ_MID[cond] - effect)
+            hum += SMOOTHING * (_HUMIDITY_MID[cond] - hum)
+            wind += SMOOTHING * (_WIND_MID[cond] - wind)
+
+        temp[h] = normal[h] + anomaly + diurnal[h] + effect
+        humidity[h] = np.clip(np.rint(hum + (u[3, h] - 0.5) * 10), 0, 100)
+        wind_lo = simulator._WIND_LO[cond]
+        wind_speed[h] = np.clip(wind + (u[4, h] - 0.5) * 6, wind_lo, wind_lo + simulator._WIND_SPAN[cond])
+        pressure[h] = np.clip(np.rint(press), 1000, 1020)
+        condition[h] = cond
+
+    description = (simulator._DESC_OFFSET[condition]
+                   + (u[6] * simulator._DESC_COUNT[condition]).astype(np.int64)).astype(np.int8)
+    feels_like = temp - np.where(temp > 0, 2.0, 1.0).astype(np.float32)
+
+    # Hand back city-major columns without the spin-up
+    columns = {
+        'temp': np.round(temp, 1),
+        'feels_like': np.round(feels_like, 1),
+        'humidity': humidity,
+        'pressure': pressure,
+        'wind_speed': np.round(wind_speed, 1),
+        'condition': condition,
+        'description': description,
+        'season': np.broadcast_to(season, shape).astype(np.int8),
+    }
+    # Hour axis last: (n, hours), or (n, members, hours) for ensembles
+    columns = {k: np.ascontiguousarray(np.moveaxis(v[SPIN_UP:], 0, -1)) for k, v in columns.items()}
+    columns['time'] = times[SPIN_UP:] if times.ndim == 1 else np.ascontiguousarray(times[SPIN_UP:].T)
+    return columns
+
+
+def daily(fc):
+    """Collapse an hourly forecast into 24-hour blocks: min/max/mean and the dominant condition"""
+    n, hours = fc['temp'].shape
+    days = hours // 24
+    temp = fc['temp'][:, :days * 24].reshape(n, days, 24)
+    cond = fc['condition'][:, :days * 24].reshape(n, days, 24)
+    counts = np.stack([(cond == c).sum(axis=2) for c in range(len(simulator.CONDITIONS))], axis=2)
+    return {
+        'time': fc['time'][:days * 24:24],
+        'temp_min': temp.min(axis=2),
+        'temp_max': temp.max(axis=2),
+        'temp_mean': np.round(temp.mean(axis=2), 1),
+        'condition': counts.argmax(axis=2).astype(np.int8),
+    }
@@ -0,0 +1,98 @@
+"""Trigram index for typo-tolerant name search
+
+Every folded name, with a leading space so word starts count, is cut into
+overlapping 3-byte trigrams of its UTF-8 form. The index maps each
+trigram to a posting list of the names containing it. Postings hold
+population ranks rather than rows, so every list is sorted largest place
+first and cutting a list short keeps the places most worth suggesting.
+
+A query with k trigrams that allows e edits must share at least
+k - 3e of them with a match, since one edit breaks at most three. By
+pigeonhole such a name appears in at least one of any 3e + 1 of the query's
+lists, so candidates come from the shortest 3e + 1 lists only. Each
+candidate is then counted against every list with a binary search. The
+work follows the rarest trigrams rather than the size of the table.
+"""
+import numpy as np
+
+# Postings read per candidate list; they run largest place first
+MAX_CANDIDATES = 1024
+
+
+def trigrams(key):
+    """Sorted distinct uint32 trigram ids of a folded name"""
+    data = (" " + key).encode("utf-8")
+    # A handful of values: plain Python beats np.unique's setup cost
+    ids = {(a << 16) | (b << 8) | c for a, b, c in zip(data, data[1:], data[2:])}
+    return np.array(sorted(ids), dtype=np.uint32)
+
+
+def build(folded, population):
+    """(rank_rows, trigram_keys, trigram_start, trigram_ranks) for a list of folded names
+
+    rank_rows lists rows largest population first (ties in row order);
+    postings of trigram_keys[i] are trigram_ranks[trigram_start[i]:trigram_start[i + 1]].
+    """
+    n = len(folded)
+    rank_rows = np.argsort(-np.asarray(population, dtype=np.int64), kind="stable").astype(np.uint32)
+    rank = np.empty(n, dtype=np.uint32)
+    rank[rank_rows] = np.arange(n, dtype=np.uint32)
+
+    # One pass over every name at once: newlines separate names, and a
+    # trigram spanning one is not a trigram of any name
+    data = np.frombuffer("\n".join(" " + key for key in folded).encode("utf-8"), dtype=np.uint8)
+    breaks = data == 0x0A
+    valid = ~(breaks[:-2] | breaks[1:-1] | breaks[2:])
+    ids = ((data[:-2].astype(np.uint64) << np.uint64(16)) | (data[1:-1].astype(np.uint64) << np.uint64(8))
+           | data[2:])[valid]
+    owner = np.cumsum(breaks[:-2], dtype=np.int64)[valid]
+    del breaks, valid
+
+    # (trigram, rank) pairs sorted and deduplicated in one go
+    pairs = np.unique((ids << np.uint64(32)) | rank[owner])
+    del ids, owner
+    tri = (pairs >> np.uint64(32)).astype(np.uint32)
+    keys, starts = np.unique(tri, return_index=True)
+    starts = np.append(starts, len(tri)).astype(np.uint64)
+    ranks = (pairs & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+    return rank_rows, keys, starts, ranks
+
+
+def candidates(keys, starts, ranks, query, max_errors=1):
+    """(ranks, matched trigram counts) of names within max_errors edits of query's trigrams
+
+    query is the output of trigrams(); the result is in rank order.
+    """
+    k = len(query)
+    empty = np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.int64)
+    if k == 0 or len(keys) == 0:
+        return empty
+    pos = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+    found = keys[pos] == query
+    lo = np.where(found, starts[pos], 0).astype(np.int64)
+    hi = np.where(found, starts[pos + 1], 0).astype(np.int64)
+    need = max(1, k - 3 * max_errors)
+
+    shortest = np.argsort(hi - lo, kind="stable")[:k - need + 1]
+    pool = [ranks[lo[i]:min(hi[i], lo[i] + MAX_CANDIDATES)] for i in shortest if hi[i] > lo[i]]
+    if not pool:
+        return empty
+    cand = np.sort(np.concatenate(pool))
+    cand = cand[np.concatenate(([True], cand[1:] != cand[:-1]))]
+
+    matched = np.zeros(len(cand), dtype=np.int64)
+    for i in np.flatnonzero(hi > lo):
+        posting = ranks[lo[i]:hi[i]]
+        # Only the stretch between the first and last candidate can match;
+        # binary-search whichever side is shorter into the other
+        posting = posting[np.searchsorted(posting, cand[0]):np.searchsorted(posting, cand[-1], "right")]
+        if len(posting) == 0:
+            continue
+        if len(posting) < len(cand):
+            at = np.searchsorted(cand, posting)
+            matched[at[cand[np.minimum(at, len(cand) - 1)] == posting]] += 1
+        else:
+            at = np.minimum(np.searchsorted(posting, cand), len(posting) - 1)
+            matched += posting[at] == cand
+    keep = matched >= need
+    return cand[keep], matched[keep]
@@ -0,0 +1,537 @@
+"""Indexed, array-backed city database for SkyCast
+
+All places live in one fixed-width NumPy record table plus a UTF-8 string
+pool, so millions of cities cost tens of bytes each instead of a dict
+apiece. Four indexes sit on top of the table:
+
+* a sorted array of folded-name hashes for exact lookups,
+* a permutation of rows in folded-name order for prefix search,
+* a 1-degree lat/lon grid in CSR form for nearest-city queries,
+* trigram postings for typo-tolerant type-ahead (see fuzzy.py).
+
+The same arrays can be written to a binary file (``save``) and mapped back
+with ``open_binary``, so opening millions of cities costs milliseconds and
+only the pages a lookup touches are read. Build one with::
+
+    python gazetteer.py cities500.txt cities.gaz
+"""
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+import math
+import mmap
+import struct
+import sys
+import unicodedata
+
+import numpy as np
+
+import fuzzy
+import metrics
+import streams
+
+# Fixed-width record layout; names and countries are offsets into string tables
+RECORD_DTYPE = np.dtype([
+    ("lat", "<f4"),
+    ("lon", "<f4"),
+    ("population", "<u4"),
+    ("name_offset", "<u4"),
+    ("name_length", "<u2"),
+    ("tz_minutes", "<i2"),
+    ("country", "<u2"),
+])
+
+# Grid resolution of the spatial index, in degrees
+CELL_DEGREES = 1
+GRID_ROWS = 180 // CELL_DEGREES
+GRID_COLS = 360 // CELL_DEGREES
+
+EARTH_RADIUS_KM = 6371.0
+
+# Rows kept in the population ranking index
+POPULAR_ROWS = 1024
+
+# Binary file format: header, section directory, then 8-byte aligned sections
+MAGIC = b"SKYGAZ\x00\x01"
+_HEADER = struct.Struct("<8sI")
+_SECTION = struct.Struct("<16sQQ")
+_ARRAY_SECTIONS = {
+    "records": RECORD_DTYPE,
+    "name_hashes": np.dtype("<u8"),
+    "hash_rows": np.dtype("<u4"),
+    "prefix_rows": np.dtype("<u4"),
+    "cell_start": np.dtype("<u4"),
+    "cell_rows": np.dtype("<u4"),
+    "popular_rows": np.dtype("<u4"),
+}
+# Fuzzy search sections; files written before they existed fall back to prefix search
+_FUZZY_SECTIONS = {
+    "rank_rows": np.dtype("<u4"),
+    "trigram_keys": np.dtype("<u4"),
+    "trigram_start": np.dtype("<u8"),
+    "trigram_ranks": np.dtype("<u4"),
+}
+
+# Cities shipped with the app
+BUILTIN_CITIES = [
+    ("Istanbul", "Turkey", 41.0082, 28.9784, 3),
+    ("Ankara", "Turkey", 39.9334, 32.8597, 3),
+    ("Izmir", "Turkey", 38.4192, 27.1287, 3),
+    ("Antalya", "Turkey", 36.8969, 30.7133, 3),
+    ("London", "UK", 51.5074, -0.1278, 0),
+    ("Paris", "France", 48.8566, 2.3522, 1),
+    ("Berlin", "Germany", 52.5200, 13.4050, 1),
+    ("Rome", "Italy", 41.9028, 12.4964, 1),
+    ("New York", "USA", 40.7128, -74.0060, -5),
+    ("Tokyo", "Japan", 35.6762, 139.6503, 9),
+]
+
+
+def fold(name):
+    """Case- and accent-insensitive form of a name used by every index"""
+    if not name.isascii():
+        name = "".join(c for c in unicodedata.normalize("NFKD", name)
+                       if not unicodedata.combining(c))
+    return name.casefold()
+
+
+def cell_ids(lat, lon):
+    """Grid cell for each lat/lon pair"""
+    row = np.clip(np.floor((np.asarray(lat) + 90) / CELL_DEGREES), 0, GRID_ROWS - 1)
+    col = np.floor((np.asarray(lon) + 180) / CELL_DEGREES).astype(np.int64) % GRID_COLS
+    return row.astype(np.int64) * GRID_COLS + col
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Great-circle distance in km, broadcasting over arrays"""
+    lat1, lon1, lat2, lon2 = (np.radians(a) for a in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class City:
+    """One gazetteer row, decoded on demand"""
+    __slots__ = ("row", "name", "country", "lat", "lon", "timezone", "population")
+
+    def __init__(self, row, name, country, lat, lon, timezone, population=0):
+        self.row = row
+        self.name = name
+        self.country = country
+        self.lat = lat
+        self.lon = lon
+        self.timezone = timezone
+        self.population = population
+
+    def __repr__(self):
+        return f"City({self.name!r}, {self.country!r}, {self.lat:.4f}, {self.lon:.4f})"
+
+
+def place_key(place):
+    """Identity of a place, a City or a bare name: the row, or the folded name if it has none"""
+    if isinstance(place, City) and place.row >= 0:
+        return place.row
+    return fold(place_name(place))
+
+
+def place_name(place):
+    """Name of a place, a City or a bare name"""
+    return place.name if isinstance(place, City) else place
+
+
+class Gazetteer:
+    """Read-only city table with exact, prefix and nearest-neighbour lookup"""
+
+    def __init__(self, records, pool, countries, name_hashes, hash_rows,
+                 prefix_rows, cell_start, cell_rows, popular_rows, rank_rows=None,
+                 trigram_keys=None, trigram_start=None, trigram_ranks=None, source=None):
+        self.records = records
+        self.pool = pool
+        self.countries = countries
+        self.name_hashes = name_hashes
+        self.hash_rows = hash_rows
+        self.prefix_rows = prefix_rows
+        self.cell_start = cell_start
+        self.cell_rows = cell_rows
+        self.popular_rows = popular_rows
+        self.rank_rows = rank_rows
+        self.trigram_keys = trigram_keys
+        self.trigram_start = trigram_start
+        self.trigram_ranks = trigram_ranks
+        # Keeps a backing mmap alive for as long as the arrays view it
+        self.source = source
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the table, string pool and indexes"""
+        arrays = (self.records, self.name_hashes, self.hash_rows, self.prefix_rows,
+                  self.cell_start, self.cell_rows, self.popular_rows, self.rank_rows,
+                  self.trigram_keys, self.trigram_start, self.trigram_ranks)
+        return sum(a.nbytes for a in arrays if a is not None) + len(self.pool)
+
+    # Column access for the vectorized engine
+
+    def tz_hours(self, rows=slice(None)):
+        """UTC offsets in hours for the given rows"""
+        return self.records["tz_minutes"][rows] / 60.0
+
+    def keys(self, rows=slice(None)):
+        """Random-stream keys for the given rows, derived from their coordinates"""
+        return streams.location_keys(self.records["lat"][rows], self.records["lon"][rows])
+
+    def observe(self, rows, timestamps, stream, climate=None):
+        """Observe the given rows with a streams.KeyedStream, touching only their records"""
+        rec = self.records[rows]
+        keys = streams.location_keys(rec["lat"], rec["lon"])
+        return stream.observe(keys, rec["lat"], rec["lon"], rec["tz_minutes"] / 60.0, timestamps,
+                               climate=climate)
+
+    def name(self, row):
+        """Decode the name of one row"""
+        rec = self.records[row]
+        start = int(rec["name_offset"])
+        return bytes(self.pool[start:start + int(rec["name_length"])]).decode("utf-8")
+
+    def city(self, row):
+        """Decode one row into a City"""
+        rec = self.records[row]
+        tz = int(rec["tz_minutes"])
+        return City(int(row), self.name(row), self.countries[int(rec["country"])],
+                    float(rec["lat"]), float(rec["lon"]),
+                    tz // 60 if tz % 60 == 0 else tz / 60, int(rec["population"]))
+
+    # Exact lookup
+
+    def rows_named(self, name):
+        """All rows whose folded name equals the folded query"""
+        key = fold(name)
+        h = np.uint64(streams.city_key(key))
+        lo = np.searchsorted(self.name_hashes, h, side="left")
+        hi = np.searchsorted(self.name_hashes, h, side="right")
+        return [int(r) for r in self.hash_rows[lo:hi] if fold(self.name(r)) == key]
+
+    @metrics.timed("city_lookup", "Exact gazetteer lookup")
+    def lookup(self, name, country=None):
+        """Most populous city with this name (in this country if given), or None"""
+        rows = self.rows_named(name)
+        if country is not None:
+            country = fold(country.strip())
+            rows = [r for r in rows if fold(self.countries[int(self.records["country"][r])]) == country]
+        if not rows:
+            return None
+        pops = self.records["population"][rows]
+        return self.city(rows[int(np.argmax(pops))])
+
+    def __contains__(self, name):
+        return bool(self.rows_named(name))
+
+    # Prefix lookup
+
+    def _folded_at(self, i):
+        return fold(self.name(self.prefix_rows[i]))
+
+    def prefix(self, text, limit=10):
+        """Cities whose folded name starts with text, in name order"""
+        key = fold(text)
+        rows = self.prefix_rows
+        lo = bisect_left(range(len(rows)), key, key=self._folded_at)
+        matches = []
+        for i in range(lo, min(lo + limit, len(rows))):
+            if not self._folded_at(i).startswith(key):
+                break
+            matches.append(self.city(rows[i]))
+        return matches
+
+    # Fuzzy lookup
+
+    @property
+    def has_trigrams(self):
+        return self.trigram_keys is not None
+
+    @metrics.timed("city_suggest", "Fuzzy type-ahead lookup")
+    def suggest(self, text, limit=8, max_errors=None):
+        """Best matches for a partly typed, possibly misspelt name
+
+        Names starting with the query come first, then by trigram
+        similarity and population; one place per name and country. Allows
+        one edit from four characters and two from eight, unless max_errors says
+        otherwise; short queries must match exactly. Without a trigram index
+        this is prefix search.
+        """
+        key = fold(text).lstrip()
+        if not key:
+            return []
+        if not self.has_trigrams or len(key) < 3:
+            return self.prefix(key, limit)
+        if max_errors is None:
+            max_errors = 0 if len(key) < 4 else 1 if len(key) < 8 else 2
+        query = fuzzy.trigrams(key)
+        ranks, matched = fuzzy.candidates(self.trigram_keys, self.trigram_start, self.trigram_ranks,
+                                          query, max_errors)
+        if len(ranks) == 0:
+            return []
+        # Only the candidates sharing the most trigrams are worth scoring
+        top = np.sort(np.argsort(-matched, kind="stable")[:limit * 8])
+        ranks, matched = ranks[top], matched[top]
+        rows = self.rank_rows[ranks]
+        # Trigram Jaccard similarity; a name has about one trigram per byte
+        sizes = np.maximum(self.records["name_length"][rows].astype(np.int64) - 1, 1)
+        similarity = matched / (len(query) + sizes - matched)
+        # Candidates are still in rank order, so a stable sort keeps larger places first
+        best = np.argsort(-similarity, kind="stable")[:limit * 2]
+
+        scored, seen = [], set()
+        for i in best.tolist():
+            row = int(rows[i])
+            name = self.name(row)
+            folded = fold(name)
+            ident = (folded, int(self.records["country"][row]))
+            if ident in seen:
+                continue
+            seen.add(ident)
+            scored.append((not folded.startswith(key), -similarity[i], i, row))
+        scored.sort()
+        return [self.city(row) for *_, row in scored[:limit]]
+
+    # Nearest neighbour
+
+    def nearest(self, lat, lon, k=1):
+        """The k known cities closest to lat/lon, nearest first"""
+        if len(self) == 0:
+            return []
+        row0 = min(max(int((lat + 90) // CELL_DEGREES), 0), GRID_ROWS - 1)
+        col0 = int((lon + 180) // CELL_DEGREES) % GRID_COLS
+        # Rings are widened in longitude by 1/cos(lat) so each one reaches
+        # about as far east-west as north-south; near the poles the first
+        # ring already spans every column
+        stretch = 1.0 / max(math.cos(math.radians(lat)), 1e-9)
+        seen = np.zeros(GRID_ROWS * GRID_COLS, dtype=bool)
+        found = np.empty(0, dtype=np.int64)
+        dist = np.empty(0)
+        for ring in range(GRID_ROWS + GRID_COLS):
+            width = min(math.ceil(ring * stretch), GRID_COLS)
+            rows = np.arange(max(row0 - ring, 0), min(row0 + ring + 1, GRID_ROWS))
+            cols = np.arange(col0 - width, col0 + width + 1) % GRID_COLS
+            cells = (rows[:, None] * GRID_COLS + cols).ravel()
+            cells = np.unique(cells[~seen[cells]])
+            seen[cells] = True
+            starts, ends = self.cell_start[cells], self.cell_start[cells + 1]
+            pieces = [self.cell_rows[s:e] for s, e in zip(starts, ends) if e > s]
+            if pieces:
+                new = np.concatenate(pieces).astype(np.int64)
+                d = haversine_km(lat, lon, self.records["lat"][new], self.records["lon"][new])
+                # Only the k best so far are carried to the next ring
+                found, dist = np.concatenate((found, new)), np.concatenate((dist, d))
+                best = np.argsort(dist, kind="stable")[:k]
+                found, dist = found[best], dist[best]
+            # Anything not yet seen lies beyond `ring` rows, at least this far
+            # north or south, or beyond `width` columns, across a meridian at
+            # least this far east or west
+            all_rows = rows[0] == 0 and rows[-1] == GRID_ROWS - 1
+            all_cols = 2 * width + 1 >= GRID_COLS
+            if all_rows and all_cols:
+                break
+            if len(found) >= k:
+                lat_bound = math.inf if all_rows else ring * CELL_DEGREES * 111.19
+                lon_bound = math.inf if all_cols else EARTH_RADIUS_KM * math.asin(
+                    math.sin(math.radians(min(width * CELL_DEGREES, 90)))
+                    * math.cos(math.radians(lat)))
+                if dist[-1] <= min(lat_bound, lon_bound):
+                    break
+        return [self.city(r) for r in found]
+
+    # Ranking
+
+    def most_populous(self, limit=10):
+        """Largest cities first; ties keep file order"""
+        return [self.city(r) for r in self.popular_rows[:limit]]
+
+
+def build(rows):
+    """Build a Gazetteer from (name, country, lat, lon, tz_hours[, population]) rows"""
+    # Typed buffers keep the build at a few bytes per row rather than a
+    # Python object per field
+    lats, lons = array("f"), array("f")
+    pops, offsets, hashes = array("I"), array("I"), array("Q")
+    lengths, tzs, country_ids = array("H"), array("h"), array("H")
+    pool = bytearray()
+    countries, country_index = [], {}
+    folded = []
+    for row in rows:
+        name, country, lat, lon, tz = row[:5]
+        encoded = name.encode("utf-8")
+        offsets.append(len(pool))
+        lengths.append(len(encoded))
+        pool += encoded
+        lats.append(lat)
+        lons.append(lon)
+        pops.append(row[5] if len(row) > 5 else 0)
+        tzs.append(round(tz * 60))
+        if country not in country_index:
+            country_index[country] = len(countries)
+            countries.append(country)
+        country_ids.append(country_index[country])
+        key = fold(name)
+        folded.append(key)
+        hashes.append(streams.city_key(key))
+
+    n = len(offsets)
+    records = np.empty(n, dtype=RECORD_DTYPE)
+    records["lat"] = np.frombuffer(lats, dtype=np.float32)
+    records["lon"] = np.frombuffer(lons, dtype=np.float32)
+    records["population"] = np.frombuffer(pops, dtype=np.uint32)
+    records["name_offset"] = np.frombuffer(offsets, dtype=np.uint32)
+    records["name_length"] = np.frombuffer(lengths, dtype=np.uint16)
+    records["tz_minutes"] = np.frombuffer(tzs, dtype=np.int16)
+    records["country"] = np.frombuffer(country_ids, dtype=np.uint16)
+
+    hashes = np.frombuffer(hashes, dtype=np.uint64)
+    hash_rows = np.argsort(hashes, kind="stable").astype(np.uint32)
+    prefix_rows = np.array(sorted(range(n), key=folded.__getitem__), dtype=np.uint32)
+
+    cells = cell_ids(records["lat"], records["lon"])
+    cell_rows = np.argsort(cells, kind="stable").astype(np.uint32)
+    cell_start = np.searchsorted(cells[cell_rows], np.arange(GRID_ROWS * GRID_COLS + 1))
+
+    popular_rows = np.argsort(-records["population"].astype(np.int64), kind="stable")
+    popular_rows = popular_rows[:POPULAR_ROWS].astype(np.uint32)
+
+    rank_rows, trigram_keys, trigram_start, trigram_ranks = fuzzy.build(folded, records["population"])
+    del folded
+
+    return Gazetteer(records, bytes(pool), countries, hashes[hash_rows], hash_rows,
+                     prefix_rows, cell_start.astype(np.uint32), cell_rows, popular_rows,
+                     rank_rows, trigram_keys, trigram_start, trigram_ranks)
+
+
+def builtin():
+    """Gazetteer of the cities shipped with the app"""
+    return build(BUILTIN_CITIES)
+
+
+def read_geonames(path, min_population=0):
+    """Yield gazetteer rows from a GeoNames dump (cities500.txt, allCountries.txt)
+
+    Timezones are IANA names in the dump; each is resolved once to its
+    current UTC offset.
+    """
+    from zoneinfo import ZoneInfo
+
+    now = datetime.now()
+    offsets = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t")
+            if len(fields) < 18:
+                continue
+            population = int(fields[14] or 0)
+            if population < min_population:
+                continue
+            tz_name = fields[17]
+            if tz_name not in offsets:
+                try:
+                    delta = ZoneInfo(tz_name).utcoffset(now) if tz_name else None
+                except (KeyError, ValueError):
+                    delta = None
+                offsets[tz_name] = delta.total_seconds() / 3600 if delta else 0
+            yield (fields[1], fields[8], float(fields[4]), float(fields[5]),
+                   offsets[tz_name], min(population, 0xFFFFFFFF))
+
+
+def load_geonames(path, min_population=0):
+    """Build a Gazetteer straight from a GeoNames text dump"""
+    return build(read_geonames(path, min_population))
+
+
+def save(gaz, path):
+    """Write a gazetteer in the memory-mappable binary format"""
+    sections = [(name, np.ascontiguousarray(getattr(gaz, name), dtype=dtype).tobytes())
+                for name, dtype in _ARRAY_SECTIONS.items()]
+    if gaz.has_trigrams:
+        sections += [(name, np.ascontiguousarray(getattr(gaz, name), dtype=dtype).tobytes())
+                     for name, dtype in _FUZZY_SECTIONS.items()]
+    sections.append(("pool", bytes(gaz.pool)))
+    sections.append(("countries", "\x00".join(gaz.countries).encode("utf-8")))
+
+    offset = _HEADER.size + _SECTION.size * len(sections)
+    directory = []
+    for name, data in sections:
+        offset += -offset % 8
+        directory.append((name, offset, len(data)))
+        offset += len(data)
+
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(sections)))
+        for name, start, size in directory:
+            f.write(_SECTION.pack(name.encode("ascii"), start, size))
+        for (name, data), (_, start, _) in zip(sections, directory):
+            f.write(b"\x00" * (start - f.tell()))
+            f.write(data)
+
+
+def open_binary(path):
+    """Map a binary gazetteer; records are decoded only when touched"""
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    # Lookups hop around the file, so readahead only wastes page cache
+    if hasattr(buf, "madvise"):
+        buf.madvise(mmap.MADV_RANDOM)
+    magic, count = _HEADER.unpack_from(buf, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a SkyCast gazetteer file")
+    sections = {}
+    for i in range(count):
+        name, start, size = _SECTION.unpack_from(buf, _HEADER.size + i * _SECTION.size)
+        sections[name.rstrip(b"\x00").decode("ascii")] = (start, size)
+
+    arrays = {}
+    for name, dtype in _ARRAY_SECTIONS.items():
+        start, size = sections[name]
+        arrays[name] = np.frombuffer(buf, dtype=dtype, count=size // dtype.itemsize, offset=start)
+    if all(name in sections for name in _FUZZY_SECTIONS):
+        for name, dtype in _FUZZY_SECTIONS.items():
+            start, size = sections[name]
+            arrays[name] = np.frombuffer(buf, dtype=dtype, count=size // dtype.itemsize, offset=start)
+    start, size = sections["pool"]
+    pool = memoryview(buf)[start:start + size]
+    start, size = sections["countries"]
+    countries = buf[start:start + size].decode("utf-8").split("\x00")
+    return Gazetteer(pool=pool, countries=countries, source=buf, **arrays)
+
+
+def is_binary(path):
+    """True if path starts with the binary gazetteer magic"""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def load(path):
+    """Open a binary gazetteer by mapping it, or parse a GeoNames text dump"""
+    if is_binary(path):
+        return open_binary(path)
+    return load_geonames(path)
+
+
+def main(argv=None):
+    """Command line converter: GeoNames text dump -> binary gazetteer"""
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build a SkyCast binary gazetteer")
+    parser.add_argument("source", help="GeoNames dump such as cities500.txt")
+    parser.add_argument("output", help="binary gazetteer to write, e.g. cities.gaz")
+    parser.add_argument("--min-population", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    gaz = load_geonames(args.source, args.min_population)
+    save(gaz, args.output)
+    print(f"{len(gaz)} cities, {gaz.nbytes / 1e6:.1f} MB, "
+          f"{time.perf_counter() - start:.1f}s -> {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,389 @@
+"""Append-only observation history in SQLite
+
+Every generated observation can be recorded here and read back by city
+and time range, raw or downsampled. The store is one SQLite file in WAL
+mode, so reads never wait for the writer.
+
+* ``record`` only queues rows. A writer thread commits them in batches of
+  up to ``batch_rows`` rows, or whatever arrived within ``flush_seconds``,
+  one transaction per batch, so callers on the Tk thread never touch disk.
+* Cities are keyed on folded name and country, so Paris, FR and Paris,
+  US keep separate histories. Readers may omit the country; the name then
+  means the city of that name with the most observations.
+* Observations live in a WITHOUT ROWID table clustered on (city, time).
+  A range scan reads consecutive pages, and recording the same city and
+  time twice keeps the first row. Values are stored as small integers
+  (tenths of a degree or km/h), about 30 bytes a row on disk.
+* Each batch also updates an hourly rollup (count, min, max and sums per
+  city and hour) in the same transaction. Hourly and daily aggregates
+  over years of minute-level data read the rollup, about 1/60 of the rows.
+
+    python history.py history.db Paris --country FR --days 7 --step 1d
+"""
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+import numpy as np
+
+import gazetteer
+import simulator
+
+# Conditions counted as precipitation in aggregates
+WET_CONDITIONS = tuple(simulator.CONDITIONS.index(c)
+                       for c in ("Rain", "Drizzle", "Thunderstorm", "Snow"))
+
+# Columns returned by HistoryStore.range(), after time
+RANGE_FIELDS = ("temp", "feels_like", "humidity", "pressure", "wind_speed", "condition")
+
+# Columns returned by HistoryStore.aggregate(), after time
+AGGREGATE_FIELDS = ("count", "temp_min", "temp_max", "temp_mean", "wind_max", "wind_mean",
+                    "humidity_mean", "pressure_mean", "precip_fraction")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cities (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    country TEXT NOT NULL,
+    timezone REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS observations (
+    city INTEGER NOT NULL,
+    time INTEGER NOT NULL,
+    temp INTEGER NOT NULL,
+    feels_like INTEGER NOT NULL,
+    humidity INTEGER NOT NULL,
+    pressure INTEGER NOT NULL,
+    wind INTEGER NOT NULL,
+    condition INTEGER NOT NULL,
+    PRIMARY KEY (city, time)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS hourly (
+    city INTEGER NOT NULL,
+    hour INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    temp_min INTEGER NOT NULL,
+    temp_max INTEGER NOT NULL,
+    temp_sum INTEGER NOT NULL,
+    wind_max INTEGER NOT NULL,
+    wind_sum INTEGER NOT NULL,
+    humidity_sum INTEGER NOT NULL,
+    pressure_sum INTEGER NOT NULL,
+    wet INTEGER NOT NULL,
+    PRIMARY KEY (city, hour)
+) WITHOUT ROWID;
+"""
+
+# Stage a batch, drop rows already stored, then append and roll up the rest
+_STAGE = """
+CREATE TEMP TABLE IF NOT EXISTS batch (
+    city INTEGER, time INTEGER, temp INTEGER, feels_like INTEGER, humidity INTEGER,
+    pressure INTEGER, wind INTEGER, condition INTEGER, PRIMARY KEY (city, time)
+) WITHOUT ROWID
+"""
+_FILTER = """
+DELETE FROM temp.batch WHERE EXISTS (
+    SELECT 1 FROM observations o WHERE o.city = batch.city AND o.time = batch.time)
+"""
+_APPEND = "INSERT INTO observations SELECT * FROM temp.batch"
+_ROLLUP = f"""
+INSERT INTO hourly
+SELECT city, time / 3600 * 3600, count(*), min(temp), max(temp), sum(temp), max(wind), sum(wind),
+       sum(humidity), sum(pressure), sum(condition IN ({",".join(map(str, WET_CONDITIONS))}))
+FROM temp.batch GROUP BY city, time / 3600
+ON CONFLICT (city, hour) DO UPDATE SET
+    n = n + excluded.n,
+    temp_min = min(temp_min, excluded.temp_min),
+    temp_max = max(temp_max, excluded.temp_max),
+    temp_sum = temp_sum + excluded.temp_sum,
+    wind_max = max(wind_max, excluded.wind_max),
+    wind_sum = wind_sum + excluded.wind_sum,
+    humidity_sum = humidity_sum + excluded.humidity_sum,
+    pressure_sum = pressure_sum + excluded.pressure_sum,
+    wet = wet + excluded.wet
+"""
+
+
+def city_key(name, country):
+    """Key of a city in the cities table"""
+    return gazetteer.fold(name) + "\t" + gazetteer.fold(country)
+
+
+def connect(path):
+    """SQLite connection in WAL mode with the schema in place"""
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # WAL with synchronous=NORMAL stays consistent; a crash loses at most the last batches
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+def _migrate(conn):
+    """Rekey cities recorded before keys carried the country"""
+    old = conn.execute("SELECT id, name, country FROM cities WHERE instr(key, char(9)) = 0").fetchall()
+    if old:
+        with conn:
+            conn.executemany("UPDATE cities SET key = ? WHERE id = ?",
+                             [(city_key(name, country), city) for city, name, country in old])
+
+
+def observation_row(data, timestamp):
+    """(name, country, timezone) and value tuple for an app observation dict"""
+    condition = data['weather'][0]['main']
+    return (data['name'], data['sys']['country'], float(data.get('timezone', 0))), (
+        int(timestamp),
+        round(data['main']['temp'] * 10),
+        round(data['main']['feels_like'] * 10),
+        int(data['main']['humidity']),
+        int(data['main']['pressure']),
+        round(data['wind']['speed'] * 10),
+        simulator.CONDITIONS.index(condition) if condition in simulator.CONDITIONS else -1,
+    )
+
+
+class HistoryStore:
+    """Batched, thread-safe writer and reader for one history file"""
+
+    def __init__(self, path, batch_rows=4096, flush_seconds=1.0):
+        self.path = path
+        self.batch_rows = batch_rows
+        self.flush_seconds = flush_seconds
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = connect(path)
+        try:
+            _migrate(conn)
+        finally:
+            conn.close()
+
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        # City key -> city id, assigned by the writer; readers query the table
+        self._city_ids = {}
+        self.written = 0
+        self.skipped = 0
+        self.batches = 0
+        self.errors = 0
+        self._closed = False
+        self._writer = threading.Thread(target=self._run, name="skycast-history", daemon=True)
+        self._writer.start()
+
+    # Writing
+
+    def record(self, observations, timestamp=None):
+        """Queue app observation dicts taken at timestamp (default now) for writing"""
+        if self._closed or not observations:
+            return
+        timestamp = int(time.time()) if timestamp is None else int(timestamp)
+        self._queue.put([observation_row(data, timestamp) for data in observations])
+
+    def flush(self, timeout=None):
+        """Wait until everything recorded so far is committed"""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self, timeout=5):
+        """Write what is queued and stop the writer"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+            self._writer.join(timeout)
+
+    def _run(self):
+        conn = connect(self.path)
+        conn.execute(_STAGE)
+        running = True
+        while running:
+            item = self._queue.get()
+            rows, waiters = [], []
+            deadline = time.monotonic() + self.flush_seconds
+            # Gather until the batch is full, a flush is requested or time is up
+            while True:
+                if item is None:
+                    running = False
+                    break
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                rows.extend(item)
+                if len(rows) >= self.batch_rows:
+                    break
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            if rows:
+                try:
+                    self._write(conn, rows)
+                except sqlite3.Error:
+                    # A failed batch is dropped; history is best effort
+                    self.errors += 1
+                    conn.rollback()
+            for waiter in waiters:
+                waiter.set()
+        conn.close()
+
+    def _write(self, conn, rows):
+        values = []
+        for (name, country, tz), row in rows:
+            key = city_key(name, country)
+            city = self._city_ids.get(key)
+            if city is None:
+                conn.execute("INSERT OR IGNORE INTO cities (key, name, country, timezone) VALUES (?, ?, ?, ?)",
+                             (key, name, country, tz))
+                city = conn.execute("SELECT id FROM cities WHERE key = ?", (key,)).fetchone()[0]
+                self._city_ids[key] = city
+            values.append((city,) + row)
+        with conn:
+            conn.execute("DELETE FROM temp.batch")
+            conn.executemany("INSERT OR IGNORE INTO temp.batch VALUES (?, ?, ?, ?, ?, ?, ?, ?)", values)
+            conn.execute(_FILTER)
+            added = conn.execute("SELECT count(*) FROM temp.batch").fetchone()[0]
+            conn.execute(_APPEND)
+            conn.execute(_ROLLUP)
+        self.written += added
+        self.skipped += len(values) - added
+        self.batches += 1
+
+    # Reading
+
+    def _reader(self):
+        """This thread's read connection"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = connect(self.path)
+        return conn
+
+    def cities(self):
+        """(name, country) of every recorded city"""
+        return self._reader().execute("SELECT name, country FROM cities ORDER BY name, country").fetchall()
+
+    def _city_id(self, city, country=None):
+        if country is not None:
+            row = self._reader().execute("SELECT id FROM cities WHERE key = ?",
+                                         (city_key(city, country),)).fetchone()
+            return None if row is None else row[0]
+        # Any country: the namesake with the most observations
+        prefix = gazetteer.fold(city) + "\t"
+        row = self._reader().execute(
+            "SELECT c.id FROM cities c LEFT JOIN hourly h ON h.city = c.id "
+            "WHERE c.key >= ? AND c.key < ? GROUP BY c.id ORDER BY coalesce(sum(h.n), 0) DESC, c.id LIMIT 1",
+            (prefix, prefix[:-1] + "\n")).fetchone()
+        return None if row is None else row[0]
+
+    def range(self, city, start, end, country=None):
+        """Columns of every observation of city with start <= time < end, in time order
+
+        Without a country, city is its most observed namesake.
+        """
+        city_id = self._city_id(city, country)
+        rows = [] if city_id is None else self._reader().execute(
+            "SELECT time, temp, feels_like, humidity, pressure, wind, condition FROM observations "
+            "WHERE city = ? AND time >= ? AND time < ? ORDER BY time", (city_id, int(start), int(end))
+        ).fetchall()
+        data = np.array(rows, dtype=np.int64).reshape(-1, 7)
+        return {
+            'time': data[:, 0],
+            'temp': data[:, 1] / 10,
+            'feels_like': data[:, 2] / 10,
+            'humidity': data[:, 3].astype(np.int16),
+            'pressure': data[:, 4].astype(np.int16),
+            'wind_speed': data[:, 5] / 10,
+            'condition': data[:, 6].astype(np.int8),
+        }
+
+    def aggregate(self, city, start, end, step=3600, offset=0, country=None):
+        """Per-bucket statistics of city's observations with start <= time < end
+
+        Buckets are step seconds long and start at multiples of step after
+        shifting times by offset seconds (e.g. a UTC offset for local days);
+        'time' is each bucket's start in UTC. Whole-hour steps and offsets
+        are answered from the hourly rollup. Without a country, city is
+        its most observed namesake.
+        """
+        city_id = self._city_id(city, country)
+        step, offset, start, end = int(step), int(offset), int(start), int(end)
+        if city_id is None:
+            rows = []
+        elif step % 3600 == 0 and offset % 3600 == 0:
+            # Rollup hours that overlap the range; callers wanting exact
+            # edges pass hour-aligned bounds
+            rows = self._reader().execute(
+                "SELECT (hour + :offset) / :step * :step - :offset AS bucket, sum(n), min(temp_min), "
+                "max(temp_max), sum(temp_sum), max(wind_max), sum(wind_sum), sum(humidity_sum), "
+                "sum(pressure_sum), sum(wet) FROM hourly "
+                "WHERE city = :city AND hour >= :start / 3600 * 3600 AND hour < :end "
+                "GROUP BY bucket ORDER BY bucket",
+                {'city': city_id, 'start': start, 'end': end, 'step': step, 'offset': offset}).fetchall()
+        else:
+            wet = ",".join(map(str, WET_CONDITIONS))
+            rows = self._reader().execute(
+                "SELECT (time + :offset) / :step * :step - :offset AS bucket, count(*), min(temp), "
+                "max(temp), sum(temp), max(wind), sum(wind), sum(humidity), sum(pressure), "
+                f"sum(condition IN ({wet})) FROM observations "
+                "WHERE city = :city AND time >= :start AND time < :end "
+                "GROUP BY bucket ORDER BY bucket",
+                {'city': city_id, 'start': start, 'end': end, 'step': step, 'offset': offset}).fetchall()
+        data = np.array(rows, dtype=np.int64).reshape(-1, 10)
+        count = data[:, 1]
+        n = np.maximum(count, 1)
+        return {
+            'time': data[:, 0],
+            'count': count,
+            'temp_min': data[:, 2] / 10,
+            'temp_max': data[:, 3] / 10,
+            'temp_mean': data[:, 4] / n / 10,
+            'wind_max': data[:, 5] / 10,
+            'wind_mean': data[:, 6] / n / 10,
+            'humidity_mean': data[:, 7] / n,
+            'pressure_mean': data[:, 8] / n,
+            'precip_fraction': data[:, 9] / n,
+        }
+
+    def stats(self):
+        """Writer counters, queue depth and file size"""
+        size = sum(os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p))
+        return {'written': self.written, 'skipped': self.skipped, 'batches': self.batches,
+                'errors': self.errors, 'queued': self._queue.qsize(), 'bytes': size}
+
+
+def main(argv=None):
+    """Print hourly or daily aggregates for a city"""
+    import argparse
+
+    import export
+
+    parser = argparse.ArgumentParser(description="Query SkyCast observation history")
+    parser.add_argument("path", help="history database, e.g. ~/.skycast/history.db")
+    parser.add_argument("city", nargs="?", help="city name (default: list recorded cities)")
+    parser.add_argument("--country", help="country of the city, for names recorded in several")
+    parser.add_argument("--days", type=float, default=1, help="how far back to look")
+    parser.add_argument("--step", type=export.parse_step, default=3600, help="bucket size such as 1h, 1d")
+    args = parser.parse_args(argv)
+
+    store = HistoryStore(args.path)
+    try:
+        if not args.city:
+            print("\n".join(f"{name}, {country}" for name, country in store.cities()))
+            return 0
+        end = int(time.time())
+        agg = store.aggregate(args.city, end - int(args.days * 86400), end, args.step,
+                              country=args.country)
+        print("time                 count   min    max   mean  precip")
+        for i in range(len(agg['time'])):
+            moment = time.strftime("%Y-%m-%d %H:%M", time.gmtime(int(agg['time'][i])))
+            print(f"{moment} UTC {agg['count'][i]:6d} {agg['temp_min'][i]:5.1f}  {agg['temp_max'][i]:5.1f} "
+                  f"{agg['temp_mean'][i]:5.1f}  {agg['precip_fraction'][i]:5.0%}")
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
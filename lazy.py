@@ -0,0 +1,51 @@
+"""Deferred module imports
+
+``lazy_import(name)`` returns a module whose code runs on the first access
+to an attribute it does not have yet, in whichever thread gets there
+first. The app uses it to keep NumPy, sqlite3 and asyncio off the path to
+its first painted window: a module that is only needed for an optional
+backend, or only after startup, costs nothing until something touches it.
+
+A lazy module is registered in ``sys.modules`` like any other, so later
+plain imports of the same name share it, and it is executed in place, so
+every holder sees the loaded module. Loading takes a lock: the standard
+library's ``LazyLoader`` does not before Python 3.12, and a second worker
+thread could otherwise see a half-executed module.
+"""
+import importlib.util
+import sys
+import threading
+import types
+
+# Serializes first loads; reentrant so a loading module can touch others
+_lock = threading.RLock()
+_loading = set()
+
+
+class _LazyModule(types.ModuleType):
+    """Placeholder module that executes itself on first access to a missing attribute"""
+
+    def __getattr__(self, attr):
+        with _lock:
+            if type(self) is _LazyModule and self.__name__ not in _loading:
+                _loading.add(self.__name__)
+                try:
+                    self.__spec__.loader.exec_module(self)
+                    self.__class__ = types.ModuleType
+                finally:
+                    _loading.discard(self.__name__)
+        # Loaded (or, within its own import, partly loaded) by now
+        return types.ModuleType.__getattribute__(self, attr)
+
+
+def lazy_import(name):
+    """Module name, executed on first attribute access; already imported modules are returned as is"""
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    module = importlib.util.module_from_spec(spec)
+    module.__class__ = _LazyModule
+    sys.modules[name] = module
+    return module
@@ -0,0 +1,171 @@
+"""Opt-in latency histograms and counters for the app
+
+Functions decorated with ``timed`` record their latency into a fixed-bucket
+histogram while collection is enabled. While it is off the wrapper only
+reads one flag before calling through, so the decorators stay in
+production code. Counters that already exist elsewhere (cache hits,
+widgets created, queue depths) are not copied: ``register`` adds a
+callback that is read only when a snapshot is taken.
+
+Snapshots come out as a dict (``snapshot``), Prometheus text exposition
+(``prometheus_text``) or a file (``write``). Collection starts enabled
+when SKYCAST_METRICS is set to anything but 0.
+"""
+from bisect import bisect_left
+import functools
+import json
+import os
+import threading
+import time
+
+# Bucket upper bounds in seconds: 1 µs to about 47 s in steps of sqrt(2)
+BOUNDS = tuple(1e-6 * 2 ** (k / 2) for k in range(52))
+
+
+class Histogram:
+    """Latency histogram with fixed log-spaced buckets"""
+
+    def __init__(self, name, doc=""):
+        self.name = name
+        self.doc = doc
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        i = bisect_left(BOUNDS, seconds)
+        with self._lock:
+            self.counts[i] += 1
+            self.count += 1
+            self.sum += seconds
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (0 if empty)"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(BOUNDS, self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(BOUNDS) + 1)
+            self.count = 0
+            self.sum = 0.0
+
+    def summary(self):
+        """Count, mean and bucket-resolution quantiles in milliseconds"""
+        return {
+            'count': self.count,
+            'mean_ms': round(self.sum / self.count * 1000, 3) if self.count else 0.0,
+            'p50_ms': round(self.quantile(0.5) * 1000, 3),
+            'p95_ms': round(self.quantile(0.95) * 1000, 3),
+            'p99_ms': round(self.quantile(0.99) * 1000, 3),
+        }
+
+
+class Registry:
+    """Named histograms plus callbacks that report other components' counters"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.sources = {}
+
+    def histogram(self, name, doc=""):
+        """The histogram called name, created on first use"""
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram(name, doc)
+        return hist
+
+    def register(self, name, fn):
+        """Report fn()'s dict of numbers under name in every snapshot"""
+        self.sources[name] = fn
+
+    def unregister(self, name):
+        self.sources.pop(name, None)
+
+    def reset(self):
+        for hist in self.histograms.values():
+            hist.reset()
+
+    def snapshot(self):
+        """Histogram summaries and source values as a JSON-able dict"""
+        sources = {}
+        for name, fn in list(self.sources.items()):
+            try:
+                values = fn()
+            except Exception:
+                # A component that is shutting down just drops out of the snapshot
+                continue
+            sources[name] = {k: v for k, v in values.items() if isinstance(v, (int, float))}
+        return {
+            'enabled': self.enabled,
+            'timestamp': time.time(),
+            'latency': {name: hist.summary() for name, hist in sorted(self.histograms.items())},
+            'sources': sources,
+        }
+
+    def prometheus_text(self, prefix="skycast"):
+        """Everything in the Prometheus text exposition format"""
+        lines = []
+        for name, hist in sorted(self.histograms.items()):
+            metric = f"{prefix}_{name}_seconds"
+            if hist.doc:
+                lines.append(f"# HELP {metric} {hist.doc}")
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, n in zip(BOUNDS, hist.counts):
+                cumulative += n
+                lines.append(f'{metric}_bucket{{le="{bound:.6g}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {hist.count}')
+            lines.append(f"{metric}_sum {hist.sum:.9g}")
+            lines.append(f"{metric}_count {hist.count}")
+        for source, values in self.snapshot()['sources'].items():
+            for key, value in sorted(values.items()):
+                metric = f"{prefix}_{source}_{key}"
+                lines.append(f"# TYPE {metric} gauge")
+                lines.append(f"{metric} {float(value):.9g}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Write a snapshot: JSON for *.json paths, Prometheus text otherwise"""
+        text = (json.dumps(self.snapshot(), indent=2) + "\n" if path.endswith(".json")
+                else self.prometheus_text())
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(text)
+        # Scrapers never see a half-written file
+        os.replace(tmp, path)
+
+
+REGISTRY = Registry(enabled=os.environ.get("SKYCAST_METRICS", "0") not in ("", "0"))
+
+
+def enable(on=True):
+    REGISTRY.enabled = on
+
+
+def timed(name, doc="", registry=REGISTRY):
+    """Decorator recording each call's latency in histogram name while collection is on"""
+    def decorate(fn):
+        hist = registry.histogram(name, doc)
+        perf_counter = time.perf_counter
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not registry.enabled:
+                return fn(*args, **kwargs)
+            start = perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                hist.observe(perf_counter() - start)
+        return wrapper
+    return decorate
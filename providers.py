@@ -0,0 +1,379 @@
+"""Pluggable weather providers
+
+Every provider answers ``await provider.current(city)`` with the app's
+OpenWeatherMap-shaped dict and ``await provider.current_many(cities)`` for
+a whole list. ``SimulatorProvider`` wraps the local engine;
+``HTTPProvider`` talks to an OpenWeatherMap-compatible backend over a
+pooled, pipelined HTTP/1.1 keep-alive client built on asyncio streams,
+with a concurrency cap, coalescing of duplicate in-flight cities and
+retry with exponential backoff.
+"""
+from collections import deque
+from datetime import datetime, timedelta, timezone as dt_timezone
+import json
+import random
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+import gazetteer
+from lazy import lazy_import
+import simulator
+import solar
+import streams
+
+# Only the HTTP backend needs these; the simulator alone never loads them
+asyncio = lazy_import("asyncio")
+ssl = lazy_import("ssl")
+
+# Statuses worth retrying
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ProviderError(RuntimeError):
+    """A provider could not produce an observation"""
+
+
+class WeatherProvider:
+    """Base class: subclasses implement current()"""
+
+    async def current(self, city):
+        """Observation dict for one city"""
+        raise NotImplementedError
+
+    async def current_many(self, cities):
+        """Observation dicts for many cities, in order; failures come back as exceptions"""
+        return await asyncio.gather(*(self.current(c) for c in cities), return_exceptions=True)
+
+    async def close(self):
+        """Release connections and other resources"""
+
+
+class SimulatorProvider(WeatherProvider):
+    """The local simulator behind the provider interface"""
+
+    def __init__(self, city_database, stream, climate=None):
+        self.city_database = city_database
+        self.stream = stream
+        # Optional climatology.Climatology replacing the global seasonal rules
+        self.climate = climate
+        # Resolved names; lookups dominate small batches otherwise
+        self._resolved = {}
+        # Per-city sunrise/sunset tables shared by every refresh
+        self.sun = solar.SunTable()
+
+    def resolve(self, city):
+        """Look up a city (a name or a gazetteer.City) and its random-stream key; unknown names sit at 0°/UTC"""
+        # Gazetteer cities resolve by row, so places sharing a name stay apart
+        known = isinstance(city, gazetteer.City) and city.row >= 0
+        key = city.row if known else gazetteer.place_name(city)
+        resolved = self._resolved.get(key)
+        if resolved is None:
+            city_info = city if known else self.city_database.lookup(key)
+            if city_info:
+                resolved = city_info, int(streams.location_keys(city_info.lat, city_info.lon))
+            else:
+                resolved = gazetteer.City(-1, key, "??", 0, 0, 0), streams.city_key(key)
+            if len(self._resolved) >= 65536:
+                self._resolved.clear()
+            self._resolved[key] = resolved
+        return resolved
+
+    def observe_many(self, cities, timestamp=None):
+        """Observe all cities in one vectorized batch, on their forecast paths (streams.KeyedStream.observe)"""
+        timestamp = int(time.time()) if timestamp is None else int(timestamp)
+        resolved = [self.resolve(c) for c in cities]
+        if not resolved:
+            return []
+        infos = [info for info, _ in resolved]
+        keys = np.array([int(key) for _, key in resolved], dtype=np.uint64)
+        batch = self.stream.observe(keys, [c.lat for c in infos], [c.lon for c in infos],
+                                     [c.timezone for c in infos], timestamp, sun=self.sun,
+                                     climate=self.climate)
+        return [simulator.observation(batch, i, c.name, c.country, c.timezone)
+                for i, c in enumerate(infos)]
+
+    def observe(self, city, timestamp=None):
+        """Simulate one city"""
+        return self.observe_many([city], timestamp)[0]
+
+    async def current(self, city):
+        return self.observe(city)
+
+    async def current_many(self, cities):
+        return self.observe_many(cities)
+
+
+def normalize(payload):
+    """Convert an OpenWeatherMap /weather response into the app's dict"""
+    tz_hours = payload.get('timezone', 0) / 3600
+    if tz_hours == int(tz_hours):
+        tz_hours = int(tz_hours)
+    tz = dt_timezone(timedelta(hours=tz_hours))
+    sys_info = payload.get('sys', {})
+    now = payload.get('dt', time.time())
+    month, _, _ = simulator.local_time_fields(now, tz_hours)
+    lat = payload.get('coord', {}).get('lat', 0)
+    season = int(simulator.season_codes(month, lat))
+    weather = payload.get('weather') or [{'main': 'Clear', 'description': 'Clear'}]
+    return {
+        'name': payload.get('name', ''),
+        'sys': {'country': sys_info.get('country', '??')},
+        'main': {
+            'temp': round(payload['main']['temp'], 1),
+            'feels_like': round(payload['main'].get('feels_like', payload['main']['temp']), 1),
+            'humidity': int(payload['main'].get('humidity', 0)),
+            'pressure': int(payload['main'].get('pressure', 0))
+        },
+        'wind': {'speed': round(payload.get('wind', {}).get('speed', 0.0), 1)},
+        'weather': [{
+            'description': weather[0].get('description', '').title(),
+            'main': weather[0].get('main', 'Clear')
+        }],
+        'sys_data': {
+            'sunrise': datetime.fromtimestamp(sys_info.get('sunrise', now), tz),
+            'sunset': datetime.fromtimestamp(sys_info.get('sunset', now), tz)
+        },
+        'timezone': tz_hours,
+        'season': simulator.SEASONS[season]
+    }
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response: (status, headers, body)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("connection closed by server")
+    parts = status_line.decode("latin-1").split(" ", 2)
+    if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+        raise ConnectionError(f"malformed status line {status_line!r}")
+    status = int(parts[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if size == 0:
+                # Trailers, then the blank line ending the message
+                while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    pass
+                break
+            chunks.append(await reader.readexactly(size))
+            await reader.readexactly(2)
+        body = b"".join(chunks)
+    elif "content-length" in headers:
+        body = await reader.readexactly(int(headers["content-length"]))
+    else:
+        body = await reader.read()
+        headers["connection"] = "close"
+    return status, headers, body
+
+
+class Connection:
+    """One keep-alive connection; requests may be pipelined and are answered in order"""
+
+    def __init__(self, host, port, ssl_context=None):
+        self.host = host
+        self.waiters = deque()
+        self.closed = False
+        self._lock = asyncio.Lock()
+        self._ready = asyncio.ensure_future(asyncio.open_connection(host, port, ssl=ssl_context))
+        self._reader_task = None
+        self.writer = None
+        # Requests assigned to this connection and not yet answered
+        self.load = 0
+
+    async def request(self, path, headers=None):
+        """Send a GET and wait for its response"""
+        self.load += 1
+        try:
+            return await self._request(path, headers)
+        finally:
+            self.load -= 1
+
+    async def _request(self, path, headers):
+        try:
+            reader, self.writer = await self._ready
+        except BaseException:
+            self.closed = True
+            raise
+        if self._reader_task is None:
+            self._reader_task = asyncio.ensure_future(self._read_loop(reader))
+        if self.closed:
+            raise ConnectionError("connection closed")
+        lines = [f"GET {path} HTTP/1.1", f"Host: {self.host}", "Connection: keep-alive",
+                 "Accept: application/json"]
+        lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        future = asyncio.get_running_loop().create_future()
+        # Queue the waiter and write under one lock so responses match request order
+        async with self._lock:
+            self.waiters.append(future)
+            try:
+                self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+                await self.writer.drain()
+            except BaseException:
+                # Nobody will wait on this response any more
+                future.cancel()
+                raise
+        return await future
+
+    async def _read_loop(self, reader):
+        error = ConnectionError("connection closed")
+        try:
+            while True:
+                status, headers, body = await read_response(reader)
+                future = self.waiters.popleft()
+                if not future.done():
+                    future.set_result((status, headers, body))
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (OSError, asyncio.IncompleteReadError, ValueError, IndexError) as exc:
+            error = ConnectionError(str(exc) or "connection closed")
+        finally:
+            self.closed = True
+            while self.waiters:
+                future = self.waiters.popleft()
+                if not future.done():
+                    future.set_exception(error)
+            if self.writer is not None:
+                self.writer.close()
+
+    def close(self):
+        """Close the socket; pending requests fail with ConnectionError"""
+        self.closed = True
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        if self.writer is not None:
+            self.writer.close()
+        elif not self._ready.done():
+            self._ready.cancel()
+
+
+class ConnectionPool:
+    """Up to max_connections keep-alive connections to one host, pipeline_depth deep each"""
+
+    def __init__(self, base_url, max_connections=128, pipeline_depth=4):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.ssl_context = ssl.create_default_context() if parts.scheme == "https" else None
+        self.prefix = parts.path.rstrip("/")
+        self.max_connections = max_connections
+        self.pipeline_depth = pipeline_depth
+        self.connections = []
+        self.opened = 0
+
+    def _pick(self):
+        """Least-loaded live connection, opening a new one while under the limit"""
+        self.connections = [c for c in self.connections if not c.closed]
+        best = min(self.connections, key=lambda c: c.load, default=None)
+        if best is None or (best.load >= self.pipeline_depth
+                            and len(self.connections) < self.max_connections):
+            best = Connection(self.host, self.port, self.ssl_context)
+            self.connections.append(best)
+            self.opened += 1
+        return best
+
+    async def get(self, path, headers=None):
+        """GET prefix+path on a pooled connection"""
+        return await self._pick().request(self.prefix + path, headers)
+
+    def close(self):
+        for conn in self.connections:
+            conn.close()
+        self.connections = []
+
+
+class HTTPProvider(WeatherProvider):
+    """OpenWeatherMap-compatible HTTP backend
+
+    ``base_url`` points at the API root (the stub server or
+    https://api.openweathermap.org/data/2.5); ``/weather?q=City`` is
+    requested below it.
+    """
+
+    def __init__(self, base_url, api_key=None, max_connections=128, pipeline_depth=4,
+                 max_concurrency=512, retries=3, backoff=0.2, timeout=10.0):
+        self.pool = ConnectionPool(base_url, max_connections, pipeline_depth)
+        self.api_key = api_key
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._semaphore = None
+        self._inflight = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.retried = 0
+
+    def path_for(self, city):
+        params = {"q": city, "units": "metric"}
+        if self.api_key:
+            params["appid"] = self.api_key
+        return "/weather?" + urlencode(params)
+
+    async def current(self, city):
+        # Duplicate cities share one in-flight request
+        key = gazetteer.fold(city)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(city))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _fetch(self, city):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        path = self.path_for(city)
+        async with self._semaphore:
+            for attempt in range(self.retries + 1):
+                try:
+                    self.requests += 1
+                    status, _, body = await asyncio.wait_for(self.pool.get(path), self.timeout)
+                    if status == 200:
+                        try:
+                            return normalize(json.loads(body))
+                        except (ValueError, KeyError, TypeError, AttributeError):
+                            raise ProviderError(f"{city}: bad payload") from None
+                    if status not in RETRY_STATUSES:
+                        raise ProviderError(f"{city}: HTTP {status}")
+                    error = ProviderError(f"{city}: HTTP {status}")
+                except (ConnectionError, OSError, asyncio.TimeoutError) as exc:
+                    error = ProviderError(f"{city}: {exc or type(exc).__name__}")
+                if attempt == self.retries:
+                    raise error
+                self.retried += 1
+                # Exponential backoff with jitter so retries don't arrive in lockstep
+                await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+    async def close(self):
+        self.pool.close()
+
+
+class ProviderThread:
+    """Private asyncio loop on a daemon thread, so Tk code can call async providers"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, name="skycast-provider",
+                                       daemon=True)
+        self.thread.start()
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop and block for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
@@ -0,0 +1,155 @@
+"""Periodic refresh of pinned cities for the Tk app
+
+One ``after`` timer ticks for every city. Each city has its own interval,
+its first refresh is staggered by a stable per-city phase, and every
+later one is jittered, so a dozen pins spread out instead of landing in
+one frame. All cities due on the same tick go out as a single batch; a
+tick that finds a batch still running leaves the due cities queued for
+the next one. The scheduler pauses while its toplevel is minimized and
+catches up with one batch when it is restored.
+"""
+import heapq
+import itertools
+import random
+import time
+
+import streams
+
+
+class RefreshScheduler:
+    """Keeps pinned cities fresh by calling run_batch(cities, done) from the Tk thread
+
+    Cities are any hashable keys; the app uses gazetteer.place_key. run_batch
+    must arrange for done() to be called once the batch has been handled
+    (successfully or not); until then no other batch starts.
+    """
+
+    def __init__(self, root, run_batch, interval=60.0, jitter=0.1, tick_ms=500, max_batch=64,
+                 clock=time.monotonic, rng=None):
+        self.root = root
+        self.run_batch = run_batch
+        self.interval = interval
+        self.jitter = jitter
+        self.tick_ms = tick_ms
+        self.max_batch = max_batch
+        self.clock = clock
+        self.rng = rng or random.Random()
+        # city -> (interval, due time); the heap may hold stale entries
+        self.pins = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._after_id = None
+        self.running = False
+        self.suspended = False
+        self.in_flight = False
+        self.batches = 0
+        self.refreshed = 0
+
+    # Pins
+
+    def pin(self, city, interval=None):
+        """Refresh city every interval seconds (the default if None), starting at its phase"""
+        interval = self.interval if interval is None else interval
+        # Stable phase in [0, interval) so restarts keep cities apart
+        phase = (streams.city_key(str(city)) % 1000) / 1000 * interval
+        self._schedule(city, interval, self.clock() + phase)
+
+    def unpin(self, city):
+        self.pins.pop(city, None)
+
+    def is_pinned(self, city):
+        return city in self.pins
+
+    def refresh_now(self, city):
+        """Move a pinned city to the next tick"""
+        if city in self.pins:
+            self._schedule(city, self.pins[city][0], self.clock())
+
+    def _schedule(self, city, interval, due):
+        self.pins[city] = (interval, due)
+        heapq.heappush(self._heap, (due, next(self._seq), city))
+
+    # Timer
+
+    def start(self):
+        """Start ticking and pause automatically while the window is minimized"""
+        self.running = True
+        self.root.bind("<Unmap>", self._on_unmap, add="+")
+        self.root.bind("<Map>", self._on_map, add="+")
+        self._arm()
+
+    def stop(self):
+        self.running = False
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _arm(self):
+        if self.running and not self.suspended and self._after_id is None:
+            self._after_id = self.root.after(self.tick_ms, self.tick)
+
+    def _on_unmap(self, event):
+        # Child widgets report Unmap through the toplevel's bindings too
+        if event.widget is self.root:
+            self.suspend()
+
+    def _on_map(self, event):
+        if event.widget is self.root:
+            self.resume()
+
+    def suspend(self):
+        """Stop ticking until resume()"""
+        self.suspended = True
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def resume(self):
+        """Tick again; everything that fell due meanwhile goes out in the next batch"""
+        if self.suspended:
+            self.suspended = False
+            self._arm()
+
+    def due(self, now=None):
+        """Pop up to max_batch cities whose refresh is due and reschedule them"""
+        now = self.clock() if now is None else now
+        cities = []
+        while self._heap and self._heap[0][0] <= now and len(cities) < self.max_batch:
+            due, _, city = heapq.heappop(self._heap)
+            pin = self.pins.get(city)
+            if pin is None or pin[1] != due:
+                # Unpinned or rescheduled since this entry was pushed
+                continue
+            interval = pin[0]
+            spread = 1 + self.jitter * (2 * self.rng.random() - 1)
+            self._schedule(city, interval, now + interval * spread)
+            cities.append(city)
+        return cities
+
+    def tick(self):
+        """Send every due city as one batch, unless one is still running"""
+        self._after_id = None
+        try:
+            if self.in_flight or self.root.state() == "iconic":
+                return
+            cities = self.due()
+            if cities:
+                self.in_flight = True
+                self.batches += 1
+                self.refreshed += len(cities)
+                self.run_batch(cities, self._done)
+        finally:
+            self._arm()
+
+    def _done(self):
+        self.in_flight = False
+
+    def stats(self):
+        """Counters as a dict"""
+        return {
+            'pinned': len(self.pins),
+            'batches': self.batches,
+            'refreshed': self.refreshed,
+            'suspended': self.suspended,
+            'in_flight': self.in_flight,
+        }
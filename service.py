@@ -0,0 +1,565 @@
+"""Local HTTP/JSON weather service backed by sharded worker processes
+
+    python service.py --port 8080 --workers 8
+
+Endpoints:
+
+    GET  /current?city=Istanbul[&time=...]        one observation
+    GET  /forecast?city=Istanbul[&days=2&start=...] hourly columns
+    POST /batch   {"cities": [...], "time": ...}  observations, in order
+    GET  /health, GET /stats
+
+Every worker process listens on the same port with SO_REUSEPORT, so the
+kernel spreads connections over them and each parses, answers and
+encodes its own requests; no single front-end process caps throughput.
+Cities are sharded by a stable hash of their folded name: a worker
+answers its own cities inline and forwards the others to the owning
+worker's bounded job queue, so every city stays warm in one observation
+cache. When that queue is full the request is refused with 503 and
+Retry-After rather than queued without limit. SIGTERM or Ctrl-C stops
+every worker accepting, lets in-flight requests finish and then stops
+them. SO_REUSEPORT needs Linux or a BSD.
+
+Workers simulate with the same climatology as the app: the built-in grid
+unless --climatology names a .npy grid. A binary gazetteer and a .npy
+grid are memory-mapped, so every worker shares one copy through the page
+cache; the built-in tables are small and each worker builds its own.
+
+Observations use the same dict as the app with datetimes as unix seconds
+(see export.serializable); a time in the query is UTC unix seconds or ISO
+8601.
+"""
+import argparse
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import itertools
+import json
+import multiprocessing
+import os
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlsplit
+
+import cache
+import climatology
+import export
+import gazetteer
+import providers
+import simulator
+import streams
+
+# Largest accepted /batch and the longest forecast
+MAX_BATCH = 10000
+MAX_DAYS = 16
+
+
+class Overloaded(RuntimeError):
+    """A worker queue is full; the client should retry later"""
+
+
+class Shard:
+    """Per-process simulation state: provider, cache and JSON encoding"""
+
+    def __init__(self, config):
+        path = config.get('gazetteer')
+        city_database = gazetteer.load(path) if path else gazetteer.builtin()
+        grid = config.get('climatology') or "default"
+        climate = climatology.default() if grid == "default" else climatology.load(grid)
+        self.stream = streams.KeyedStream(config.get('seed', 0))
+        self.simulation = providers.SimulatorProvider(city_database, self.stream, climate)
+        # Encoded bytes are immutable, so cached bodies are shared, not copied
+        self.cache = cache.ObservationCache(maxsize=config.get('cache_size', 4096), bucket_seconds=60,
+                                            copy=None)
+        self.encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+    def current(self, cities, timestamp=None):
+        """JSON-encoded observations (bytes), one per city"""
+        if timestamp is not None:
+            # Explicit times bypass the cache: its buckets track the present
+            return [self.encode(export.serializable(obs)).encode("utf-8")
+                    for obs in self.simulation.observe_many(cities, timestamp)]
+        names = {}
+        keys = []
+        for city in cities:
+            key = gazetteer.fold(city)
+            names.setdefault(key, city)
+            keys.append(key)
+
+        def compute(missing, start):
+            observations = self.simulation.observe_many([names[k] for k in missing], start)
+            return [self.encode(export.serializable(obs)).encode("utf-8") for obs in observations]
+
+        return self.cache.get_many(keys, compute)
+
+    def forecast(self, city, start, days):
+        """JSON-encoded hourly forecast columns for one city"""
+        info, key = self.simulation.resolve(city)
+        fc = self.stream.forecast(key, info.lat, info.lon, info.timezone, start, days,
+                                  climate=self.simulation.climate)
+        body = {
+            'name': info.name,
+            'country': info.country,
+            'lat': round(info.lat, 4),
+            'lon': round(info.lon, 4),
+            'timezone': info.timezone,
+            'hourly': {
+                'time': fc['time'].tolist(),
+                'temp': fc['temp'][0].tolist(),
+                'feels_like': fc['feels_like'][0].tolist(),
+                'humidity': fc['humidity'][0].tolist(),
+                'pressure': fc['pressure'][0].tolist(),
+                'wind_speed': fc['wind_speed'][0].tolist(),
+                'condition': [simulator.CONDITIONS[c] for c in fc['condition'][0]],
+                'description': [simulator.DESCRIPTIONS[d] for d in fc['description'][0]],
+            },
+        }
+        return self.encode(body).encode("utf-8")
+
+    def stats(self):
+        return {'pid': os.getpid(), 'cache': self.cache.stats()}
+
+
+def worker_main(index, address, jobs, results, config, request_timeout, ready, serving):
+    """Worker process: serve HTTP on the shared port and answer peers' jobs until SIGTERM"""
+    # Ctrl-C reaches the whole process group; the parent decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    peers = Peers(index, Shard(config), jobs, results).start()
+    server = WeatherServer(address, peers, request_timeout)
+    # shutdown() blocks until serve_forever returns, so not from this thread
+    signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(
+        target=server.shutdown, daemon=True).start())
+    ready.release()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        # Other workers' in-flight requests may still be waiting on this shard
+        with serving.get_lock():
+            serving.value -= 1
+        deadline = time.monotonic() + request_timeout
+        while serving.value > 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        peers.close()
+
+
+class Peers:
+    """One worker's view of the pool: its own shard inline, the others over their job queues"""
+
+    def __init__(self, index, shard, jobs, results):
+        self.index = index
+        self.workers = len(jobs)
+        self.jobs = jobs
+        self.results = results
+        self.handlers = {'current': shard.current, 'forecast': shard.forecast, 'stats': self.stats}
+        self.shard = shard
+        self._futures = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._threads = []
+        self.rejected = 0
+
+    def start(self):
+        for target, name in ((self._serve, "skycast-jobs"), (self._dispatch, "skycast-dispatch")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def shard_of(self, city):
+        """Worker index for a city: stable across processes and restarts"""
+        return streams.city_key(gazetteer.fold(city)) % self.workers
+
+    def submit(self, shard, kind, *args):
+        """Run a job on the worker owning shard; returns a Future or raises Overloaded"""
+        future = Future()
+        if shard == self.index:
+            try:
+                future.set_result(self.handlers[kind](*args))
+            except Exception as exc:
+                future.set_exception(RuntimeError(f"{type(exc).__name__}: {exc}"))
+            return future
+        job_id = future.job_id = next(self._ids)
+        with self._lock:
+            self._futures[job_id] = future
+        try:
+            self.jobs[shard].put_nowait((job_id, self.index, kind, args))
+        except queue.Full:
+            with self._lock:
+                self._futures.pop(job_id, None)
+            self.rejected += 1
+            raise Overloaded(f"shard {shard} queue is full") from None
+        return future
+
+    def discard(self, future):
+        """Forget a job the caller stopped waiting for; a late result is dropped"""
+        with self._lock:
+            self._futures.pop(getattr(future, 'job_id', None), None)
+        future.cancel()
+
+    def _serve(self):
+        # Jobs other workers forwarded to this shard
+        jobs = self.jobs[self.index]
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+            job_id, origin, kind, args = job
+            try:
+                self.results[origin].put((job_id, True, self.handlers[kind](*args)))
+            except Exception as exc:
+                self.results[origin].put((job_id, False, f"{type(exc).__name__}: {exc}"))
+
+    def _dispatch(self):
+        # Answers to the jobs this worker forwarded
+        results = self.results[self.index]
+        while True:
+            item = results.get()
+            if item is None:
+                break
+            job_id, ok, payload = item
+            with self._lock:
+                future = self._futures.pop(job_id, None)
+            if future is None:
+                continue
+            if ok:
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(payload))
+
+    def pending(self):
+        """Forwarded jobs not yet answered"""
+        with self._lock:
+            return len(self._futures)
+
+    def stats(self):
+        return dict(self.shard.stats(), pending=self.pending(), rejected=self.rejected)
+
+    def close(self, timeout=5.0):
+        """Stop answering jobs and fail whatever is still outstanding"""
+        for q in (self.jobs[self.index], self.results[self.index]):
+            try:
+                q.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+        for thread in self._threads:
+            thread.join(timeout)
+        with self._lock:
+            for future in self._futures.values():
+                future.set_exception(RuntimeError("service shutting down"))
+            self._futures.clear()
+
+
+class ShardPool:
+    """Worker processes listening on one port, one bounded job queue each"""
+
+    def __init__(self, workers=None, queue_size=256, config=None, request_timeout=10.0):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.config = dict(config or {})
+        self.request_timeout = request_timeout
+        self.context = multiprocessing.get_context()
+        self.processes = []
+        self.address = None
+        self._reserved = None
+        self._serving = None
+
+    def start(self, host="127.0.0.1", port=0):
+        """Bind the port, start the workers and wait until every one is listening"""
+        # Holding a bound (not listening) socket fixes the port for workers
+        # started later without taking any connections itself
+        self._reserved = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._reserved.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._reserved.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        self._reserved.bind((host, port))
+        self.address = self._reserved.getsockname()[:2]
+        try:
+            self.processes, self._serving = self._launch()
+        except BaseException:
+            self._reserved.close()
+            raise
+        return self
+
+    def _launch(self):
+        """Start a full set of workers with fresh queues; returns (processes, serving count)"""
+        ctx = self.context
+        jobs = [ctx.Queue(self.queue_size) for _ in range(self.workers)]
+        results = [ctx.Queue() for _ in range(self.workers)]
+        ready, serving = ctx.Semaphore(0), ctx.Value("i", self.workers)
+        processes = []
+        for i in range(self.workers):
+            proc = ctx.Process(target=worker_main, name=f"skycast-shard-{i}",
+                               args=(i, self.address, jobs, results, self.config,
+                                     self.request_timeout, ready, serving),
+                               daemon=True)
+            proc.start()
+            processes.append(proc)
+        started = 0
+        while started < self.workers:
+            if ready.acquire(timeout=0.1):
+                started += 1
+                continue
+            for i, proc in enumerate(processes):
+                if not proc.is_alive():
+                    self._stop(processes, serving, 0.0)
+                    raise RuntimeError(f"worker {i} exited with code {proc.exitcode} while starting")
+        return processes, serving
+
+    def watch(self):
+        """Replace the workers if one has died"""
+        if all(proc.is_alive() for proc in self.processes):
+            return
+        # A worker killed inside Queue.get() leaves its queue locked, so the
+        # whole set is replaced. The new workers start listening before the
+        # old ones stop; jobs that were on the dead worker time out.
+        old = self.processes, self._serving
+        self.processes, self._serving = self._launch()
+        self._stop(*old, self.request_timeout + 5.0)
+
+    def close(self, timeout=None):
+        """Stop accepting, let in-flight requests finish, then stop the workers"""
+        if self._serving is not None:
+            self._stop(self.processes, self._serving,
+                       self.request_timeout + 5.0 if timeout is None else timeout)
+            self._serving = None
+        if self._reserved is not None:
+            self._reserved.close()
+
+    @staticmethod
+    def _stop(processes, serving, timeout):
+        for proc in processes:
+            if proc.is_alive():
+                proc.terminate()
+            else:
+                # Dead workers will not count themselves out
+                with serving.get_lock():
+                    serving.value -= 1
+        deadline = time.monotonic() + timeout
+        for proc in processes:
+            proc.join(max(0.0, deadline - time.monotonic()))
+            if proc.is_alive():
+                proc.kill()
+                proc.join()
+
+
+class HTTPError(Exception):
+    """Error response: status, message and extra headers"""
+
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """JSON endpoints; the server object carries the worker's peers and settings"""
+    protocol_version = "HTTP/1.1"
+    # Idle keep-alive connections are dropped so shutdown is not held up
+    timeout = 5
+    # Send headers and body in one segment, without waiting on delayed ACKs
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _handle(self, method):
+        url = urlsplit(self.path)
+        route = ROUTES.get((method, url.path))
+        try:
+            if route is None:
+                raise HTTPError(404, f"no route for {method} {url.path}")
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            body = route(self, query)
+            status, headers = 200, {}
+        except HTTPError as exc:
+            status, headers = exc.status, exc.headers
+            body = json.dumps({'error': str(exc)}).encode("utf-8")
+        except Overloaded as exc:
+            status, headers = 503, {'Retry-After': "1"}
+            body = json.dumps({'error': str(exc)}).encode("utf-8")
+        except FutureTimeout:
+            status, headers = 504, {}
+            body = b'{"error":"timed out waiting for a worker"}'
+        except RuntimeError as exc:
+            status, headers = 500, {}
+            body = json.dumps({'error': str(exc)}).encode("utf-8")
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Per-request logging costs more than the simulation
+        pass
+
+    # Parameters
+
+    def _city(self, query):
+        city = query.get('city', "").strip()
+        if not city:
+            raise HTTPError(400, "missing city")
+        return city
+
+    def _time(self, query, name):
+        if name not in query:
+            return None
+        try:
+            return export.parse_time(query[name])
+        except ValueError:
+            raise HTTPError(400, f"bad {name}: {query[name]!r}") from None
+
+    def _wait(self, future, *others):
+        """Result of one job; on timeout it and any sibling jobs are abandoned"""
+        try:
+            return future.result(self.server.request_timeout)
+        except FutureTimeout:
+            for job in (future,) + others:
+                self.server.peers.discard(job)
+            raise
+
+    # Routes
+
+    def current(self, query):
+        city = self._city(query)
+        peers = self.server.peers
+        future = peers.submit(peers.shard_of(city), 'current', [city], self._time(query, 'time'))
+        return self._wait(future)[0]
+
+    def forecast(self, query):
+        city = self._city(query)
+        try:
+            days = int(query.get('days', 2))
+        except ValueError:
+            raise HTTPError(400, f"bad days: {query['days']!r}") from None
+        if not 1 <= days <= MAX_DAYS:
+            raise HTTPError(400, f"days must be between 1 and {MAX_DAYS}")
+        start = self._time(query, 'start')
+        if start is None:
+            now = int(time.time())
+            start = now - now % 3600
+        peers = self.server.peers
+        return self._wait(peers.submit(peers.shard_of(city), 'forecast', city, start, days))
+
+    def batch(self, query):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            if length < 0:
+                raise ValueError(length)
+            request = json.loads(self.rfile.read(length) or b"{}")
+            cities = request['cities']
+            timestamp = request.get('time')
+            if timestamp is not None and not isinstance(timestamp, (int, float)):
+                timestamp = export.parse_time(str(timestamp))
+        except (ValueError, KeyError, TypeError):
+            raise HTTPError(400, 'expected {"cities": [...], "time": optional}') from None
+        if not isinstance(cities, list) or not all(isinstance(c, str) for c in cities):
+            raise HTTPError(400, "cities must be a list of names")
+        if len(cities) > MAX_BATCH:
+            raise HTTPError(413, f"at most {MAX_BATCH} cities per batch")
+
+        # One job per shard, reassembled in request order
+        peers = self.server.peers
+        groups = {}
+        for i, city in enumerate(cities):
+            groups.setdefault(peers.shard_of(city), []).append(i)
+        futures = {shard: peers.submit(shard, 'current', [cities[i] for i in rows], timestamp)
+                   for shard, rows in groups.items()}
+        parts = [None] * len(cities)
+        for shard, future in futures.items():
+            for i, encoded in zip(groups[shard], self._wait(future, *futures.values())):
+                parts[i] = encoded
+        return b"[" + b",".join(parts) + b"]"
+
+    def health(self, query):
+        return b'{"status":"ok"}'
+
+    def stats(self, query):
+        peers = self.server.peers
+        workers = [self._wait(peers.submit(i, 'stats')) for i in range(peers.workers)]
+        return json.dumps({'answered_by': peers.index, 'workers': workers}).encode("utf-8")
+
+
+ROUTES = {
+    ('GET', '/current'): ServiceHandler.current,
+    ('GET', '/forecast'): ServiceHandler.forecast,
+    ('POST', '/batch'): ServiceHandler.batch,
+    ('GET', '/health'): ServiceHandler.health,
+    ('GET', '/stats'): ServiceHandler.stats,
+}
+
+
+class WeatherServer(ThreadingHTTPServer):
+    """Threaded HTTP front end of one worker; server_close() waits for in-flight requests"""
+    daemon_threads = False
+    request_queue_size = 128
+    # Every worker listens on the same port and the kernel spreads connections
+    allow_reuse_port = True
+
+    def __init__(self, address, peers, request_timeout=10.0):
+        self.peers = peers
+        self.request_timeout = request_timeout
+        super().__init__(address, ServiceHandler)
+
+
+def make_server(host="127.0.0.1", port=0, config=None, request_timeout=10.0):
+    """One in-process worker owning every shard: the service without the process pool
+
+    Run it with serve_forever(); stop it with shutdown(), server_close()
+    and peers.close().
+    """
+    peers = Peers(0, Shard(config or {}), [queue.Queue()], [queue.Queue()]).start()
+    return WeatherServer((host, port), peers, request_timeout)
+
+
+def serve(host="127.0.0.1", port=8080, workers=None, queue_size=256, request_timeout=10.0,
+          config=None):
+    """Run the service until SIGTERM or Ctrl-C, then shut down gracefully"""
+    pool = ShardPool(workers, queue_size, config, request_timeout).start(host, port)
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    print(f"serving on http://{host}:{pool.address[1]} with {pool.workers} workers",
+          file=sys.stderr)
+    try:
+        while not stopping.wait(1.0):
+            pool.watch()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
+    return 0
+
+
+def main(argv=None):
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description="SkyCast simulation service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--queue-size", type=int, default=256,
+                        help="jobs queued per worker before answering 503")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for another worker's shard")
+    parser.add_argument("--gazetteer", help="binary gazetteer or GeoNames dump")
+    parser.add_argument("--climatology", metavar="GRID",
+                        help="climatology .npy grid (default: the built-in one, as in the app)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache-size", type=int, default=4096, help="cached observations per worker")
+    args = parser.parse_args(argv)
+    config = {'gazetteer': args.gazetteer, 'climatology': args.climatology, 'seed': args.seed,
+              'cache_size': args.cache_size}
+    return serve(args.host, args.port, args.workers, args.queue_size, args.timeout, config)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
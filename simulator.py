@@ -0,0 +1,257 @@
+"""Headless, vectorized weather simulation engine for SkyCast
+
+Applies the same season, latitude-band, time-of-day and condition-weight
+rules as the desktop app, but over whole NumPy columns at once so that
+millions of observations can be generated without Tk.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+
+import solar
+
+# Condition and season tables; array columns hold indices into these
+CONDITIONS = ("Clear", "Clouds", "Rain", "Snow", "Thunderstorm", "Drizzle", "Mist")
+SEASONS = ("winter", "spring", "summer", "autumn")
+
+# Weather descriptions
+WEATHER_DESCRIPTIONS = {
+    "Clear": ["Sunny", "Clear", "Bright"],
+    "Clouds": ["Partly Cloudy", "Cloudy", "Overcast"],
+    "Rain": ["Light Rain", "Rainy", "Heavy Rain"],
+    "Snow": ["Light Snow", "Snowy", "Blizzard"],
+    "Thunderstorm": ["Thunderstorm", "Stormy"],
+    "Drizzle": ["Drizzle", "Light Rain"],
+    "Mist": ["Misty", "Foggy", "Hazy"]
+}
+
+# Seasonal temperature ranges
+SEASONAL_TEMPS = {
+    "winter": (-5, 10),
+    "spring": (10, 20),
+    "summer": (20, 35),
+    "autumn": (5, 18)
+}
+
+# Condition weights per season
+SEASONAL_CONDITIONS = {
+    "winter": {"Clear": 0.2, "Clouds": 0.4, "Snow": 0.3, "Mist": 0.1},
+    "spring": {"Clear": 0.3, "Clouds": 0.4, "Rain": 0.2, "Drizzle": 0.1},
+    "summer": {"Clear": 0.6, "Clouds": 0.3, "Thunderstorm": 0.1},
+    "autumn": {"Clear": 0.3, "Clouds": 0.4, "Rain": 0.2, "Mist": 0.1}
+}
+
+# Flat description table; DESCRIPTIONS[description code] -> text
+DESCRIPTIONS = tuple(d for c in CONDITIONS for d in WEATHER_DESCRIPTIONS[c])
+
+# Number of uniform draws consumed per observation
+N_DRAWS = 9
+
+_CLEAR, _CLOUDS, _RAIN, _SNOW, _THUNDER, _DRIZZLE, _MIST = range(len(CONDITIONS))
+
+_TEMP_RANGES = np.array([SEASONAL_TEMPS[s] for s in SEASONS], dtype=np.float64)
+
+# Cumulative condition weights, one row per season
+_CONDITION_CDF = np.cumsum(
+    [[SEASONAL_CONDITIONS[s].get(c, 0.0) for c in CONDITIONS] for s in SEASONS],
+    axis=1)
+_CONDITION_CDF /= _CONDITION_CDF[:, -1:]
+
+# Per-season CDFs laid end to end (season s spans [s, s + 1)) so that one
+# searchsorted call samples conditions for every season at once
+_FLAT_CDF = (_CONDITION_CDF + np.arange(len(SEASONS))[:, None]).ravel()
+
+# Time-of-day offsets for 00-06, 06-12, 12-18 and 18-24
+_TIME_OF_DAY = np.array([(-8, -3), (-3, 0), (0, 5), (-4, -1)], dtype=np.float64)
+
+# Per-condition temperature adjustment and wind ranges
+_CONDITION_TEMP = np.array([(0, 5), (-3, -1), (-8, -3), (-8, -3), (-8, -3), (0, 5), (0, 5)],
+                           dtype=np.float64)
+_CONDITION_WIND = np.array([(0, 15), (0, 15), (10, 25), (10, 25), (15, 35), (0, 15), (0, 15)],
+                           dtype=np.float64)
+_WET = np.zeros(len(CONDITIONS), dtype=bool)
+_WET[[_RAIN, _SNOW, _THUNDER]] = True
+
+_DESC_COUNT = np.array([len(WEATHER_DESCRIPTIONS[c]) for c in CONDITIONS])
+_DESC_OFFSET = np.concatenate(([0], np.cumsum(_DESC_COUNT)[:-1]))
+
+
+def _lo_span(table):
+    """Split an (n, 2) range table into 1-D low and span lookup columns"""
+    return table[:, 0].copy(), (table[:, 1] - table[:, 0]).copy()
+
+
+_TEMP_LO, _TEMP_SPAN = _lo_span(_TEMP_RANGES)
+_TOD_LO, _TOD_SPAN = _lo_span(_TIME_OF_DAY)
+_ADJ_LO, _ADJ_SPAN = _lo_span(_CONDITION_TEMP)
+_WIND_LO, _WIND_SPAN = _lo_span(_CONDITION_WIND)
+_HUMIDITY_LO = np.where(_WET, 60, 40)
+
+# Climatology-driven conditions: dry weather, then wet weather by mean
+# temperature below -1, -1 to 2, 2 to 22 and above 22 °C
+_DRY_CONDITIONS = {"Clear": 0.45, "Clouds": 0.45, "Mist": 0.1}
+_WET_CONDITIONS = (
+    {"Snow": 1.0},
+    {"Snow": 0.5, "Rain": 0.5},
+    {"Rain": 0.7, "Drizzle": 0.3},
+    {"Thunderstorm": 0.4, "Rain": 0.4, "Drizzle": 0.2},
+)
+_WET_THRESHOLDS = np.array([-1.0, 2.0, 22.0])
+_CLIMATE_CDF = np.cumsum([[w.get(c, 0.0) for c in CONDITIONS]
+                          for w in (_DRY_CONDITIONS,) + _WET_CONDITIONS], axis=1)
+_CLIMATE_CDF /= _CLIMATE_CDF[:, -1:]
+_CLIMATE_FLAT_CDF = (_CLIMATE_CDF + np.arange(len(_CLIMATE_CDF))[:, None]).ravel()
+
+# Mean time-of-day offset; removed when the climatology supplies daily means
+_TOD_MEAN = float((_TOD_LO + _TOD_SPAN / 2).mean())
+
+# Scale turning a standard deviation into the width of a uniform draw
+_UNIFORM_WIDTH = np.sqrt(12.0)
+
+
+def _uniform(u, lo, hi):
+    """Scale uniform draws onto [lo, hi)"""
+    return lo + (hi - lo) * u
+
+
+def _randint(u, lo, hi):
+    """Map uniform draws onto integers in [lo, hi], like random.randint"""
+    return (lo + np.floor(u * (hi - lo + 1))).astype(np.int64)
+
+
+def draw_uniforms(rng, n):
+    """Draw the (N_DRAWS, n) uniform block consumed by simulate_batch"""
+    if rng is None:
+        rng = np.random.default_rng()
+    return rng.random((N_DRAWS, n))
+
+
+def season_codes(month, lat):
+    """Season index for each month (1-12), flipped for the southern hemisphere"""
+    season = (np.asarray(month) % 12) // 3
+    return np.where(np.asarray(lat) < 0, (season + 2) % 4, season)
+
+
+def climate_conditions(u, mean_temp, precip):
+    """Condition codes from uniform draws, climatological mean temperature and rain chance
+
+    A draw below precip gives wet weather (snow, rain, drizzle or storms by
+    temperature); the rest of the draw is reused to pick the dry condition.
+    """
+    # Left to broadcast in the arithmetic, so the threshold search runs once
+    # per place even when u has a column per ensemble member
+    u, mean_temp, precip = np.asarray(u), np.asarray(mean_temp), np.asarray(precip)
+    wet = u < precip
+    v = np.where(wet, u / np.maximum(precip, 1e-9), (u - precip) / np.maximum(1 - precip, 1e-9))
+    row = np.where(wet, 1 + np.searchsorted(_WET_THRESHOLDS, mean_temp, side="right"), 0)
+    condition = np.searchsorted(_CLIMATE_FLAT_CDF, row + np.minimum(v, 1 - 1e-12), side="right")
+    return np.minimum(condition - row * len(CONDITIONS), len(CONDITIONS) - 1)
+
+
+def local_time_fields(timestamps, tz_hours):
+    """Split UTC unix timestamps into local (month, hour, day start) columns"""
+    local = np.floor(np.asarray(timestamps, dtype=np.float64)
+                     + np.asarray(tz_hours, dtype=np.float64) * 3600).astype(np.int64)
+    day_start = local - local % 86400
+    hour = (local % 86400) // 3600
+    month = local.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64) % 12 + 1
+    return month, hour, day_start
+
+
+def simulate_batch(lat, lon, tz_hours, timestamps, rng=None, uniforms=None, sun=None,
+                   climate=None):
+    """Simulate one observation per row and return a dict of NumPy columns
+
+    lat, lon and tz_hours (UTC offset in hours) describe each location and
+    timestamps are UTC unix seconds; all four broadcast against each other.
+    Randomness comes from ``uniforms`` (an (N_DRAWS, n) block) when given,
+    otherwise from ``rng`` (a numpy Generator, fresh entropy if None).
+    Sunrise and sunset are astronomical, looked up in ``sun`` (a
+    solar.SunTable) when given and computed directly otherwise.
+
+    With ``climate`` (a climatology.Climatology) temperature, spread and
+    the chance of wet conditions come from the interpolated grid instead of
+    the global seasonal ranges and latitude bands.
+    """
+    lat, lon, tz_hours, timestamps = np.broadcast_arrays(
+        np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64),
+        np.asarray(tz_hours, dtype=np.float64), np.asarray(timestamps, dtype=np.float64))
+    lat, lon, tz_hours, timestamps = (a.ravel() for a in (lat, lon, tz_hours, timestamps))
+    n = lat.shape[0]
+    u = draw_uniforms(rng, n) if uniforms is None else uniforms
+
+    month, hour, day_start = local_time_fields(timestamps, tz_hours)
+    season = season_codes(month, lat)
+
+    tod = hour // 6
+    if climate is None:
+        # Latitude band
+        abs_lat = np.abs(lat)
+        temp_mod = np.where(abs_lat > 50, -5.0, np.where(abs_lat > 35, 0.0, 10.0))
+
+        # Base temperature and time of day effect
+        base_temp = _TEMP_LO[season] + _TEMP_SPAN[season] * u[0] + temp_mod
+        base_temp += _TOD_LO[tod] + _TOD_SPAN[tod] * u[1]
+
+        # Condition from the seasonal weights
+        condition = np.searchsorted(_FLAT_CDF, season + u[2], side="right") - season * len(CONDITIONS)
+        condition = np.minimum(condition, len(CONDITIONS) - 1)
+    else:
+        # Climatological mean and spread, with the time of day around the daily mean
+        normals = climate.lookup(lat, lon, timestamps)
+        base_temp = normals['mean'] + normals['spread'] * _UNIFORM_WIDTH * (u[0] - 0.5)
+        base_temp += _TOD_LO[tod] + _TOD_SPAN[tod] * u[1] - _TOD_MEAN
+        condition = climate_conditions(u[2], normals['mean'], normals['precip'])
+
+    temp = base_temp + _ADJ_LO[condition] + _ADJ_SPAN[condition] * u[3]
+
+    description = _DESC_OFFSET[condition] + (u[4] * _DESC_COUNT[condition]).astype(np.int64)
+
+    feels_like = temp - np.where(temp > 0, _uniform(u[5], 1, 3), _uniform(u[5], 0.5, 1.5))
+    humidity = _HUMIDITY_LO[condition] + (u[6] * 36).astype(np.int64)
+    pressure = _randint(u[7], 1000, 1020)
+    wind_speed = _WIND_LO[condition] + _WIND_SPAN[condition] * u[8]
+
+    # Sunrise and sunset as UTC unix seconds on the local calendar day
+    local_day = day_start // 86400
+    sunrise, sunset = (sun.lookup if sun is not None else solar.sun_times)(lat, lon, local_day)
+
+    return {
+        'temp': np.round(temp, 1),
+        'feels_like': np.round(feels_like, 1),
+        'humidity': humidity.astype(np.int16),
+        'pressure': pressure.astype(np.int16),
+        'wind_speed': np.round(wind_speed, 1),
+        'condition': condition.astype(np.int8),
+        'description': description.astype(np.int8),
+        'season': season.astype(np.int8),
+        'sunrise': sunrise,
+        'sunset': sunset,
+    }
+
+
+def observation(batch, i, name, country, tz_hours):
+    """Build the app's OpenWeatherMap-shaped dict from row i of a batch"""
+    tz = dt_timezone(timedelta(hours=float(tz_hours)))
+    condition = CONDITIONS[batch['condition'][i]]
+    return {
+        'name': name,
+        'sys': {'country': country},
+        'main': {
+            'temp': float(batch['temp'][i]),
+            'feels_like': float(batch['feels_like'][i]),
+            'humidity': int(batch['humidity'][i]),
+            'pressure': int(batch['pressure'][i])
+        },
+        'wind': {'speed': float(batch['wind_speed'][i])},
+        'weather': [{
+            'description': DESCRIPTIONS[batch['description'][i]],
+            'main': condition
+        }],
+        'sys_data': {
+            'sunrise': datetime.fromtimestamp(int(batch['sunrise'][i]), tz),
+            'sunset': datetime.fromtimestamp(int(batch['sunset'][i]), tz)
+        },
+        'timezone': tz_hours,
+        'season': SEASONS[batch['season'][i]]
+    }
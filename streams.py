@@ -0,0 +1,175 @@
+"""Deterministic, seedable random streams for the SkyCast simulator
+
+Observations are keyed by (seed, city, timestamp): every draw is a pure
+function of that key and the draw index, computed with a counter-based
+SplitMix64 mixer over NumPy uint64 columns. The same query therefore gives
+the same observation no matter how a batch is split across processes,
+so parallel paths (the service's shards, ensemble chunks) share one
+seed instead of handing each worker a generator of its own.
+"""
+import hashlib
+
+import numpy as np
+
+import forecast
+import simulator
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+_S30, _S27, _S31, _S11 = np.uint64(30), np.uint64(27), np.uint64(31), np.uint64(11)
+
+
+def _splitmix(z):
+    """SplitMix64 finalizer over a uint64 array (wraps modulo 2**64)"""
+    z = (z ^ (z >> _S30)) * _MIX1
+    z = (z ^ (z >> _S27)) * _MIX2
+    return z ^ (z >> _S31)
+
+
+def city_key(name):
+    """Stable 64-bit key for a city name (unlike hash(), not salted per process)"""
+    digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def city_keys(names):
+    """uint64 key column for a sequence of city names"""
+    return np.fromiter((city_key(n) for n in names), dtype=np.uint64, count=len(names))
+
+
+def location_keys(lat, lon):
+    """uint64 key column for places identified by their float32 coordinates"""
+    lat = np.asarray(lat, dtype=np.float32).view(np.uint32).astype(np.uint64)
+    lon = np.asarray(lon, dtype=np.float32).view(np.uint32).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        return _splitmix((lat << np.uint64(32)) | lon)
+
+
+def member_keys(keys, members):
+    """(cities, members) uint64 keys for ensemble members; member 0 keeps the city's own key"""
+    keys = np.asarray(keys, dtype=np.uint64).reshape(-1, 1)
+    member = np.arange(members, dtype=np.uint64)[None, :]
+    with np.errstate(over="ignore"):
+        return np.where(member == 0, keys, _splitmix(keys ^ _splitmix(member * _GOLDEN)))
+
+
+def row_state(seed, keys, timestamps):
+    """Mix (seed, city key, whole-second timestamp) into one uint64 per row"""
+    keys = np.asarray(keys, dtype=np.uint64)
+    ts = np.floor(np.asarray(timestamps, dtype=np.float64)).astype(np.int64).view(np.uint64)
+    keys, ts = np.broadcast_arrays(keys, ts)
+    with np.errstate(over="ignore"):
+        state = _splitmix(ts.ravel() + _GOLDEN)
+        state = _splitmix(state ^ keys.ravel())
+        return _splitmix(state ^ _splitmix(np.uint64(seed & 0xFFFFFFFFFFFFFFFF) + _GOLDEN))
+
+
+def keyed_uniforms(seed, keys, timestamps, n_draws=simulator.N_DRAWS):
+    """(n_draws, n) block of uniforms in [0, 1), one column per keyed row"""
+    state = row_state(seed, keys, timestamps)
+    counters = (np.arange(1, n_draws + 1, dtype=np.uint64) * _GOLDEN)[:, None]
+    with np.errstate(over="ignore"):
+        bits = _splitmix(state[None, :] + counters)
+    # Top 53 bits give an evenly spaced double in [0, 1)
+    return (bits >> _S11).astype(np.float64) * (1.0 / (1 << 53))
+
+
+# Columns observe() takes from the forecast path
+_PATH_COLUMNS = ("temp", "feels_like", "humidity", "pressure", "wind_speed", "condition", "description")
+
+# City-hours per forecast in observe(), spin-up included (about 60 MB of draws)
+OBSERVE_CELLS = 1 << 20
+
+# Longest piece of consecutive hours observe() forecasts as one column
+OBSERVE_PIECE_HOURS = 168
+
+
+class KeyedStream:
+    """Seeded source of per-observation randomness keyed by city and time"""
+
+    def __init__(self, seed=0):
+        self.seed = seed
+
+    def uniforms(self, keys, timestamps, n_draws=simulator.N_DRAWS):
+        """Uniform block for rows identified by city keys and timestamps"""
+        return keyed_uniforms(self.seed, keys, timestamps, n_draws)
+
+    def simulate(self, keys, lat, lon, tz_hours, timestamps, sun=None, climate=None):
+        """Deterministic simulator.simulate_batch for rows keyed by city_keys()"""
+        cols = np.broadcast_arrays(np.asarray(keys, dtype=np.uint64), np.asarray(lat),
+                                   np.asarray(lon), np.asarray(tz_hours), np.asarray(timestamps))
+        keys, lat, lon, tz_hours, timestamps = (np.ravel(c) for c in cols)
+        u = self.uniforms(keys, timestamps)
+        return simulator.simulate_batch(lat, lon, tz_hours, timestamps, uniforms=u, sun=sun,
+                                        climate=climate)
+
+    def forecast_uniforms(self, keys, times, n_draws=forecast.N_DRAWS):
+        """(n_draws, hours, cities) block keyed by city and forecast hour
+
+        times is an hour axis, or an (hours, cities) grid of per-city hours.
+        """
+        keys = np.asarray(keys, dtype=np.uint64).ravel()
+        times = np.asarray(times)
+        u = keyed_uniforms(self.seed, keys[None, :], times if times.ndim == 2 else times[:, None], n_draws)
+        return u.reshape(n_draws, len(times), len(keys))
+
+    def forecast(self, keys, lat, lon, tz_hours, start, days=7, climate=None, hours=None):
+        """Deterministic forecast.forecast_batch for cities keyed by city_keys()"""
+        hours = days * 24 if hours is None else hours
+        keys = np.broadcast_to(np.asarray(keys, dtype=np.uint64), np.broadcast(lat, lon, tz_hours).shape)
+        u = self.forecast_uniforms(keys, forecast.draw_axis(start, hours))
+        return forecast.forecast_batch(lat, lon, tz_hours, start, hours=hours, uniforms=u, climate=climate)
+
+    def observe(self, keys, lat, lon, tz_hours, timestamps, sun=None, climate=None):
+        """simulate() with each row's weather taken from its city's forecast path at that hour
+
+        Sun times and season come from the snapshot; temperature, humidity,
+        pressure, wind and condition are the forecast's for the hour holding
+        the timestamp, so an observation and a forecast never disagree.
+        The hours asked for are cut into pieces of nearby hours, and every
+        (city, piece) pair a row needs runs as one column of a forecast
+        with per-column starts, so sparse times cost one spin-up each but
+        not one pass each.
+        """
+        cols = np.broadcast_arrays(np.asarray(keys, dtype=np.uint64), np.asarray(lat),
+                                   np.asarray(lon), np.asarray(tz_hours), np.asarray(timestamps))
+        keys, lat, lon, tz_hours, timestamps = (np.ravel(c) for c in cols)
+        batch = self.simulate(keys, lat, lon, tz_hours, timestamps, sun=sun, climate=climate)
+        if len(keys) == 0:
+            return batch
+        hour = np.floor(timestamps.astype(np.float64) / 3600).astype(np.int64)
+        places, first, city = np.unique(keys, return_index=True, return_inverse=True)
+        wanted = np.unique(hour)
+        # A gap longer than the spin-up costs less as a fresh piece than as hours to walk through
+        runs = np.split(wanted, np.flatnonzero(np.diff(wanted) > forecast.SPIN_UP) + 1)
+        pieces = [(lo, min(lo + OBSERVE_PIECE_HOURS, int(run[-1]) + 1))
+                  for run in runs for lo in range(int(run[0]), int(run[-1]) + 1, OBSERVE_PIECE_HOURS)]
+        piece_lo, piece_hi = np.array(pieces, dtype=np.int64).reshape(-1, 2).T
+        piece = np.searchsorted(piece_lo, hour, side="right") - 1
+        pair = piece * len(places) + city
+        pairs, column = np.unique(pair, return_inverse=True)
+        pair_piece, pair_city = pairs // len(places), pairs % len(places)
+        length = (piece_hi - piece_lo)[pair_piece]
+        for hours in np.unique(length).tolist():
+            same = np.flatnonzero(length == hours)
+            width = max(1, OBSERVE_CELLS // (forecast.SPIN_UP + hours))
+            for lo in range(0, len(same), width):
+                cols = same[lo:lo + width]
+                c, p = pair_city[cols], pair_piece[cols]
+                # One shared start keeps the forecast on its cheaper hour-axis path
+                start = piece_lo[p[0]] * 3600 if (p == p[0]).all() else piece_lo[p] * 3600
+                fc = self.forecast(places[c], lat[first][c], lon[first][c], tz_hours[first][c],
+                                   start, climate=climate, hours=hours)
+                # Rows whose (city, piece) pair is one of these columns
+                slot = np.full(len(pairs), -1, dtype=np.int64)
+                slot[cols] = np.arange(len(cols))
+                rows = np.flatnonzero(slot[column] >= 0)
+                at = slot[column[rows]], hour[rows] - piece_lo[piece[rows]]
+                for name in _PATH_COLUMNS:
+                    values = fc[name][at]
+                    if values.dtype.kind == "f":
+                        # Rounded again in float64, like the snapshot's own columns
+                        values = np.round(values.astype(np.float64), 1)
+                    batch[name][rows] = values
+        return batch
@@ -0,0 +1,112 @@
+import threading
+
+import cache
+
+
+class Clock:
+    def __init__(self, now=1_000_000):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_is_capped_at_one_bucket():
+    assert cache.ObservationCache(ttl=300, bucket_seconds=60).ttl == 60
+    assert cache.ObservationCache(bucket_seconds=60).ttl == 60
+    assert cache.ObservationCache(ttl=10, bucket_seconds=60).ttl == 10
+
+
+def test_bucket_reuse_and_expiry():
+    clock = Clock(1_000_020)
+    c = cache.ObservationCache(ttl=30, bucket_seconds=60, clock=clock)
+    calls = []
+
+    def compute(start):
+        calls.append(start)
+        return {'start': start}
+
+    assert c.get("paris", compute) == {'start': 1_000_020 - 1_000_020 % 60}
+    clock.now += 20
+    c.get("paris", compute)
+    assert len(calls) == 1 and c.hits == 1
+    # Same bucket, but past the TTL
+    clock.now += 15
+    c.get("paris", compute)
+    assert len(calls) == 2 and c.expirations == 1
+    # Next bucket is a new key
+    clock.now += 60
+    c.get("paris", compute)
+    assert len(calls) == 3
+
+
+def test_callers_get_copies():
+    c = cache.ObservationCache(clock=Clock())
+    first = c.get("paris", lambda start: {'main': {'temp': 10.0}})
+    first['main']['temp'] = 99.0
+    assert c.get("paris", None) == {'main': {'temp': 10.0}}
+    many = c.get_many(["paris", "paris"], None)
+    many[0]['main']['temp'] = 50.0
+    assert many[1]['main']['temp'] == 10.0
+    assert c.get("paris", None)['main']['temp'] == 10.0
+
+
+def test_copy_none_shares_values():
+    c = cache.ObservationCache(clock=Clock(), copy=None)
+    body = c.get("paris", lambda start: b"{}")
+    assert c.get("paris", None) is body
+
+
+def test_get_many_computes_misses_once():
+    c = cache.ObservationCache(clock=Clock())
+    c.get("paris", lambda start: "P")
+    asked = []
+
+    def compute_many(missing, start):
+        asked.append(list(missing))
+        return [name.upper() for name in missing]
+
+    assert c.get_many(["tokyo", "paris", "tokyo", "lima"], compute_many) == ["TOKYO", "P", "TOKYO", "LIMA"]
+    assert asked == [["tokyo", "lima"]]
+    assert c.stats()['hits'] == 1
+
+
+def test_get_many_does_not_cache_errors():
+    c = cache.ObservationCache(clock=Clock())
+    error = LookupError("atlantis")
+    first = c.get_many(["paris", "atlantis"], lambda missing, start: [{'temp': 1.0}, error])
+    assert first == [{'temp': 1.0}, error] and first[1] is error
+    assert len(c) == 1
+    assert c.get_many(["paris", "atlantis"], lambda missing, start: [name for name in missing]) == \
+        [{'temp': 1.0}, "atlantis"]
+
+
+def test_lru_eviction():
+    c = cache.ObservationCache(maxsize=2, clock=Clock())
+    for name in ("a", "b"):
+        c.get(name, lambda start: name)
+    c.get("a", None)
+    c.get("c", lambda start: "c")
+    assert len(c) == 2 and c.evictions == 1
+    # "b" was least recently used
+    assert c.get("b", lambda start: "again") == "again"
+
+
+def test_concurrent_gets():
+    c = cache.ObservationCache(maxsize=64, clock=Clock())
+    errors = []
+
+    def worker(i):
+        try:
+            for j in range(200):
+                key = (i + j) % 100
+                assert c.get(key, lambda start: {'key': key})['key'] == key
+        except AssertionError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors and len(c) <= 64
@@ -0,0 +1,120 @@
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+import climatology
+
+
+def mid_month(year, month):
+    """Unix seconds halfway through a UTC calendar month (1-12)"""
+    start = datetime(year, month, 1, tzinfo=timezone.utc).timestamp()
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=timezone.utc).timestamp()
+    return (start + end) / 2
+
+
+@pytest.fixture(scope="module")
+def random_grid():
+    rng = np.random.default_rng(4)
+    grid = np.empty((12, 7, 12, 3), dtype=np.float32)
+    grid[..., 0] = rng.uniform(-30, 35, grid.shape[:3])
+    grid[..., 1] = rng.uniform(1, 6, grid.shape[:3])
+    grid[..., 2] = rng.uniform(0, 1, grid.shape[:3])
+    return climatology.Climatology(grid)
+
+
+def test_grid_points_at_mid_month_are_exact(random_grid):
+    grid = random_grid.grid
+    lat = np.repeat(np.linspace(-90, 90, 7), 12)
+    lon = np.tile(-180 + 30.0 * np.arange(12), 7)
+    for month in (1, 6, 12):
+        out = random_grid.lookup(lat, lon, mid_month(2026, month))
+        for k, name in enumerate(climatology.FIELDS):
+            np.testing.assert_allclose(out[name], grid[month - 1, :, :, k].ravel(), rtol=1e-5, atol=1e-4)
+
+
+def test_bilinear_between_grid_points():
+    # A field linear in latitude and longitude away from the wrap is reproduced exactly
+    lat = np.linspace(-90, 90, 13)
+    lon = -180 + 15.0 * np.arange(24)
+    mean = 0.2 * lat[:, None] + 0.05 * lon[None, :]
+    grid = np.zeros((12, 13, 24, 3), dtype=np.float32)
+    grid[..., 0] = mean
+    grid[..., 1] = 3.0
+    clim = climatology.Climatology(grid)
+    rng = np.random.default_rng(1)
+    qlat, qlon = rng.uniform(-90, 90, 500), rng.uniform(-180, 160, 500)
+    out = clim.lookup(qlat, qlon, mid_month(2026, 4))
+    np.testing.assert_allclose(out['mean'], 0.2 * qlat + 0.05 * qlon, atol=1e-4)
+    np.testing.assert_allclose(out['spread'], 3.0, atol=1e-6)
+
+
+def test_longitude_wraps(random_grid):
+    when = mid_month(2026, 8) + 86400 * 3.3
+    a = random_grid.lookup([12.0, 12.0, 40.0], [-180.0, 172.5, 179.999], when)
+    b = random_grid.lookup([12.0, 12.0, 40.0], [180.0, -187.5, -180.001], when)
+    for name in climatology.FIELDS:
+        np.testing.assert_allclose(a[name], b[name], atol=1e-3)
+
+
+def test_smooth_across_months_and_the_new_year(random_grid):
+    lat, lon = np.full(4, 33.0), np.array([-100.0, 0.0, 55.0, 140.0])
+    boundaries = [datetime(2026, m, 1, tzinfo=timezone.utc).timestamp() for m in (2, 7)]
+    boundaries.append(datetime(2027, 1, 1, tzinfo=timezone.utc).timestamp())
+    for t in boundaries:
+        before, after = random_grid.lookup(lat, lon, t - 1), random_grid.lookup(lat, lon, t)
+        for name in climatology.FIELDS:
+            np.testing.assert_allclose(before[name], after[name], atol=1e-3)
+    # The same calendar moment gives the same value in any year
+    a = random_grid.lookup(lat, lon, mid_month(2026, 3))
+    b = random_grid.lookup(lat, lon, mid_month(2031, 3))
+    np.testing.assert_allclose(a['mean'], b['mean'], atol=1e-4)
+
+
+def test_fields_are_clamped():
+    grid = np.zeros((12, 5, 8, 3), dtype=np.float32)
+    # A single-month spike makes the spline undershoot the months around it
+    grid[5, ..., 1] = 5.0
+    grid[..., 2] = 1.0
+    grid[5, ..., 2] = 0.0
+    clim = climatology.Climatology(grid)
+    times = datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp() + 3600 * np.arange(24 * 365)
+    out = clim.lookup(0.0, 0.0, times)
+    assert out['spread'].min() >= 0.0
+    assert 0.0 <= out['precip'].min() and out['precip'].max() <= 1.0
+
+
+def test_lookup_paths_and_series_agree(random_grid, monkeypatch):
+    rng = np.random.default_rng(8)
+    lat, lon = rng.uniform(-90, 90, 50), rng.uniform(-180, 180, 50)
+    times = 1_767_225_600 + 3600 * np.arange(0, 24 * 90, 7)
+    grid_lat, grid_times = np.broadcast_arrays(lat[None, :], times[:, None])
+    blended = random_grid.lookup(grid_lat, lon[None, :], grid_times)
+    series = random_grid.series(lat, lon, times)
+    monkeypatch.setattr(climatology, "_BLEND_CELLS", 0)
+    direct = random_grid.lookup(grid_lat, lon[None, :], grid_times)
+    for name in climatology.FIELDS:
+        assert blended[name].shape == (len(times), 50)
+        np.testing.assert_allclose(blended[name], direct[name], atol=1e-3)
+        np.testing.assert_allclose(series[name], direct[name], atol=1e-3)
+
+
+def test_default_grid_matches_the_seasons():
+    clim = climatology.default()
+    assert clim is climatology.default()
+    north = clim.lookup(45.0, 10.0, [mid_month(2026, 1), mid_month(2026, 7)])['mean']
+    south = clim.lookup(-45.0, 10.0, [mid_month(2026, 1), mid_month(2026, 7)])['mean']
+    tropics = clim.lookup(0.0, 10.0, [mid_month(2026, 1), mid_month(2026, 7)])['mean']
+    assert north[0] < 5 < 15 < north[1]
+    assert south[0] > south[1]
+    assert abs(tropics[0] - tropics[1]) < 3 and tropics.min() > 20
+
+
+def test_save_load_and_shape_check(random_grid, tmp_path):
+    path = str(tmp_path / "grid.npy")
+    climatology.save(random_grid.grid, path)
+    loaded = climatology.load(path)
+    assert isinstance(loaded.grid, np.memmap) and loaded.source == path
+    np.testing.assert_array_equal(loaded.grid, random_grid.grid)
+    with pytest.raises(ValueError):
+        climatology.Climatology(np.zeros((12, 5, 8, 2), dtype=np.float32))
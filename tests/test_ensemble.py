@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import climatology
+import ensemble
+import gazetteer
+import simulator
+import streams
+
+START = 1_768_485_600  # 2026-01-15 14:00 UTC
+
+
+@pytest.fixture(scope="module")
+def cities():
+    gaz = gazetteer.builtin()
+    rows = np.arange(len(gaz))
+    lat = gaz.records["lat"][rows].astype(np.float64)
+    lon = gaz.records["lon"][rows].astype(np.float64)
+    tz = gaz.records["tz_minutes"][rows] / 60
+    return streams.location_keys(lat, lon), lat, lon, tz
+
+
+def run(cities, climate=None, **options):
+    options.setdefault("hours", 72)
+    options.setdefault("members", 40)
+    return ensemble.ensemble_batch(streams.KeyedStream(5), *cities, START, climate=climate, **options)
+
+
+@pytest.mark.parametrize("climate", [None, climatology.default()], ids=["rules", "climatology"])
+def test_bands_are_ordered(cities, climate):
+    bands = run(cities, climate)
+    for field in ("temp", "wind"):
+        p10, p50, p90 = (bands[f"{field}_p{q}"] for q in (10, 50, 90))
+        assert p10.shape == (len(cities[0]), 72)
+        assert np.all(p10 <= p50) and np.all(p50 <= p90)
+    assert np.all(bands['wind_p10'] >= 0)
+    prob = bands['condition_prob']
+    np.testing.assert_allclose(prob.sum(axis=-1), 1.0, atol=1e-5)
+    assert np.all((0 <= bands['precip_prob']) & (bands['precip_prob'] <= 1))
+    wet = [simulator.CONDITIONS.index(c) for c in ensemble.PRECIPITATING]
+    np.testing.assert_allclose(bands['precip_prob'], prob[..., wet].sum(axis=-1), atol=1e-6)
+
+
+def test_spread_starts_at_zero_and_grows(cities):
+    bands = run(cities, hours=120)
+    width = bands['temp_p90'] - bands['temp_p10']
+    assert np.all(width[:, 0] == 0)
+    assert width[:, 96:].mean() > width[:, 1:24].mean() > 0
+
+
+def test_member_zero_is_the_deterministic_forecast(cities):
+    keys, lat, lon, tz = cities
+    single = run(cities, members=1)
+    path = streams.KeyedStream(5).forecast(keys, lat, lon, tz, START, hours=72)
+    for q in (10, 50, 90):
+        np.testing.assert_allclose(single[f"temp_p{q}"], path['temp'], atol=1e-4)
+    np.testing.assert_array_equal(single['time'], path['time'])
+
+
+def test_independent_of_chunking_and_threads(cities):
+    whole = run(cities, workers=1)
+    split = run(cities, workers=3, chunk_bytes=1)
+    for name, value in whole.items():
+        np.testing.assert_array_equal(split[name], value)
+
+
+def test_band_names():
+    assert ensemble.band_names() == ["temp_p10", "temp_p50", "temp_p90", "wind_p10", "wind_p50", "wind_p90"]
@@ -0,0 +1,117 @@
+import csv
+import io
+import json
+
+import numpy as np
+import pytest
+
+import climatology
+import export
+import gazetteer
+import streams
+
+START = 1_767_225_600  # 2026-01-01 00:00 UTC
+
+
+@pytest.fixture(scope="module")
+def gaz():
+    return gazetteer.builtin()
+
+
+def ndjson(gaz, rows, times, **options):
+    out = io.StringIO()
+    count = export.export(gaz, rows, times, streams.KeyedStream(0), "ndjson", out, **options)
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert count == len(records)
+    return records
+
+
+def run_main(tmp_path, *args):
+    path = tmp_path / "out.ndjson"
+    assert export.main(["Istanbul", "Tokyo", "--start", str(START), "--end", str(START + 6 * 3600),
+                        "-o", str(path), *args]) == 0
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_parse_time_and_step():
+    assert export.parse_time(str(START)) == START
+    assert export.parse_time("2026-01-01") == START
+    assert export.parse_time("2026-01-01T03:00:00+03:00") == START
+    assert [export.parse_step(s) for s in ("3600", "90s", "15m", "1h", "1d")] == [3600, 90, 900, 3600, 86400]
+    with pytest.raises(ValueError):
+        export.parse_step("0h")
+
+
+def test_rows_are_time_major_in_schema_order(gaz):
+    rows = export.select_rows(gaz, ["Istanbul", "Paris", "Tokyo"])
+    times = START + 3600 * np.arange(4)
+    records = ndjson(gaz, rows, times)
+    assert len(records) == 12
+    assert all(list(r) == list(export.FIELDS) for r in records)
+    assert [(r['city'], r['time']) for r in records[:4]] == [
+        ("Istanbul", START), ("Paris", START), ("Tokyo", START), ("Istanbul", START + 3600)]
+    assert records[0]['tz_offset'] == 3 * 3600 and records[0]['country'] == "Turkey"
+
+
+def test_chunking_does_not_change_the_output(gaz):
+    rows = export.select_rows(gaz, top=7)
+    times = START + 5400 * np.arange(11)
+    assert ndjson(gaz, rows, times, chunk_rows=5) == ndjson(gaz, rows, times)
+
+
+def test_csv_matches_ndjson(gaz):
+    rows = export.select_rows(gaz, ["New York", "London"])
+    times = START + 86400 * np.arange(3)
+    out = io.StringIO()
+    export.export(gaz, rows, times, streams.KeyedStream(0), "csv", out)
+    parsed = list(csv.DictReader(io.StringIO(out.getvalue())))
+    for row, record in zip(parsed, ndjson(gaz, rows, times), strict=True):
+        assert row == {k: str(v) for k, v in record.items()}
+
+
+def test_select_rows(gaz):
+    assert len(export.select_rows(gaz)) == len(gaz)
+    top = export.select_rows(gaz, top=3)
+    population = gaz.records["population"][top]
+    assert len(top) == 3 and np.all(np.diff(population.astype(np.int64)) <= 0)
+    with pytest.raises(KeyError):
+        export.select_rows(gaz, ["Atlantis"])
+
+
+def test_main_defaults_to_the_builtin_climatology(gaz, tmp_path):
+    rows = export.select_rows(gaz, ["Istanbul", "Tokyo"])
+    times = START + 3600 * np.arange(6)
+    assert run_main(tmp_path) == ndjson(gaz, rows, times, climate=climatology.default())
+    rules = run_main(tmp_path, "--no-climatology")
+    assert rules == ndjson(gaz, rows, times, climate=None)
+    assert rules != run_main(tmp_path)
+
+
+def test_main_reads_a_climatology_grid(gaz, tmp_path):
+    path = str(tmp_path / "grid.npy")
+    grid = climatology.default_grid(nlat=9, nlon=12)
+    climatology.save(grid, path)
+    rows = export.select_rows(gaz, ["Istanbul", "Tokyo"])
+    times = START + 3600 * np.arange(6)
+    assert run_main(tmp_path, "--climatology", path) == \
+        ndjson(gaz, rows, times, climate=climatology.load(path))
+
+
+def test_main_rejects_unknown_cities(tmp_path):
+    with pytest.raises(SystemExit):
+        export.main(["Atlantis", "-o", str(tmp_path / "out.ndjson")])
+
+
+def test_parquet_and_arrow_round_trip(gaz, tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    import pyarrow.parquet as pq
+
+    rows = export.select_rows(gaz, top=5)
+    times = START + 3600 * np.arange(3)
+    expected = ndjson(gaz, rows, times)
+    path = str(tmp_path / "out.parquet")
+    export.export(gaz, rows, times, streams.KeyedStream(0), "parquet", path, chunk_rows=4)
+    assert pq.read_table(path).to_pylist() == expected
+    sink = pa.BufferOutputStream()
+    export.export(gaz, rows, times, streams.KeyedStream(0), "arrow", sink)
+    assert pa.ipc.open_stream(sink.getvalue()).read_all().to_pylist() == expected
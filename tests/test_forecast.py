@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+import climatology
+import export
+import forecast
+import gazetteer
+import providers
+import simulator
+import streams
+
+MIDNIGHT = 1_768_435_200  # 2026-01-15 00:00 UTC
+FIELDS = ("temp", "feels_like", "humidity", "pressure", "wind_speed", "condition", "description")
+
+
+@pytest.fixture(scope="module", params=[None, "default"], ids=["rules", "climatology"])
+def climate(request):
+    return climatology.default() if request.param else None
+
+
+@pytest.fixture(scope="module")
+def cities():
+    rng = np.random.default_rng(4)
+    lat, lon = rng.uniform(-70, 70, 20), rng.uniform(-180, 180, 20)
+    return streams.location_keys(lat, lon), lat, lon, np.round(lon / 15)
+
+
+def test_overlapping_forecasts_agree(cities, climate):
+    stream = streams.KeyedStream(5)
+    # Starts on either side of UTC midnight walk the same path
+    early = stream.forecast(*cities, MIDNIGHT - 30 * 3600, hours=96, climate=climate)
+    late = stream.forecast(*cities, MIDNIGHT + 3600, hours=48, climate=climate)
+    np.testing.assert_array_equal(early['time'][31:79], late['time'])
+    for field in FIELDS:
+        np.testing.assert_array_equal(early[field][:, 31:79], late[field], err_msg=field)
+
+
+def test_per_city_starts_match_shared_start(cities, climate):
+    stream = streams.KeyedStream(5)
+    keys, lat, lon, tz = cities
+    starts = MIDNIGHT + 3600 * np.arange(len(keys))
+    each = stream.forecast(keys, lat, lon, tz, starts, hours=12, climate=climate)
+    whole = stream.forecast(keys, lat, lon, tz, MIDNIGHT, hours=12 + len(keys), climate=climate)
+    for i in range(len(keys)):
+        np.testing.assert_array_equal(each['time'][i], whole['time'][i:i + 12])
+        np.testing.assert_array_equal(each['temp'][i], whole['temp'][i, i:i + 12])
+        np.testing.assert_array_equal(each['condition'][i], whole['condition'][i, i:i + 12])
+
+
+def test_observe_is_the_forecast_at_that_hour(cities, climate):
+    stream = streams.KeyedStream(2)
+    keys, lat, lon, tz = cities
+    fc = stream.forecast(keys, lat, lon, tz, MIDNIGHT, hours=400, climate=climate)
+    rng = np.random.default_rng(0)
+    city, hour = rng.integers(0, len(keys), 3000), rng.integers(0, 400, 3000)
+    # Scattered, sub-hour times, sparse and dense
+    times = MIDNIGHT + hour * 3600 + rng.integers(0, 3600, 3000)
+    obs = stream.observe(keys[city], lat[city], lon[city], tz[city], times, climate=climate)
+    for field in FIELDS:
+        expected = fc[field][city, hour]
+        if expected.dtype.kind == "f":
+            expected = np.round(expected.astype(np.float64), 1)
+        np.testing.assert_array_equal(obs[field], expected, err_msg=field)
+    snapshot = stream.simulate(keys[city], lat[city], lon[city], tz[city], times, climate=climate)
+    np.testing.assert_array_equal(obs['sunrise'], snapshot['sunrise'])
+    np.testing.assert_array_equal(obs['season'], snapshot['season'])
+
+
+def test_every_consumer_shares_the_path():
+    gaz = gazetteer.builtin()
+    climate = climatology.default()
+    stream = streams.KeyedStream(0)
+    sim = providers.SimulatorProvider(gaz, stream, climate)
+    city = gaz.lookup("Istanbul")
+    now = MIDNIGHT + 5400
+    observed = sim.observe(city, now)
+    info, key = sim.resolve(city)
+    fc = stream.forecast(key, info.lat, info.lon, info.timezone, now, hours=1, climate=climate)
+    assert observed['main']['temp'] == round(float(fc['temp'][0, 0]), 1)
+    assert observed['weather'][0]['main'] == simulator.CONDITIONS[fc['condition'][0, 0]]
+    chunk, = export.chunks(gaz, [city.row], [now], stream, climate=climate)
+    assert chunk['temp'][0] == observed['main']['temp']
+    assert chunk['condition'][0] == observed['weather'][0]['main']
+
+
+def test_no_step_at_midnight(cities, climate):
+    stream = streams.KeyedStream(8)
+    days = [stream.forecast(*cities, MIDNIGHT + d * 86400, hours=24, climate=climate) for d in range(3)]
+    joined = np.concatenate([d['temp'] for d in days], axis=1)
+    long = stream.forecast(*cities, MIDNIGHT, hours=72, climate=climate)
+    np.testing.assert_array_equal(joined, long['temp'])
+
+
+def test_generator_draws_and_daily_summary():
+    fc = forecast.forecast_batch([41.0, -33.9], [29.0, 151.2], [3, 10], MIDNIGHT, days=3,
+                                 rng=np.random.default_rng(1))
+    assert fc['temp'].shape == (2, 72) and len(fc['time']) == 72
+    assert ((fc['humidity'] >= 0) & (fc['humidity'] <= 100)).all()
+    assert ((fc['pressure'] >= 1000) & (fc['pressure'] <= 1020)).all()
+    day = forecast.daily(fc)
+    assert day['temp_min'].shape == (2, 3)
+    assert (day['temp_min'] <= day['temp_mean']).all() and (day['temp_mean'] <= day['temp_max']).all()
+    np.testing.assert_array_equal(day['time'], fc['time'][::24])
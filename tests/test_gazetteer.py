@@ -0,0 +1,131 @@
+import math
+
+import numpy as np
+import pytest
+
+import gazetteer
+
+DUPLICATES = [
+    ("Paris", "US", 33.66, -95.55, -6, 25_000),
+    ("Paris", "Canada", 43.19, -80.38, -5, 12_000),
+    ("São Paulo", "Brazil", -23.5505, -46.6333, -3, 12_300_000),
+    ("Longyearbyen", "Norway", 78.2232, 15.6267, 1, 2_400),
+    ("McMurdo", "Antarctica", -77.846, 166.676, 12, 1_000),
+]
+
+
+@pytest.fixture(scope="module")
+def gaz():
+    rows = [row + (100_000,) for row in gazetteer.BUILTIN_CITIES] + DUPLICATES
+    return gazetteer.build(rows)
+
+
+@pytest.fixture(scope="module")
+def scattered():
+    rng = np.random.default_rng(7)
+    lat = np.degrees(np.arcsin(rng.uniform(-1, 1, 3000)))
+    lon = rng.uniform(-180, 180, 3000)
+    return gazetteer.build([(f"c{i}", "XX", float(a), float(o), 0) for i, (a, o) in enumerate(zip(lat, lon))])
+
+
+def test_lookup_folds_case_and_accents(gaz):
+    assert gaz.lookup("sao paulo").name == "São Paulo"
+    assert gaz.lookup("ISTANBUL").country == "Turkey"
+    assert gaz.lookup("Atlantis") is None
+    assert "paris" in gaz and "atlantis" not in gaz
+
+
+def test_lookup_duplicates(gaz):
+    assert gaz.lookup("Paris").country == "France"
+    assert gaz.lookup("Paris", "us").country == "US"
+    assert gaz.lookup("Paris", " Canada").lat == pytest.approx(43.19, abs=1e-4)
+    assert gaz.lookup("Paris", "Peru") is None
+    assert len(gaz.rows_named("paris")) == 3
+
+
+def test_place_key_tells_duplicates_apart(gaz):
+    france, us = gaz.lookup("Paris"), gaz.lookup("Paris", "US")
+    assert gazetteer.place_key(france) != gazetteer.place_key(us)
+    assert gazetteer.place_key(gaz.city(us.row)) == us.row
+    assert gazetteer.place_key("PARIS") == "paris"
+    assert gazetteer.place_name(us) == "Paris"
+
+
+def test_prefix_in_name_order(gaz):
+    names = [c.name for c in gaz.prefix("pa")]
+    assert names == sorted(names, key=gazetteer.fold)
+    assert all(gazetteer.fold(n).startswith("pa") for n in names) and "Paris" in names
+    assert len(gaz.prefix("", limit=3)) == 3
+    assert gaz.prefix("zzz") == []
+
+
+def brute_nearest(g, lat, lon, k):
+    d = gazetteer.haversine_km(lat, lon, g.records["lat"], g.records["lon"])
+    return d[np.argsort(d, kind="stable")[:k]]
+
+
+@pytest.mark.parametrize("lat, lon", [(41.0, 29.0), (0.0, 179.9), (-33.9, 151.2), (89.5, 10.0),
+                                      (-89.9, -120.0), (78.0, 16.0), (60.0, -179.9)])
+def test_nearest_matches_brute_force(scattered, lat, lon):
+    for k in (1, 5):
+        found = scattered.nearest(lat, lon, k)
+        rows = [c.row for c in found]
+        d = gazetteer.haversine_km(lat, lon, scattered.records["lat"][rows], scattered.records["lon"][rows])
+        np.testing.assert_allclose(d, brute_nearest(scattered, lat, lon, k), rtol=1e-6)
+
+
+
+
+def test_suggest_prefix_and_misspelling(gaz):
+    assert gaz.suggest("Ista")[0].name == "Istanbul"
+    assert gaz.suggest("Istambul")[0].name == "Istanbul"
+    assert gaz.suggest("Sao Paolo")[0].name == "São Paulo"
+    assert gaz.suggest("") == []
+    assert gaz.suggest("qqqqqqq") == []
+
+
+def test_suggest_keeps_one_place_per_country(gaz):
+    countries = [c.country for c in gaz.suggest("Paris") if c.name == "Paris"]
+    assert countries[0] == "France"
+    assert sorted(countries) == ["Canada", "France", "US"]
+
+
+def test_nearest_known_cities(gaz):
+    assert gaz.nearest(48.85, 2.35)[0].name == "Paris"
+    assert gaz.nearest(79.0, 12.0)[0].name == "Longyearbyen"
+    assert gaz.nearest(-90.0, 0.0)[0].name == "McMurdo"
+    assert len(gaz.nearest(0, 0, k=len(gaz) + 5)) == len(gaz)
+    assert gazetteer.build([]).nearest(0, 0) == []
+
+
+def test_saved_file_round_trip(gaz, tmp_path):
+    path = str(tmp_path / "cities.gaz")
+    gazetteer.save(gaz, path)
+    assert gazetteer.is_binary(path)
+    loaded = gazetteer.load(path)
+    assert len(loaded) == len(gaz)
+    assert loaded.lookup("Paris", "US").row == gaz.lookup("Paris", "US").row
+    assert loaded.lookup("sao paulo").name == "São Paulo"
+    assert [c.name for c in loaded.prefix("pa")] == [c.name for c in gaz.prefix("pa")]
+    assert [c.row for c in loaded.suggest("Istambul")] == [c.row for c in gaz.suggest("Istambul")]
+    assert math.isclose(loaded.nearest(48.85, 2.35)[0].lat, 48.8566, abs_tol=1e-4)
+
+
+def test_geonames_dump(tmp_path):
+    path = tmp_path / "cities500.txt"
+    fields = ["1", "Reykjavik", "", "", "64.1355", "-21.8954", "P", "PPLC", "IS"] + [""] * 5 + ["118918",
+              "", "", "Atlantic/Reykjavik"]
+    small = ["2", "Hamlet", "", "", "60.0", "10.0", "P", "PPL", "NO"] + [""] * 5 + ["12", "", "", ""]
+    path.write_text("\t".join(fields) + "\n" + "\t".join(small) + "\nshort line\n", encoding="utf-8")
+    assert not gazetteer.is_binary(str(path))
+    gaz = gazetteer.load_geonames(str(path), min_population=100)
+    assert len(gaz) == 1
+    city = gaz.lookup("reykjavik")
+    assert (city.country, city.timezone, city.population) == ("IS", 0, 118918)
+
+
+def test_rejects_foreign_files(tmp_path):
+    path = tmp_path / "junk.gaz"
+    path.write_bytes(b"x" * 64)
+    with pytest.raises(ValueError):
+        gazetteer.open_binary(str(path))
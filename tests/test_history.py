@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+import history
+
+DAY = 86400
+START = 1_767_225_600  # 2026-01-01 00:00 UTC
+
+
+def observation(name, country, temp, wind=2.0, humidity=60, condition="Clear"):
+    return {
+        'name': name, 'sys': {'country': country}, 'timezone': 1,
+        'main': {'temp': temp, 'feels_like': temp - 1, 'humidity': humidity, 'pressure': 1010},
+        'wind': {'speed': wind}, 'weather': [{'main': condition, 'description': condition}],
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = history.HistoryStore(str(tmp_path / "history.db"), flush_seconds=0.01)
+    yield s
+    s.close()
+
+
+@pytest.fixture
+def filled(store):
+    """Two days of minute observations for Paris, France and a few for Paris, US"""
+    rng = np.random.default_rng(5)
+    conditions = ["Clear", "Rain", "Clouds", "Snow"]
+    for t in range(START, START + 2 * DAY, 60):
+        store.record([observation("Paris", "France", round(float(rng.normal(8, 4)), 1),
+                                  round(float(rng.uniform(0, 15)), 1), int(rng.integers(30, 95)),
+                                  conditions[int(rng.integers(0, 4))])], t)
+    for t in range(START, START + 3600, 600):
+        store.record([observation("Paris", "US", 25.0)], t)
+    assert store.flush(10)
+    return store
+
+
+def test_range_returns_recorded_rows(filled):
+    data = filled.range("Paris", START, START + 600, country="France")
+    assert list(data['time']) == list(range(START, START + 600, 60))
+    assert set(data) == {'time'} | set(history.RANGE_FIELDS)
+
+
+@pytest.mark.parametrize("step, offset", [(3600, 0), (DAY, 0), (DAY, -3600), (6 * 3600, 7200)])
+def test_rollup_matches_raw_observations(filled, step, offset):
+    # Whole-hour buckets read the hourly rollup; compare them with the raw rows
+    rolled = filled.aggregate("Paris", START, START + 2 * DAY, step, offset, country="France")
+    raw = filled.range("Paris", START, START + 2 * DAY, country="France")
+    buckets = (raw['time'] + offset) // step * step - offset
+    np.testing.assert_array_equal(rolled['time'], np.unique(buckets))
+    wet = np.isin(raw['condition'], history.WET_CONDITIONS)
+    for i, bucket in enumerate(rolled['time']):
+        rows = buckets == bucket
+        assert rolled['count'][i] == rows.sum()
+        assert rolled['temp_min'][i] == pytest.approx(raw['temp'][rows].min())
+        assert rolled['temp_max'][i] == pytest.approx(raw['temp'][rows].max())
+        assert rolled['temp_mean'][i] == pytest.approx(raw['temp'][rows].mean())
+        assert rolled['wind_max'][i] == pytest.approx(raw['wind_speed'][rows].max())
+        assert rolled['humidity_mean'][i] == pytest.approx(raw['humidity'][rows].mean())
+        assert rolled['precip_fraction'][i] == pytest.approx(wet[rows].mean())
+
+
+def test_rollup_and_raw_paths_agree(filled):
+    # A 30-minute offset forces the raw path; two of its buckets tile one rollup hour
+    raw = filled.aggregate("Paris", START, START + DAY, 1800, 0, country="France")
+    rolled = filled.aggregate("Paris", START, START + DAY, 3600, 0, country="France")
+    np.testing.assert_array_equal(raw['count'].reshape(-1, 2).sum(axis=1), rolled['count'])
+    np.testing.assert_allclose(np.maximum(raw['temp_max'][::2], raw['temp_max'][1::2]), rolled['temp_max'])
+
+
+def test_namesakes_stay_apart(filled):
+    assert filled.cities() == [("Paris", "France"), ("Paris", "US")]
+    us = filled.aggregate("paris", START, START + DAY, DAY, country="us")
+    assert list(us['count']) == [6] and us['temp_mean'][0] == pytest.approx(25.0)
+    france = filled.aggregate("Paris", START, START + DAY, DAY, country="France")
+    assert france['count'][0] == 1440
+    # Without a country the most observed namesake answers
+    assert filled.aggregate("Paris", START, START + DAY, DAY)['count'][0] == 1440
+    assert len(filled.range("Paris", START, START + DAY, country="Peru")['time']) == 0
+
+
+def test_duplicates_are_skipped(store):
+    store.record([observation("Oslo", "Norway", 1.0)], START)
+    store.record([observation("Oslo", "Norway", 9.0)], START)
+    assert store.flush(10)
+    assert list(store.range("Oslo", START, START + 1)['temp']) == [1.0]
+    assert store.written == 1 and store.skipped == 1
+
+
+def test_old_name_keys_are_migrated(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = history.connect(path)
+    conn.execute("INSERT INTO cities (key, name, country, timezone) VALUES ('paris', 'Paris', 'France', 1)")
+    conn.commit()
+    conn.close()
+    store = history.HistoryStore(path)
+    try:
+        store.record([observation("Paris", "France", 5.0), observation("Paris", "US", 20.0)], START)
+        assert store.flush(10)
+        assert store.cities() == [("Paris", "France"), ("Paris", "US")]
+        assert list(store.range("Paris", START, START + 1, country="France")['temp']) == [5.0]
+    finally:
+        store.close()
@@ -0,0 +1,77 @@
+import importlib
+import sys
+import threading
+
+import pytest
+
+import lazy
+
+
+@pytest.fixture
+def modules(tmp_path, monkeypatch):
+    """Write modules into a fresh import path; they are forgotten afterwards"""
+    monkeypatch.syspath_prepend(str(tmp_path))
+    written = []
+
+    def write(name, source):
+        (tmp_path / f"{name}.py").write_text(source, encoding="utf-8")
+        written.append(name)
+        importlib.invalidate_caches()
+
+    yield write
+    for name in written:
+        sys.modules.pop(name, None)
+
+
+def test_loads_on_first_attribute_access(modules):
+    modules("lazy_probe_log", "runs = []\n")
+    modules("lazy_probe_a", "import lazy_probe_log\nlazy_probe_log.runs.append('a')\nVALUE = 42\n")
+    module = lazy.lazy_import("lazy_probe_a")
+    import lazy_probe_log
+    assert lazy_probe_log.runs == []
+    assert module.VALUE == 42 and lazy_probe_log.runs == ["a"]
+    assert type(module) is type(sys)
+    # Plain imports and later lazy imports share the loaded module
+    import lazy_probe_a
+    assert lazy_probe_a is module and lazy.lazy_import("lazy_probe_a") is module
+    assert lazy_probe_log.runs == ["a"]
+
+
+def test_missing_module():
+    with pytest.raises(ModuleNotFoundError):
+        lazy.lazy_import("no_such_module_anywhere")
+
+
+def test_concurrent_first_access_runs_the_module_once(modules):
+    # The module takes a while to execute and only defines DONE at its end,
+    # so a thread let in while another is still executing it would fail
+    modules("lazy_probe_log", "runs = []\n")
+    modules("lazy_probe_slow", "import time\nimport lazy_probe_log\nlazy_probe_log.runs.append(1)\n"
+            "FIRST = 1\ntime.sleep(0.2)\nDONE = True\n")
+    module = lazy.lazy_import("lazy_probe_slow")
+    start = threading.Barrier(8)
+    seen, errors = [], []
+
+    def worker():
+        start.wait()
+        try:
+            seen.append(module.DONE)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10)
+    import lazy_probe_log
+    assert errors == [] and seen == [True] * 8
+    assert lazy_probe_log.runs == [1]
+
+
+def test_loading_module_may_touch_other_lazy_modules(modules):
+    modules("lazy_probe_b", "import lazy\nc = lazy.lazy_import('lazy_probe_c')\nVALUE = c.VALUE + 1\n")
+    modules("lazy_probe_c", "import sys\n# Refers back to b while b is half loaded\n"
+            "B_LOADING = sys.modules['lazy_probe_b'].__name__\nVALUE = 1\n")
+    b = lazy.lazy_import("lazy_probe_b")
+    assert b.VALUE == 2 and sys.modules["lazy_probe_c"].B_LOADING == "lazy_probe_b"
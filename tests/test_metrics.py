@@ -0,0 +1,97 @@
+import json
+import threading
+
+import pytest
+
+import metrics
+
+
+def test_bucket_quantiles():
+    hist = metrics.Histogram("h")
+    assert hist.quantile(0.5) == 0.0
+    for _ in range(90):
+        hist.observe(0.001)
+    for _ in range(10):
+        hist.observe(0.1)
+    # Quantiles are the upper bound of their bucket, within a factor of sqrt(2)
+    assert 0.001 <= hist.quantile(0.5) < 0.001 * 2 ** 0.5
+    assert 0.1 <= hist.quantile(0.95) < 0.1 * 2 ** 0.5
+    assert hist.quantile(0.9) < 0.002
+    summary = hist.summary()
+    assert summary['count'] == 100 and summary['mean_ms'] == pytest.approx(10.9)
+    hist.observe(1e6)
+    assert hist.quantile(1.0) == float("inf")
+    hist.reset()
+    assert hist.count == 0 and sum(hist.counts) == 0
+
+
+def test_timed_only_records_while_enabled():
+    registry = metrics.Registry()
+
+    @metrics.timed("work", "Some work", registry=registry)
+    def work(x):
+        """Doubles x"""
+        return 2 * x
+
+    assert work(2) == 4 and work.__doc__ == "Doubles x"
+    assert registry.histogram("work").count == 0
+    registry.enabled = True
+    work(1)
+    with pytest.raises(TypeError):
+        work()
+    # Calls that raise are timed too
+    assert registry.histogram("work").count == 2
+
+
+def test_concurrent_observations_are_all_counted():
+    hist = metrics.Histogram("h")
+
+    def worker():
+        for _ in range(5000):
+            hist.observe(0.002)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert hist.count == sum(hist.counts) == 40000
+
+
+def test_snapshot_reads_sources_and_skips_failing_ones():
+    registry = metrics.Registry(enabled=True)
+    registry.histogram("search", "Search latency").observe(0.004)
+    registry.register("cache", lambda: {'hits': 3, 'ratio': 0.5, 'name': "lru"})
+    registry.register("broken", lambda: 1 / 0)
+    snap = registry.snapshot()
+    assert snap['latency']['search']['count'] == 1
+    assert snap['sources'] == {'cache': {'hits': 3, 'ratio': 0.5}}
+    registry.unregister("cache")
+    assert registry.snapshot()['sources'] == {}
+
+
+def test_prometheus_text():
+    registry = metrics.Registry()
+    hist = registry.histogram("search", "Search latency")
+    hist.observe(0.004)
+    hist.observe(0.5)
+    registry.register("cache", lambda: {'hits': 7})
+    lines = registry.prometheus_text().splitlines()
+    assert "# HELP skycast_search_seconds Search latency" in lines
+    assert "# TYPE skycast_search_seconds histogram" in lines
+    buckets = [line for line in lines if line.startswith("skycast_search_seconds_bucket")]
+    counts = [int(line.rsplit(" ", 1)[1]) for line in buckets]
+    assert len(buckets) == len(metrics.BOUNDS) + 1 and buckets[-1].startswith('skycast_search_seconds_bucket{le="+Inf"}')
+    assert counts == sorted(counts) and counts[-1] == 2
+    assert "skycast_search_seconds_count 2" in lines
+    assert "skycast_cache_hits 7" in lines
+
+
+def test_write_json_and_text(tmp_path):
+    registry = metrics.Registry()
+    registry.histogram("fetch").observe(0.01)
+    registry.write(str(tmp_path / "metrics.json"))
+    assert json.loads((tmp_path / "metrics.json").read_text())['latency']['fetch']['count'] == 1
+    registry.write(str(tmp_path / "metrics.prom"))
+    assert "skycast_fetch_seconds_count 1" in (tmp_path / "metrics.prom").read_text()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["metrics.json", "metrics.prom"]
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+import gazetteer
+import providers
+import streams
+
+TIMESTAMP = 1_768_487_400
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """OpenWeatherMap-shaped /weather; cities named flaky* fail with 503 first, missing* 404,
+    garbled* answer 200 with a body that isn't an observation"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        city = parse_qs(urlsplit(self.path).query)['q'][0]
+        with self.server.lock:
+            self.server.requests.append(city)
+            failures = self.server.failures.get(city, 0)
+            if failures:
+                self.server.failures[city] = failures - 1
+        time.sleep(self.server.delay)
+        if failures:
+            status, body = 503, b'{}'
+        elif city.startswith("missing"):
+            status, body = 404, b'{"message": "city not found"}'
+        elif city.startswith("garbled"):
+            status, body = 200, b'<html>maintenance</html>' if city == "garbled" else b'{"cod": 200}'
+        else:
+            status = 200
+            body = json.dumps({
+                "name": city, "coord": {"lat": 41.0, "lon": 29.0}, "dt": TIMESTAMP, "timezone": 10800,
+                "sys": {"country": "TR", "sunrise": TIMESTAMP - 30000, "sunset": TIMESTAMP + 6000},
+                "main": {"temp": 12.34, "feels_like": 10, "humidity": 70, "pressure": 1012},
+                "wind": {"speed": 3.33}, "weather": [{"main": "Clouds", "description": "broken clouds"}],
+            }).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = 0
+    server.requests = []
+    server.failures = {}
+    server.delay = 0.02
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def fetch(provider, cities):
+    async def run():
+        try:
+            return await provider.current_many(cities)
+        finally:
+            await provider.close()
+    return asyncio.run(run())
+
+
+def url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_normalized_observation(stub):
+    data, = fetch(providers.HTTPProvider(url(stub)), ["Istanbul"])
+    assert data['name'] == "Istanbul" and data['sys']['country'] == "TR"
+    assert data['main']['temp'] == 12.3 and data['wind']['speed'] == 3.3
+    assert data['weather'][0] == {'description': "Broken Clouds", 'main': "Clouds"}
+    assert data['timezone'] == 3
+
+
+def test_pooling_reuses_keep_alive_connections(stub):
+    provider = providers.HTTPProvider(url(stub), max_connections=4, pipeline_depth=4)
+    cities = [f"city{i}" for i in range(200)]
+    start = time.perf_counter()
+    results = fetch(provider, cities)
+    elapsed = time.perf_counter() - start
+    assert [r['name'] for r in results] == cities
+    assert provider.pool.opened <= 4 and stub.connections <= 4
+    assert len(stub.requests) == 200
+    # Far fewer round trips than one per city
+    assert elapsed < 200 * stub.delay / 2
+
+
+def test_duplicate_cities_are_coalesced(stub):
+    provider = providers.HTTPProvider(url(stub))
+    results = fetch(provider, ["Paris"] * 20 + ["paris", "Lima"])
+    assert all(r['name'] in ("Paris", "Lima") for r in results)
+    assert sorted(stub.requests) == ["Lima", "Paris"]
+    assert provider.coalesced == 20
+
+
+def test_retry_with_backoff(stub):
+    stub.failures["flaky"] = 2
+    provider = providers.HTTPProvider(url(stub), retries=3, backoff=0.01)
+    data, = fetch(provider, ["flaky"])
+    assert data['name'] == "flaky"
+    assert stub.requests == ["flaky"] * 3 and provider.retried == 2
+
+
+def test_retries_exhausted(stub):
+    stub.failures["flaky"] = 10
+    provider = providers.HTTPProvider(url(stub), retries=2, backoff=0.01)
+    error, = fetch(provider, ["flaky"])
+    assert isinstance(error, providers.ProviderError) and "503" in str(error)
+    assert len(stub.requests) == 3
+
+
+def test_client_errors_are_not_retried(stub):
+    provider = providers.HTTPProvider(url(stub), retries=3, backoff=0.01)
+    error, ok = fetch(provider, ["missing", "Oslo"])
+    assert isinstance(error, providers.ProviderError) and "404" in str(error)
+    assert ok['name'] == "Oslo"
+    assert stub.requests.count("missing") == 1 and provider.retried == 0
+
+
+def test_bad_payloads_are_provider_errors(stub):
+    provider = providers.HTTPProvider(url(stub), retries=3, backoff=0.01)
+    not_json, no_main, ok = fetch(provider, ["garbled", "garbled-empty", "Oslo"])
+    for error, city in ((not_json, "garbled"), (no_main, "garbled-empty")):
+        assert isinstance(error, providers.ProviderError)
+        assert str(error) == f"{city}: bad payload"
+    assert ok['name'] == "Oslo"
+    assert provider.retried == 0
+
+
+def test_connection_refused_is_a_provider_error():
+    provider = providers.HTTPProvider("http://127.0.0.1:9", retries=1, backoff=0.01, timeout=2)
+    error, = fetch(provider, ["Oslo"])
+    assert isinstance(error, providers.ProviderError)
+
+
+@pytest.fixture(scope="module")
+def simulation():
+    return providers.SimulatorProvider(gazetteer.builtin(), streams.KeyedStream(3))
+
+
+def test_simulator_provider_matches_single_observations(simulation):
+    names = ["Istanbul", "Paris", "Tokyo", "Nowhere", "Paris"]
+    batch = simulation.observe_many(names, TIMESTAMP)
+    assert batch == [simulation.observe(name, TIMESTAMP) for name in names]
+    assert batch[1] == batch[4]
+    assert batch[3]['sys']['country'] == "??"
+    # A City and its name resolve to the same place
+    assert simulation.observe(simulation.city_database.lookup("Tokyo"), TIMESTAMP) == batch[2]
+
+
+def test_simulator_provider_async_interface(simulation):
+    names = ["Istanbul", "Lima"]
+    observed = asyncio.run(simulation.current_many(names))
+    assert [o['name'] for o in observed] == names
+
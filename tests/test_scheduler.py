@@ -0,0 +1,161 @@
+import random
+from types import SimpleNamespace
+
+import scheduler
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class Root:
+    """Just enough of a Tk toplevel: after timers that the test fires by hand"""
+
+    def __init__(self):
+        self.timers = {}
+        self.bindings = {}
+        self.window_state = "normal"
+        self._ids = 0
+
+    def after(self, ms, fn):
+        self._ids += 1
+        self.timers[self._ids] = fn
+        return self._ids
+
+    def after_cancel(self, after_id):
+        self.timers.pop(after_id, None)
+
+    def bind(self, sequence, fn, add=None):
+        self.bindings.setdefault(sequence, []).append(fn)
+
+    def state(self):
+        return self.window_state
+
+    def fire(self):
+        timers, self.timers = self.timers, {}
+        for fn in timers.values():
+            fn()
+
+    def event(self, sequence, widget=None):
+        for fn in self.bindings.get(sequence, []):
+            fn(SimpleNamespace(widget=self if widget is None else widget))
+
+
+def make(interval=60.0, **options):
+    root, clock, batches = Root(), Clock(), []
+    sched = scheduler.RefreshScheduler(root, lambda cities, done: batches.append((cities, done)),
+                                       interval=interval, clock=clock, rng=random.Random(1), **options)
+    return sched, root, clock, batches
+
+
+def test_first_refreshes_are_staggered_within_the_interval():
+    sched, _, clock, _ = make()
+    for i in range(20):
+        sched.pin(f"city{i}")
+    dues = [due for _, due in sched.pins.values()]
+    assert all(clock.now <= due < clock.now + 60 for due in dues)
+    assert len(set(dues)) > 15
+    # The phase is stable across restarts
+    again, _, _, _ = make()
+    again.pin("city3")
+    assert again.pins["city3"] == sched.pins["city3"]
+
+
+def test_due_cities_go_out_as_one_batch_and_are_rescheduled():
+    sched, root, clock, batches = make(jitter=0.1)
+    for i in range(5):
+        sched.pin(i, interval=10 * (i + 1))
+    sched.start()
+    clock.now += 60
+    root.fire()
+    (cities, done), = batches
+    assert sorted(cities) == [0, 1, 2, 3, 4]
+    for city in cities:
+        interval, due = sched.pins[city]
+        assert clock.now + 0.9 * interval <= due <= clock.now + 1.1 * interval
+    assert sched.stats()['batches'] == 1 and sched.stats()['refreshed'] == 5
+    done()
+    assert root.timers  # still ticking
+
+
+def test_no_new_batch_while_one_is_in_flight():
+    sched, root, clock, batches = make()
+    sched.pin("a", 10)
+    sched.pin("b", 10)
+    sched.start()
+    clock.now += 11
+    root.fire()
+    assert len(batches) == 1 and sched.in_flight
+    clock.now += 11
+    root.fire()
+    assert len(batches) == 1
+    # The cities stay due and go out on the first tick after done()
+    batches[0][1]()
+    root.fire()
+    assert len(batches) == 2 and sorted(batches[1][0]) == ["a", "b"]
+
+
+def test_max_batch_leaves_the_rest_for_the_next_tick():
+    sched, root, clock, batches = make(max_batch=3)
+    for i in range(7):
+        sched.pin(i, 5)
+    sched.start()
+    clock.now += 10
+    for _ in range(3):
+        root.fire()
+        batches[-1][1]()
+    assert [len(cities) for cities, _ in batches] == [3, 3, 1]
+
+
+def test_unpin_and_refresh_now():
+    sched, root, clock, batches = make()
+    sched.pin("a", 30)
+    sched.pin("b", 30)
+    sched.unpin("a")
+    assert not sched.is_pinned("a")
+    sched.refresh_now("b")
+    sched.refresh_now("a")
+    assert sched.due() == ["b"]
+    assert sched.due(clock.now + 20) == []
+    assert sched.due(clock.now + 40) == ["b"]
+
+
+def test_pauses_while_minimized():
+    sched, root, clock, batches = make()
+    sched.pin("a", 10)
+    sched.start()
+    # Unmapping a child widget doesn't count
+    root.event("<Unmap>", widget=object())
+    assert not sched.suspended and root.timers
+    root.event("<Unmap>")
+    assert sched.suspended and not root.timers
+    clock.now += 100
+    root.event("<Map>")
+    assert not sched.suspended
+    root.fire()
+    assert batches[0][0] == ["a"]
+
+
+def test_iconic_window_skips_the_tick():
+    sched, root, clock, batches = make()
+    sched.pin("a", 10)
+    sched.start()
+    root.window_state = "iconic"
+    clock.now += 20
+    root.fire()
+    assert batches == [] and root.timers
+    root.window_state = "normal"
+    root.fire()
+    assert batches[0][0] == ["a"]
+
+
+def test_stop_cancels_the_timer():
+    sched, root, _, _ = make()
+    sched.start()
+    assert root.timers
+    sched.stop()
+    assert not root.timers and not sched.running
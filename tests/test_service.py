@@ -0,0 +1,195 @@
+import http.client
+import json
+import queue
+import socket
+import threading
+import time
+
+import pytest
+
+import export
+import service
+
+TIMESTAMP = 1_768_487_400
+
+
+def request(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        return response.status, dict(response.getheaders()), json.loads(response.read())
+    finally:
+        conn.close()
+
+
+def running(server):
+    """Serve on a thread; returns a function that stops and closes the server"""
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+        server.peers.close()
+        thread.join(5)
+    return stop
+
+
+@pytest.fixture(scope="module")
+def port():
+    server = service.make_server(request_timeout=5)
+    stop = running(server)
+    yield server.server_address[1]
+    stop()
+
+
+def detached(request_timeout, queue_size=0):
+    """Server for shard 0 of two, whose peer worker never answers"""
+    shard = service.Shard({})
+    jobs = [queue.Queue(), queue.Queue(queue_size)]
+    peers = service.Peers(0, shard, jobs, [queue.Queue(), queue.Queue()]).start()
+    server = service.WeatherServer(("127.0.0.1", 0), peers, request_timeout)
+    remote = next(c for c in ("Istanbul", "Paris", "Tokyo", "Rome", "Berlin") if peers.shard_of(c) == 1)
+    local = next(c for c in ("Istanbul", "Paris", "Tokyo", "Rome", "Berlin") if peers.shard_of(c) == 0)
+    return server, remote, local
+
+
+def test_current_is_the_simulated_observation(port):
+    status, headers, body = request(port, "GET", f"/current?city=Istanbul&time={TIMESTAMP}")
+    assert status == 200 and headers["Content-Type"] == "application/json"
+    simulation = service.Shard({}).simulation
+    assert body == export.serializable(simulation.observe("Istanbul", TIMESTAMP))
+    # ISO 8601 times are accepted too
+    _, _, iso = request(port, "GET", "/current?city=Istanbul&time=2026-01-15T14:30:00Z")
+    assert iso == body
+
+
+def test_forecast_columns(port):
+    status, _, body = request(port, "GET", f"/forecast?city=Paris&days=1&start={TIMESTAMP}")
+    assert status == 200 and body['name'] == "Paris" and body['country'] == "France"
+    hourly = body['hourly']
+    # Hourly from the start of the hour
+    assert len(hourly['time']) == 24 and hourly['time'][0] == TIMESTAMP - TIMESTAMP % 3600
+    assert all(len(column) == 24 for column in hourly.values())
+
+
+@pytest.mark.parametrize("method, path, status", [
+    ("GET", "/nowhere", 404),
+    ("POST", "/current", 404),
+    ("GET", "/current", 400),
+    ("GET", "/current?city=%20", 400),
+    ("GET", "/current?city=Paris&time=yesterday", 400),
+    ("GET", "/forecast?city=Paris&days=0", 400),
+    ("GET", f"/forecast?city=Paris&days={service.MAX_DAYS + 1}", 400),
+    ("GET", "/forecast?city=Paris&days=two", 400),
+])
+def test_bad_requests(port, method, path, status):
+    got, _, body = request(port, method, path)
+    assert got == status and body['error']
+
+
+def test_health_and_stats(port):
+    assert request(port, "GET", "/health")[2] == {'status': "ok"}
+    status, _, body = request(port, "GET", "/stats")
+    assert status == 200 and body['answered_by'] == 0 and len(body['workers']) == 1
+    assert set(body['workers'][0]['cache']) >= {'hits', 'misses', 'size'}
+
+
+def test_batch_keeps_request_order(port):
+    cities = ["Tokyo", "Istanbul", "Atlantis", "Tokyo", "paris"]
+    status, _, body = request(port, "POST", "/batch", json.dumps({'cities': cities, 'time': TIMESTAMP}))
+    assert status == 200 and len(body) == len(cities)
+    for city, observation in zip(cities, body):
+        assert observation == request(port, "GET", f"/current?city={city}&time={TIMESTAMP}")[2]
+    assert request(port, "POST", "/batch", json.dumps({'cities': []}))[:3:2] == (200, [])
+
+
+@pytest.mark.parametrize("body, headers, status", [
+    (b"not json", None, 400),
+    (b'{"time": 1}', None, 400),
+    (b'{"cities": "Paris"}', None, 400),
+    (b'{"cities": ["Paris", 3]}', None, 400),
+    (b'{"cities": ["Paris"], "time": "soon"}', None, 400),
+    (b'{"cities": ["Paris"]}', {"Content-Length": "-1"}, 400),
+    (b'{"cities": ["Paris"]}', {"Content-Length": "twelve"}, 400),
+])
+def test_batch_validation(port, body, headers, status):
+    got, _, reply = request(port, "POST", "/batch", body, headers)
+    assert got == status and reply['error']
+
+
+def test_batch_size_limit(port, monkeypatch):
+    monkeypatch.setattr(service, "MAX_BATCH", 3)
+    status, _, _ = request(port, "POST", "/batch", json.dumps({'cities': ["Paris"] * 4}))
+    assert status == 413
+
+
+def test_full_peer_queue_answers_503():
+    server, remote, local = detached(request_timeout=5, queue_size=1)
+    stop = running(server)
+    try:
+        port = server.server_address[1]
+        server.peers.jobs[1].put_nowait("a job that is never taken")
+        status, headers, body = request(port, "GET", f"/current?city={remote}")
+        assert status == 503 and headers["Retry-After"] == "1" and "full" in body['error']
+        assert server.peers.rejected == 1
+        # This worker's own cities are still answered
+        assert request(port, "GET", f"/current?city={local}")[0] == 200
+    finally:
+        stop()
+
+
+def test_unanswered_jobs_time_out_and_are_discarded():
+    server, remote, local = detached(request_timeout=0.2)
+    stop = running(server)
+    try:
+        port = server.server_address[1]
+        status, _, body = request(port, "GET", f"/current?city={remote}")
+        assert status == 504 and "timed out" in body['error']
+        status, _, _ = request(port, "POST", "/batch", json.dumps({'cities': [local, remote, local]}))
+        assert status == 504
+        assert server.peers.pending() == 0
+    finally:
+        stop()
+
+
+def test_pool_serves_from_every_shard():
+    pool = service.ShardPool(2, queue_size=16, request_timeout=5).start()
+    try:
+        port = pool.address[1]
+        cities = ["Istanbul", "Paris", "Tokyo", "Rome", "Berlin", "London"]
+        status, _, body = request(port, "POST", "/batch", json.dumps({'cities': cities, 'time': TIMESTAMP}))
+        assert status == 200 and [o['name'] for o in body] == cities
+        simulation = service.Shard({}).simulation
+        assert body[2] == export.serializable(simulation.observe("Tokyo", TIMESTAMP))
+        workers = request(port, "GET", "/stats")[2]['workers']
+        assert len({w['pid'] for w in workers}) == 2
+    finally:
+        pool.close()
+
+
+def test_pool_shutdown_finishes_in_flight_requests():
+    pool = service.ShardPool(2, queue_size=16, request_timeout=5).start()
+    port = pool.address[1]
+    body = json.dumps({'cities': [f"Town {i}" for i in range(500)], 'time': TIMESTAMP}).encode()
+    conn = socket.create_connection(("127.0.0.1", port), timeout=30)
+    try:
+        # Half a request is in flight when the pool is told to stop
+        conn.sendall(b"POST /batch HTTP/1.1\r\nHost: test\r\nContent-Length: %d\r\n\r\n" % len(body)
+                     + body[:100])
+        time.sleep(0.2)
+        closing = threading.Thread(target=pool.close)
+        closing.start()
+        time.sleep(0.3)
+        conn.sendall(body[100:])
+        response = http.client.HTTPResponse(conn)
+        response.begin()
+        assert response.status == 200
+        assert len(json.loads(response.read())) == 500
+        closing.join(30)
+    finally:
+        conn.close()
+    assert all(proc.exitcode is not None for proc in pool.processes)
+    with pytest.raises(OSError):
+        socket.create_connection(("127.0.0.1", port), timeout=2).close()
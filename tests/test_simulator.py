@@ -0,0 +1,89 @@
+import math
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+import simulator
+
+TIMESTAMP = 1_768_487_400
+
+
+def reference(lat, tz_hours, timestamp, u):
+    """One observation by the original per-city rules, from the same uniform draws"""
+    local = datetime.fromtimestamp(timestamp + tz_hours * 3600, timezone.utc)
+    season = local.month % 12 // 3
+    if lat < 0:
+        season = (season + 2) % 4
+    lo, hi = simulator.SEASONAL_TEMPS[simulator.SEASONS[season]]
+    temp = lo + (hi - lo) * u[0]
+    temp += -5 if abs(lat) > 50 else 0 if abs(lat) > 35 else 10
+    tod_lo, tod_hi = simulator._TIME_OF_DAY[local.hour // 6]
+    temp += tod_lo + (tod_hi - tod_lo) * u[1]
+    weights = simulator.SEASONAL_CONDITIONS[simulator.SEASONS[season]]
+    total, cumulative, condition = sum(weights.values()), 0.0, None
+    for name in simulator.CONDITIONS:
+        cumulative += weights.get(name, 0.0) / total
+        if condition is None and u[2] < cumulative:
+            condition = name
+    condition = condition or simulator.CONDITIONS[-1]
+    c = simulator.CONDITIONS.index(condition)
+    adj_lo, adj_hi = simulator._CONDITION_TEMP[c]
+    temp += adj_lo + (adj_hi - adj_lo) * u[3]
+    wind_lo, wind_hi = simulator._CONDITION_WIND[c]
+    return {
+        'temp': round(temp, 1),
+        'condition': condition,
+        'humidity': (60 if condition in ("Rain", "Snow", "Thunderstorm") else 40) + int(u[6] * 36),
+        'pressure': 1000 + math.floor(u[7] * 21),
+        'wind_speed': round(wind_lo + (wind_hi - wind_lo) * u[8], 1),
+    }
+
+
+def test_batch_matches_per_city_rules():
+    rng = np.random.default_rng(1)
+    n = 500
+    lat, lon = rng.uniform(-70, 70, n), rng.uniform(-180, 180, n)
+    tz = np.round(lon / 15)
+    times = TIMESTAMP + rng.integers(0, 365 * 86400, n)
+    u = simulator.draw_uniforms(rng, n)
+    batch = simulator.simulate_batch(lat, lon, tz, times, uniforms=u)
+    for i in range(n):
+        expected = reference(lat[i], tz[i], int(times[i]), u[:, i])
+        assert simulator.CONDITIONS[batch['condition'][i]] == expected['condition']
+        assert batch['temp'][i] == pytest.approx(expected['temp'], abs=0.051)
+        assert batch['humidity'][i] == expected['humidity']
+        assert batch['pressure'][i] == expected['pressure']
+        assert batch['wind_speed'][i] == pytest.approx(expected['wind_speed'], abs=0.051)
+
+
+def test_batch_equals_row_by_row():
+    rng = np.random.default_rng(2)
+    lat, lon = rng.uniform(-80, 80, 32), rng.uniform(-180, 180, 32)
+    tz = np.round(lon / 15)
+    u = simulator.draw_uniforms(rng, 32)
+    whole = simulator.simulate_batch(lat, lon, tz, TIMESTAMP, uniforms=u)
+    for i in range(32):
+        row = simulator.simulate_batch(lat[i], lon[i], tz[i], TIMESTAMP, uniforms=u[:, i:i + 1])
+        for column, values in row.items():
+            assert values[0] == whole[column][i], column
+
+
+def test_same_generator_same_observations():
+    first = simulator.simulate_batch([41.0, -33.9], [29.0, 151.2], [3, 10], TIMESTAMP,
+                                     rng=np.random.default_rng(9))
+    second = simulator.simulate_batch([41.0, -33.9], [29.0, 151.2], [3, 10], TIMESTAMP,
+                                      rng=np.random.default_rng(9))
+    for column in first:
+        np.testing.assert_array_equal(first[column], second[column])
+
+
+def test_observation_dict():
+    batch = simulator.simulate_batch([41.0], [29.0], [3], TIMESTAMP, rng=np.random.default_rng(0))
+    data = simulator.observation(batch, 0, "Istanbul", "Turkey", 3)
+    assert data['name'] == "Istanbul" and data['sys'] == {'country': "Turkey"}
+    assert data['weather'][0]['main'] in simulator.CONDITIONS
+    assert data['weather'][0]['description'] in simulator.WEATHER_DESCRIPTIONS[data['weather'][0]['main']]
+    assert data['sys_data']['sunrise'] < data['sys_data']['sunset']
+    assert data['season'] == "winter"
+    assert data['main']['feels_like'] < data['main']['temp']
@@ -0,0 +1,94 @@
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+import solar
+
+
+def epoch_day(text):
+    return (date.fromisoformat(text) - date(1970, 1, 1)).days
+
+
+def local_seconds(timestamp, tz_hours):
+    """Seconds since local midnight"""
+    moment = datetime.fromtimestamp(int(timestamp), timezone(timedelta(hours=tz_hours)))
+    return moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+# Published sunrise and sunset (local clock time) for the solstices
+KNOWN = [
+    # London, 21 June 2026, BST: 04:43 and 21:21
+    (51.5074, -0.1278, "2026-06-21", 1, (4, 43), (21, 21)),
+    # Sydney, 21 December 2026, AEDT: 05:41 and 20:05
+    (-33.8688, 151.2093, "2026-12-21", 11, (5, 41), (20, 5)),
+]
+
+
+@pytest.mark.parametrize("lat, lon, day, tz, rise, set_", KNOWN)
+def test_matches_published_times(lat, lon, day, tz, rise, set_):
+    sunrise, sunset = solar.sun_times(lat, lon, epoch_day(day))
+    for value, (hour, minute) in ((sunrise, rise), (sunset, set_)):
+        assert abs(local_seconds(value, tz) - (hour * 3600 + minute * 60)) < 150
+
+
+def test_polar_night_and_day():
+    lat, lon = 78.22, 15.65  # Longyearbyen
+    sunrise, sunset = solar.sun_times(lat, lon, epoch_day("2026-12-21"))
+    assert sunrise == sunset
+    sunrise, sunset = solar.sun_times(lat, lon, epoch_day("2026-06-21"))
+    assert sunset - sunrise == 86400
+
+
+def test_broadcasts_over_locations_and_days():
+    lat = np.array([51.5, -33.9, 0.0])[:, None]
+    lon = np.array([-0.1, 151.2, 30.0])[:, None]
+    days = epoch_day("2026-01-01") + np.arange(365)[None, :]
+    sunrise, sunset = solar.sun_times(lat, lon, days)
+    assert sunrise.shape == (3, 365)
+    length = (sunset - sunrise) / 3600
+    # Opposite seasons either side of the equator; the equator barely changes
+    solstice = epoch_day("2026-06-21") - epoch_day("2026-01-01")
+    assert abs(length[0].argmax() - solstice) <= 2 and abs(length[1].argmin() - solstice) <= 2
+    assert np.ptp(length[2]) < 0.2
+    assert 16 < length[0].max() < 17 and 7.5 < length[0].min() < 8.5
+
+
+def test_table_matches_direct_computation():
+    rng = np.random.default_rng(2)
+    lat = rng.uniform(-65, 65, 200)
+    lon = rng.uniform(-180, 180, 200)
+    days = rng.integers(solar._TABLE_START, solar._TABLE_START + solar.TABLE_DAYS, 200)
+    table = solar.SunTable(maxsize=64)
+    expected = solar.sun_times(lat[:50], lon[:50], days[:50])
+    got = table.lookup(lat[:50], lon[:50], days[:50])
+    for a, b in zip(got, expected):
+        np.testing.assert_array_equal(a, b)
+    # Other leap cycles come from the same table, within a couple of minutes
+    later = days[:50] + 40 * 365
+    got = table.lookup(lat[:50], lon[:50], later)
+    for a, b in zip(got, solar.sun_times(lat[:50], lon[:50], later)):
+        assert np.abs(a - b).max() < 120
+    # More places than the table holds are computed directly
+    for a, b in zip(table.lookup(lat, lon, days), solar.sun_times(lat, lon, days)):
+        np.testing.assert_array_equal(a, b)
+
+
+def test_table_reuse_and_eviction():
+    table = solar.SunTable(maxsize=3)
+    day = epoch_day("2026-03-01")
+    table.lookup([10.0, 20.0, 10.0], [0.0, 0.0, 0.0], day)
+    assert table.stats() == {'size': 2, 'maxsize': 3, 'hits': 0, 'misses': 2}
+    table.lookup([30.0], [0.0], day)
+    table.lookup([10.0], [0.0], day)
+    # 20° was used least recently
+    table.lookup([40.0], [0.0], day)
+    assert len(table) == 3
+    misses = table.misses
+    table.lookup([10.0, 30.0, 40.0], [0.0, 0.0, 0.0], day)
+    assert table.misses == misses
+    table.lookup([20.0], [0.0], day)
+    assert table.misses == misses + 1
+    sunrise, sunset = table.lookup([20.0], [0.0], day)
+    expected = solar.sun_times(20.0, 0.0, day)
+    assert (int(sunrise[0]), int(sunset[0])) == (int(expected[0]), int(expected[1]))
@@ -0,0 +1,67 @@
+import numpy as np
+
+import simulator
+import streams
+
+TIMESTAMP = 1_768_487_400
+
+
+def places(n, seed=0):
+    rng = np.random.default_rng(seed)
+    lat, lon = rng.uniform(-80, 80, n), rng.uniform(-180, 180, n)
+    return streams.location_keys(lat, lon), lat, lon, np.round(lon / 15)
+
+
+def test_keyed_simulation_is_independent_of_batching():
+    stream = streams.KeyedStream(11)
+    keys, lat, lon, tz = places(64)
+    times = TIMESTAMP + 3600 * np.arange(64)
+    whole = stream.simulate(keys, lat, lon, tz, times)
+    for lo, hi in ((0, 1), (1, 17), (17, 64)):
+        part = stream.simulate(keys[lo:hi], lat[lo:hi], lon[lo:hi], tz[lo:hi], times[lo:hi])
+        for column, values in part.items():
+            np.testing.assert_array_equal(values, whole[column][lo:hi])
+
+
+def test_order_does_not_matter():
+    stream = streams.KeyedStream(3)
+    keys, lat, lon, tz = places(50)
+    order = np.random.default_rng(1).permutation(50)
+    whole = stream.simulate(keys, lat, lon, tz, TIMESTAMP)
+    shuffled = stream.simulate(keys[order], lat[order], lon[order], tz[order], TIMESTAMP)
+    for column in whole:
+        np.testing.assert_array_equal(shuffled[column], whole[column][order])
+
+
+def test_uniforms_depend_on_seed_key_and_second():
+    keys = streams.city_keys(["Istanbul", "Paris"])
+    u = streams.keyed_uniforms(0, keys, TIMESTAMP)
+    assert u.shape == (simulator.N_DRAWS, 2)
+    assert ((u >= 0) & (u < 1)).all()
+    np.testing.assert_array_equal(u, streams.keyed_uniforms(0, keys, TIMESTAMP + 0.5))
+    assert not np.array_equal(u, streams.keyed_uniforms(1, keys, TIMESTAMP))
+    assert not np.array_equal(u, streams.keyed_uniforms(0, keys, TIMESTAMP + 1))
+    assert not np.array_equal(u[:, 0], u[:, 1])
+
+
+def test_uniforms_look_uniform():
+    u = streams.keyed_uniforms(7, np.arange(20_000, dtype=np.uint64), TIMESTAMP).ravel()
+    counts = np.histogram(u, bins=10, range=(0, 1))[0]
+    assert abs(u.mean() - 0.5) < 0.01
+    assert counts.min() > 0.9 * len(u) / 10
+
+
+def test_keys_are_stable():
+    # Keys must not change between processes or releases; the cache and history rely on them
+    assert streams.city_key("istanbul") == streams.city_key("istanbul")
+    assert streams.city_keys(["a", "b"]).dtype == np.uint64
+    np.testing.assert_array_equal(streams.location_keys([41.0082], [28.9784]),
+                                  streams.location_keys(np.float32(41.0082), np.float32(28.9784)))
+
+
+def test_member_zero_keeps_city_key():
+    keys = streams.city_keys(["Istanbul", "Paris"])
+    members = streams.member_keys(keys, 5)
+    assert members.shape == (2, 5)
+    np.testing.assert_array_equal(members[:, 0], keys)
+    assert len(np.unique(members)) == 10
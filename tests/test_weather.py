@@ -0,0 +1,70 @@
+import cache
+import history
+import providers
+import Weather
+
+TIMESTAMP = 1_768_487_400
+
+
+class PartialProvider:
+    """Remote backend that knows some cities and fails on the rest, as current_many reports it"""
+
+    def __init__(self, known):
+        self.known = known
+        self.asked = []
+
+    async def current_many(self, cities):
+        self.asked.append(list(cities))
+        return [{
+            'name': city, 'sys': {'country': "NO"}, 'timezone': 1,
+            'main': {'temp': 4.0, 'feels_like': 2.0, 'humidity': 80, 'pressure': 1008},
+            'wind': {'speed': 3.0}, 'weather': [{'main': "Rain", 'description': "Light Rain"}],
+        } if city in self.known else providers.ProviderError(f"{city}: HTTP 404") for city in cities]
+
+
+class Tiles:
+    def __init__(self):
+        self.updated = {}
+
+    def update(self, key, data):
+        self.updated[key] = data
+
+
+def headless_app(provider, tmp_path):
+    """The app's batch and refresh paths, without a window"""
+    app = object.__new__(Weather.WeatherApp)
+    app.provider = provider
+    app.provider_thread = providers.ProviderThread()
+    app.history = history.HistoryStore(str(tmp_path / "history.db"), flush_seconds=0.01)
+    app.cache = cache.ObservationCache(clock=lambda: TIMESTAMP)
+    app.dashboard = Tiles()
+    app.current_key = None
+    app.messages = []
+    app.show_message = lambda message, msg_type="info": app.messages.append((message, msg_type))
+    return app
+
+
+def test_mixed_provider_batch(tmp_path):
+    provider = PartialProvider({"Oslo", "Bergen"})
+    app = headless_app(provider, tmp_path)
+    try:
+        places = {"oslo": "Oslo", "atlantis": "Atlantis", "bergen": "Bergen"}
+        results = app.fetch_cached_many(places)
+        assert [r['name'] for r in (results[0], results[2])] == ["Oslo", "Bergen"]
+        assert isinstance(results[1], providers.ProviderError)
+
+        # Only the observations are recorded and cached; the failure is asked for again
+        assert app.history.flush(10)
+        assert app.history.cities() == [("Bergen", "NO"), ("Oslo", "NO")]
+        assert len(app.cache) == 2
+        app.fetch_cached_many(places)
+        assert provider.asked == [["Oslo", "Atlantis", "Bergen"], ["Atlantis"]]
+
+        # Tiles show the observations and the failed city is reported
+        app.on_cities_refreshed(places, results)
+        assert sorted(app.dashboard.updated) == ["bergen", "oslo"]
+        (message, kind), = app.messages
+        assert kind == "warning" and "Atlantis" in message and "404" in message
+    finally:
+        app.history.close()
+        app.provider_thread.stop()
@@ -0,0 +1,98 @@
+import threading
+import time
+
+import pytest
+
+import workers
+
+
+class Root:
+    """Stands in for the Tk root: after() callbacks run when the test polls"""
+
+    def __init__(self):
+        self.timers = {}
+        self._ids = 0
+
+    def after(self, ms, fn):
+        self._ids += 1
+        self.timers[self._ids] = fn
+        return self._ids
+
+    def after_cancel(self, after_id):
+        self.timers.pop(after_id, None)
+
+    def run_until(self, condition, timeout=5):
+        """Fire timers like the Tk loop would, re-raising what a callback raises"""
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline, "timed out"
+            timers, self.timers = self.timers, {}
+            for fn in timers.values():
+                fn()
+            time.sleep(0.001)
+
+
+@pytest.fixture
+def fetcher():
+    root = Root()
+    f = workers.BackgroundFetcher(root, max_workers=2)
+    yield f
+    f.shutdown()
+
+
+def test_results_arrive_on_the_polling_thread(fetcher):
+    delivered = []
+    fetcher.submit(lambda: threading.current_thread().name, lambda name: delivered.append(
+        (name, threading.current_thread().name)))
+    fetcher.root.run_until(lambda: delivered)
+    (worker, caller), = delivered
+    assert worker.startswith("skycast-worker") and caller == threading.current_thread().name
+    assert not fetcher.busy and not fetcher.root.timers
+
+
+def test_errors_go_to_on_error(fetcher):
+    errors = []
+    fetcher.submit(lambda: 1 / 0, lambda result: None, errors.append)
+    fetcher.root.run_until(lambda: errors)
+    assert isinstance(errors[0], ZeroDivisionError)
+
+
+def test_newer_submission_supersedes_the_channel(fetcher):
+    release = threading.Event()
+    delivered = []
+    fetcher.submit(lambda: release.wait(5) and "old", delivered.append, channel="search")
+    fetcher.submit(lambda: "other", delivered.append, channel="refresh")
+    fetcher.submit(lambda: "new", delivered.append, channel="search")
+    release.set()
+    fetcher.root.run_until(lambda: not fetcher.busy)
+    assert sorted(delivered) == ["new", "other"]
+    assert fetcher.dropped == 1
+
+
+def test_a_raising_callback_does_not_stop_polling(fetcher):
+    gate = threading.Event()
+    delivered = []
+
+    def explode(result):
+        raise RuntimeError("callback failed")
+
+    fetcher.submit(lambda: "first", explode, channel="a")
+    fetcher.submit(lambda: gate.wait(5) and "second", delivered.append, channel="b")
+    with pytest.raises(RuntimeError):
+        fetcher.root.run_until(lambda: False)
+    # The poll was rescheduled before the error escaped
+    assert fetcher.root.timers
+    gate.set()
+    fetcher.root.run_until(lambda: delivered)
+    assert delivered == ["second"] and not fetcher.busy
+
+
+def test_shutdown_cancels_pending_work(fetcher):
+    gate = threading.Event()
+    delivered = []
+    for i in range(4):
+        fetcher.submit(lambda: gate.wait(5), delivered.append, channel=str(i))
+    fetcher.shutdown()
+    gate.set()
+    assert not fetcher.root.timers
+    assert delivered == []
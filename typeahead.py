@@ -0,0 +1,106 @@
+"""As-you-type suggestions under a Tk entry
+
+Keystrokes only restart a short timer; the lookup runs once typing pauses
+and only if the text changed, so a burst of typing costs one search
+rather than one per key. Matches appear in a list placed under the entry
+and are picked with the mouse, or with Down/Up and Return.
+"""
+import tkinter as tk
+
+# Keys that move around the list or the entry without changing the text
+_NAVIGATION = {"Up", "Down", "Left", "Right", "Return", "KP_Enter", "Escape", "Tab",
+               "Home", "End", "Shift_L", "Shift_R", "Control_L", "Control_R", "Alt_L", "Alt_R"}
+
+
+class TypeAhead:
+    """Suggestion list for entry; suggest(text) returns (label, value) pairs and on_pick(value) handles a choice"""
+
+    def __init__(self, root, entry, suggest, on_pick, delay_ms=120, rows=8):
+        self.root = root
+        self.entry = entry
+        self.suggest = suggest
+        self.on_pick = on_pick
+        self.delay_ms = delay_ms
+        self.values = []
+        self.last_text = None
+        self._after_id = None
+        self.stats = {'keystrokes': 0, 'lookups': 0}
+
+        self.listbox = tk.Listbox(root, height=rows, font=("Arial", 11), activestyle="none",
+                                  bg="#0f3460", fg="white", selectbackground="#4cc9f0",
+                                  relief="flat", highlightthickness=0)
+        entry.bind("<KeyRelease>", self.on_key, add="+")
+        entry.bind("<Down>", lambda e: self.move(1), add="+")
+        entry.bind("<Escape>", lambda e: self.hide(), add="+")
+        self.listbox.bind("<ButtonRelease-1>", lambda e: self.pick())
+        self.listbox.bind("<Return>", lambda e: self.pick())
+        self.listbox.bind("<Up>", lambda e: self.move(-1))
+        self.listbox.bind("<Down>", lambda e: self.move(1))
+        self.listbox.bind("<Escape>", lambda e: (self.hide(), self.entry.focus_set()))
+
+    @property
+    def visible(self):
+        return bool(self.values)
+
+    def on_key(self, event):
+        if event.keysym in _NAVIGATION:
+            return
+        self.stats['keystrokes'] += 1
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+        self._after_id = self.root.after(self.delay_ms, self.refresh)
+
+    def refresh(self):
+        """Look up the entry's current text and show the matches"""
+        self._after_id = None
+        text = self.entry.get().strip()
+        if text == self.last_text:
+            return
+        self.last_text = text
+        matches = []
+        if text:
+            self.stats['lookups'] += 1
+            matches = self.suggest(text)
+        self.show(matches)
+
+    def show(self, matches):
+        self.listbox.delete(0, tk.END)
+        self.values = [value for _, value in matches]
+        if not matches:
+            self.listbox.place_forget()
+            return
+        self.listbox.insert(tk.END, *(label for label, _ in matches))
+        self.listbox.configure(height=len(matches))
+        self.listbox.place(in_=self.entry, x=0, rely=1.0, relwidth=1.0, width=120)
+        self.listbox.lift()
+
+    def hide(self):
+        """Close the list; the next edit opens it again"""
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+        self.values = []
+        self.last_text = self.entry.get().strip()
+        self.listbox.place_forget()
+
+    def move(self, step):
+        """Move the selection, entering the list from the entry"""
+        if not self.values:
+            return
+        current = self.listbox.curselection()
+        index = min(max((current[0] + step) if current else 0, 0), len(self.values) - 1)
+        self.listbox.selection_clear(0, tk.END)
+        self.listbox.selection_set(index)
+        self.listbox.activate(index)
+        self.listbox.see(index)
+        self.listbox.focus_set()
+        return "break"
+
+    def pick(self):
+        current = self.listbox.curselection()
+        if not current:
+            return
+        value = self.values[current[0]]
+        self.hide()
+        self.entry.focus_set()
+        self.on_pick(value)
@@ -0,0 +1,131 @@
+"""Off-thread weather fetching for the Tk app
+
+Work runs on a thread pool; finished results are pushed onto a
+thread-safe queue and picked up on the Tk thread by a short ``after``
+poll that only runs while something is in flight. Each submission
+supersedes the previous one in its channel: the older request is
+cancelled if it has not started, and its result is dropped if it has.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
+
+
+class Request:
+    """Handle for one submitted job"""
+
+    def __init__(self, channel, generation):
+        self.channel = channel
+        self.generation = generation
+        self.future = None
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self):
+        """True once superseded or cancelled; long jobs may poll this"""
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """Cancel the job if it has not started and drop its result either way"""
+        self._cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+
+class BackgroundFetcher:
+    """Runs jobs on a thread pool and delivers results on the Tk thread"""
+
+    def __init__(self, root, max_workers=2, poll_ms=16):
+        self.root = root
+        self.poll_ms = poll_ms
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="skycast-worker")
+        self.results = queue.Queue()
+        self.latest = {}
+        self.pending = 0
+        self.dropped = 0
+        self._poll_id = None
+        self._closed = False
+
+    def submit(self, fn, on_done, on_error=None, channel="default"):
+        """Run fn() off-thread, then on_done(result) on the Tk thread
+
+        A newer submit on the same channel supersedes this one.
+        """
+        previous = self.latest.get(channel)
+        if previous is not None:
+            previous.cancel()
+        request = Request(channel, previous.generation + 1 if previous else 0)
+        self.latest[channel] = request
+
+        def run():
+            if request.cancelled:
+                self.results.put(None)
+                return
+            try:
+                result = fn()
+            except Exception as exc:
+                self.results.put((request, None, exc, on_done, on_error))
+            else:
+                self.results.put((request, result, None, on_done, on_error))
+
+        request.future = self.executor.submit(run)
+        # A job cancelled before starting never reports back
+        request.future.add_done_callback(self._count_cancelled)
+        self.pending += 1
+        self._schedule_poll()
+        return request
+
+    def _count_cancelled(self, future):
+        if future.cancelled():
+            self.results.put(None)
+
+    def _schedule_poll(self):
+        if self._poll_id is None and not self._closed:
+            self._poll_id = self.root.after(self.poll_ms, self.poll)
+
+    def poll(self):
+        """Deliver finished results; reschedules itself while work is pending
+
+        A callback that raises propagates to Tk's error reporting; the
+        results behind it are delivered by the next poll.
+        """
+        self._poll_id = None
+        try:
+            while True:
+                try:
+                    item = self.results.get_nowait()
+                except queue.Empty:
+                    break
+                self.pending -= 1
+                if item is None:
+                    self.dropped += 1
+                    continue
+                request, result, error, on_done, on_error = item
+                if request.cancelled or self.latest.get(request.channel) is not request:
+                    self.dropped += 1
+                    continue
+                if error is not None:
+                    if on_error is None:
+                        raise error
+                    on_error(error)
+                else:
+                    on_done(result)
+        finally:
+            if self.pending > 0:
+                self._schedule_poll()
+
+    @property
+    def busy(self):
+        """True while any submitted job has not been delivered or dropped"""
+        return self.pending > 0
+
+    def shutdown(self):
+        """Cancel everything and stop the pool without waiting for running jobs"""
+        self._closed = True
+        for request in self.latest.values():
+            request.cancel()
+        if self._poll_id is not None:
+            self.root.after_cancel(self._poll_id)
+            self._poll_id = None
+        self.executor.shutdown(wait=False, cancel_futures=True)